@@ -2,8 +2,16 @@ from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 from routes.music_routes import music_bp, init_app
+from routes.broadcast_routes import broadcast_bp
 from services.task_processor import TaskProcessor
 from services.ai_radio_generator import AIRadioGenerator
+from services.durable_task_queue import DurableTaskQueue
+from services.broadcast_manager import BroadcastManager
+from services.stream_fanout import StreamFanoutServer
+from services.live_show import LiveShowScheduler
+from services.cache_manager import CacheManager, CacheQuota
+from services.transition_library import TransitionLibrary, parse_styles
+from services.show_manifest import finished_show_paths
 import os
 
 # Load environment variables
@@ -21,7 +29,15 @@ os.makedirs(CACHE_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(LOGS_DIR, exist_ok=True)
 
-def create_app():
+def create_app(background_services: bool = True):
+    """
+    Build the Flask app and its services
+    
+    Args:
+        background_services (bool): Start the cache sweeper, the stream
+            fan-out server and the transition library fill; serve.py starts
+            them in one process only
+    """
     # Initialize Flask app
     app = Flask(__name__)
     CORS(app)
@@ -32,12 +48,60 @@ def create_app():
         BACKEND_ROOT=BACKEND_ROOT,
         CACHE_DIR=CACHE_DIR,
         OUTPUT_DIR=OUTPUT_DIR,
-        LOGS_DIR=LOGS_DIR
+        LOGS_DIR=LOGS_DIR,
+        # Shared SQLite queue file; when set, tasks run in worker.py processes
+        TASK_QUEUE_DB=os.getenv('TASK_QUEUE_DB'),
+        TASK_QUEUE_JOURNAL_MODE=os.getenv('TASK_QUEUE_JOURNAL_MODE', 'WAL'),
+        # Whisper implementation, model and CPU inference settings
+        TRANSCRIPTION_BACKEND=os.getenv('TRANSCRIPTION_BACKEND', 'openai-whisper'),
+        WHISPER_MODEL=os.getenv('WHISPER_MODEL', 'base'),
+        TRANSCRIPTION_THREADS=int(os.getenv('TRANSCRIPTION_THREADS', '0')),
+        TRANSCRIPTION_BEAM_SIZE=int(os.getenv('TRANSCRIPTION_BEAM_SIZE')) if os.getenv('TRANSCRIPTION_BEAM_SIZE') else None,
+        TRANSCRIPTION_COMPUTE_TYPE=os.getenv('TRANSCRIPTION_COMPUTE_TYPE'),
+        # Artists of one batch generated at the same time
+        BATCH_MAX_CONCURRENCY=int(os.getenv('BATCH_MAX_CONCURRENCY', '2')),
+        # Pre-generate transitions for adjacent songs while idle (costs API calls)
+        TRANSITION_LIBRARY_ENABLED=os.getenv('TRANSITION_LIBRARY_ENABLED', '').lower() in ('1', 'true', 'yes'),
+        TRANSITION_LIBRARY_STYLES=parse_styles(os.getenv('TRANSITION_LIBRARY_STYLES', 'smooth:medium')),
+        TRANSITION_LIBRARY_MAX_CALLS_PER_DAY=int(os.getenv('TRANSITION_LIBRARY_MAX_CALLS_PER_DAY', '300')),
+        TRANSITION_LIBRARY_MAX_MB=float(os.getenv('TRANSITION_LIBRARY_MAX_MB', '512')),
+        TRANSITION_LIBRARY_INTERVAL=float(os.getenv('TRANSITION_LIBRARY_INTERVAL', '900')),
+        # Transcribe only the parts of songs likely to contain vocals
+        VOCAL_GATING=os.getenv('VOCAL_GATING', 'true').lower() in ('1', 'true', 'yes'),
+        STATION_NAME=os.getenv('STATION_NAME', 'Offbeat Radio'),
+        # Port of the asyncio listener server; unset serves listeners only via /api/stream
+        STREAM_FANOUT_PORT=int(os.getenv('STREAM_FANOUT_PORT')) if os.getenv('STREAM_FANOUT_PORT') else None,
+        STREAM_MAX_LAG_SECONDS=float(os.getenv('STREAM_MAX_LAG_SECONDS', '10')),
+        # Minutes of audio live shows keep generated ahead of the playhead
+        LIVE_LOOKAHEAD_MINUTES=float(os.getenv('LIVE_LOOKAHEAD_MINUTES', '5')),
+        # Limits for generated audio under cache/ (segments) and cache/audio (intros, transitions, shows)
+        CACHE_MAX_MB=float(os.getenv('CACHE_MAX_MB', '1024')),
+        CACHE_AUDIO_MAX_MB=float(os.getenv('CACHE_AUDIO_MAX_MB', '4096')),
+        CACHE_MAX_FILES=int(os.getenv('CACHE_MAX_FILES', '2000')),
+        CACHE_MAX_AGE_DAYS=float(os.getenv('CACHE_MAX_AGE_DAYS', '30')),
+        CACHE_SWEEP_INTERVAL=float(os.getenv('CACHE_SWEEP_INTERVAL', '300')),
+        # Let Apache/lighttpd send files via X-Sendfile
+        USE_X_SENDFILE=os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes'),
+        # nginx internal locations for X-Accel-Redirect, keyed by directory setting
+        X_ACCEL_LOCATIONS={
+            key: location for key, location in (
+                ('CACHE_DIR', os.getenv('X_ACCEL_CACHE_LOCATION')),
+                ('OUTPUT_DIR', os.getenv('X_ACCEL_OUTPUT_LOCATION'))
+            ) if location
+        }
     )
     
     with app.app_context():
+        # Use the durable queue when configured, otherwise process tasks in-process
+        durable_queue = None
+        if app.config['TASK_QUEUE_DB']:
+            durable_queue = DurableTaskQueue(
+                app.config['TASK_QUEUE_DB'],
+                journal_mode=app.config['TASK_QUEUE_JOURNAL_MODE']
+            )
+        
         # Initialize task processor with config
-        task_processor = TaskProcessor(LOGS_DIR, app.config)
+        task_processor = TaskProcessor(LOGS_DIR, app.config, durable_queue=durable_queue)
         
         # Initialize AI radio generator within app context
         ai_radio_generator = AIRadioGenerator()
@@ -52,11 +116,90 @@ def create_app():
         app.config['task_processor'] = task_processor
         app.config['ai_radio_generator'] = ai_radio_generator
         
+        # Share one in-memory catalog index between the generator and the routes
+        app.config['music_manager'] = ai_radio_generator.music_manager
+        
+        # One broadcaster per process feeds every /api/stream listener
+        broadcast_manager = BroadcastManager()
+        app.config['broadcast_manager'] = broadcast_manager
+        
+        # Serve large audiences from an event loop instead of one Flask thread per listener
+        app.config['stream_fanout'] = None
+        if app.config['STREAM_FANOUT_PORT'] and background_services:
+            stream_fanout = StreamFanoutServer(
+                broadcast_manager,
+                port=app.config['STREAM_FANOUT_PORT'],
+                max_lag_seconds=app.config['STREAM_MAX_LAG_SECONDS'],
+                station_name=app.config['STATION_NAME']
+            )
+            try:
+                stream_fanout.start()
+                app.config['stream_fanout'] = stream_fanout
+            except OSError as e:
+                # /api/stream keeps working; the fan-out reports as not enabled
+                print(f"Stream fan-out could not listen on port {app.config['STREAM_FANOUT_PORT']}: {str(e)}")
+        
+        # Live mode generates transitions just ahead of the broadcast playhead
+        app.config['live_show_scheduler'] = LiveShowScheduler(
+            ai_radio_generator,
+            broadcast_manager,
+            os.path.join(CACHE_DIR, 'audio', 'live'),
+            app=app,
+            lookahead_seconds=app.config['LIVE_LOOKAHEAD_MINUTES'] * 60
+        )
+        
+        # Keep cache/ and cache/audio bounded; never evict what is on air or queued, or finished shows
+        max_age_seconds = app.config['CACHE_MAX_AGE_DAYS'] * 86400
+        quotas = [
+            CacheQuota(CACHE_DIR, int(app.config['CACHE_MAX_MB'] * 2**20),
+                       app.config['CACHE_MAX_FILES'], max_age_seconds),
+            CacheQuota(os.path.join(CACHE_DIR, 'audio'), int(app.config['CACHE_AUDIO_MAX_MB'] * 2**20),
+                       app.config['CACHE_MAX_FILES'], max_age_seconds)
+        ]
+        library_max_bytes = int(app.config['TRANSITION_LIBRARY_MAX_MB'] * 2**20)
+        if app.config['TRANSITION_LIBRARY_ENABLED']:
+            # The library has its own disk budget; least recently used clips go first
+            quotas.append(CacheQuota(os.path.join(CACHE_DIR, 'audio', 'transitions'), library_max_bytes,
+                                     app.config['CACHE_MAX_FILES'], max_age_seconds))
+        # Pins are shared through files so the sweeper sees shows assembled in other processes
+        cache_manager = CacheManager(quotas, sweep_interval=app.config['CACHE_SWEEP_INTERVAL'],
+                                     pin_dir=os.path.join(CACHE_DIR, '.pins'))
+        cache_manager.add_pin_source(
+            lambda: [broadcast_manager.current_audio] + broadcast_manager.get_queue()
+            if broadcast_manager.is_broadcasting else []
+        )
+        cache_manager.add_pin_source(lambda: finished_show_paths(os.path.join(CACHE_DIR, 'audio')))
+        ai_radio_generator.set_cache_manager(cache_manager)
+        app.config['live_show_scheduler'].set_cache_manager(cache_manager)
+        if background_services:
+            cache_manager.start()
+        app.config['cache_manager'] = cache_manager
+        
+        # Every process looks transitions up; only one fills the library in the background
+        app.config['transition_library'] = None
+        if app.config['TRANSITION_LIBRARY_ENABLED']:
+            transition_library = TransitionLibrary(
+                ai_radio_generator,
+                os.path.join(CACHE_DIR, 'audio', 'transitions'),
+                app=app,
+                styles=app.config['TRANSITION_LIBRARY_STYLES'],
+                max_calls_per_day=app.config['TRANSITION_LIBRARY_MAX_CALLS_PER_DAY'],
+                max_bytes=library_max_bytes,
+                fill_interval=app.config['TRANSITION_LIBRARY_INTERVAL'],
+                is_idle=task_processor.is_idle,
+                touch=cache_manager.touch
+            )
+            ai_radio_generator.set_transition_library(transition_library)
+            if background_services:
+                transition_library.start()
+            app.config['transition_library'] = transition_library
+        
         # Initialize other services with app context
         init_app(app)
     
     # Register blueprints with app context
     app.register_blueprint(music_bp, url_prefix='/api')
+    app.register_blueprint(broadcast_bp, url_prefix='/api')
     
     return app
 
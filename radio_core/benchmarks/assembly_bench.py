@@ -0,0 +1,313 @@
+"""
+Measure how show assembly scales with the number and format of segments.
+
+Times AIRadioGenerator.combine_audio_files and
+audio_combiner.combine_audio_segments on shows of 5, 20, 50 and 100
+segments (an intro, songs and the transitions between them) and reports
+seconds per hour of audio and peak memory. Songs are synthetic tones of
+varying length in the chosen formats; intro and transitions are MP3, like
+the speech the pipeline generates.
+
+Usage (from radio_core/):
+    python benchmarks/assembly_bench.py
+    python benchmarks/assembly_bench.py --segments 5,20 --formats wav --json assembly.json
+    python benchmarks/assembly_bench.py --functions combine_audio_segments --tracemalloc
+
+Each measurement runs in a fresh process, so its peak RSS is not inflated by
+earlier runs. Decoding and encoding happen in ffmpeg subprocesses, whose
+peak RSS is reported separately (including the catalog's metadata probes).
+With linear scaling, seconds per audio-hour stays flat as segments are
+added; "scaling" is the ratio between the largest and smallest show.
+"""
+import os
+import sys
+import contextlib
+import json
+import math
+import time
+import queue
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline_bench import current_rss, git_revision, peak_rss
+from synthetic_audio import write_audio
+
+FUNCTIONS = ('combine_audio_files', 'combine_audio_segments')
+ARTIST = 'Assembly Bench'
+# Length range of generated intro and transition speech
+SPOKEN_SECONDS = (5.0, 30.0)
+
+
+def _show_layout(segments: int):
+    """Split a segment count into songs and transitions (plus one intro)"""
+    songs = math.ceil(segments / 2)
+    return songs, max(segments - 1 - songs, 0)
+
+
+class SegmentPool:
+    """Synthetic segments generated once and shared by every show size"""
+
+    def __init__(self, root: str, min_seconds: float, max_seconds: float, seed: int = 0):
+        self.root = root
+        self.rng = random.Random(seed)
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.song_seconds = []
+        self.spoken_seconds = []
+        self._songs = {}  # Format -> generated song paths
+        self._spoken = []
+
+    def _lengths(self, lengths: list, count: int, low: float, high: float) -> list:
+        while len(lengths) < count:
+            lengths.append(round(self.rng.uniform(low, high), 1))
+        return lengths[:count]
+
+    def songs(self, audio_format: str, count: int) -> list:
+        lengths = self._lengths(self.song_seconds, count, self.min_seconds, self.max_seconds)
+        paths = self._songs.setdefault(audio_format, [])
+        directory = os.path.join(self.root, audio_format)
+        os.makedirs(directory, exist_ok=True)
+        while len(paths) < count:
+            i = len(paths)
+            path = os.path.join(directory, f'Song {i + 1:03d}.{audio_format}')
+            paths.append(write_audio(path, lengths[i], frequency=220 + 5 * i, seed=i))
+        return paths[:count]
+
+    def spoken(self, count: int) -> list:
+        """Intro followed by transitions, named like the pipeline names them"""
+        lengths = self._lengths(self.spoken_seconds, count, *SPOKEN_SECONDS)
+        directory = os.path.join(self.root, 'spoken')
+        os.makedirs(directory, exist_ok=True)
+        while len(self._spoken) < count:
+            i = len(self._spoken)
+            name = f'{ARTIST}_radio_intro_combined.mp3' if i == 0 else f'{ARTIST}_transition_{i - 1}_bench.mp3'
+            self._spoken.append(write_audio(os.path.join(directory, name), lengths[i], kind='noise', seed=1000 + i))
+        return self._spoken[:count]
+
+
+def prepare_show(pool: SegmentPool, work_dir: str, segments: int, audio_format: str) -> dict:
+    """
+    Lay out one show: a BACKEND_ROOT whose artist folder holds just its songs,
+    and the segment list in play order (intro, song, transition, song, ...)
+    """
+    song_count, transition_count = _show_layout(segments)
+    songs = pool.songs(audio_format, song_count)
+    spoken = pool.spoken(1 + transition_count)
+
+    backend_root = os.path.join(work_dir, f'show_{audio_format}_{segments}')
+    artist_dir = os.path.join(backend_root, 'music_uploads', ARTIST)
+    os.makedirs(artist_dir, exist_ok=True)
+    os.makedirs(os.path.join(backend_root, 'data'), exist_ok=True)
+    for path in songs:
+        target = os.path.join(artist_dir, os.path.basename(path))
+        if not os.path.exists(target):
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copy(path, target)
+
+    ordered = [spoken[0]]
+    for i, path in enumerate(songs):
+        ordered.append(os.path.join(artist_dir, os.path.basename(path)))
+        if i < transition_count:
+            ordered.append(spoken[1 + i])
+    audio_seconds = sum(pool.song_seconds[:song_count]) + sum(pool.spoken_seconds[:1 + transition_count])
+    return {
+        'backend_root': backend_root,
+        'segments': ordered,
+        'songs': song_count,
+        'transitions': transition_count,
+        'audio_seconds': round(audio_seconds, 1),
+        'input_bytes': sum(os.path.getsize(path) for path in ordered)
+    }
+
+
+def _measure(function: str, show: dict, output_path: str, use_tracemalloc: bool, results):
+    """Run one assembly in this (fresh) process and report time and memory"""
+    try:
+        if function == 'combine_audio_files':
+            from flask import Flask
+            from services.ai_radio_generator import AIRadioGenerator
+            from services.music_manager import MusicManager
+
+            app = Flask('assembly_bench')
+            app.config.update(BACKEND_ROOT=show['backend_root'])
+            context = app.app_context()
+            context.push()
+            # Only the catalog is needed; skip loading the Whisper model
+            generator = AIRadioGenerator.__new__(AIRadioGenerator)
+            generator.music_manager = MusicManager()
+            generator.music_manager.metadata.wait_idle()
+            run = lambda: generator.combine_audio_files(show['segments'], output_path, True, ARTIST)
+        else:
+            from services.audio_combiner import combine_audio_segments
+            run = lambda: combine_audio_segments(show['segments'], output_path)
+
+        baseline_rss = current_rss()
+        if use_tracemalloc:
+            tracemalloc.start()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            ok = run()  # Silence the per-segment progress output
+        seconds = time.perf_counter() - start
+        cpu_seconds = time.process_time() - cpu_start
+        python_peak = tracemalloc.get_traced_memory()[1] if use_tracemalloc else None
+        tracemalloc.stop()
+
+        results.put({
+            'ok': ok is not False and os.path.exists(output_path) and os.path.getsize(output_path) > 0,
+            'seconds': round(seconds, 4),
+            'cpu_seconds': round(cpu_seconds, 4),
+            'baseline_rss_bytes': baseline_rss,
+            'peak_rss_bytes': peak_rss(),
+            'peak_child_rss_bytes': peak_rss(resource.RUSAGE_CHILDREN),
+            'python_peak_bytes': python_peak,
+            'output_bytes': os.path.getsize(output_path) if os.path.exists(output_path) else 0
+        })
+    except Exception as e:
+        results.put({'ok': False, 'error': str(e)})
+
+
+def run_trial(function: str, show: dict, output_path: str, use_tracemalloc: bool) -> dict:
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(function, show, output_path, use_tracemalloc, results))
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():  # Killed, e.g. by the OOM killer
+                result = {'ok': False, 'error': f"Process exited with code {process.exitcode}"}
+    process.join()
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    return result
+
+
+def run_benchmark(segment_counts, formats, functions, min_seconds: float, max_seconds: float,
+                  repeat: int, use_tracemalloc: bool, keep: bool) -> dict:
+    work_dir = tempfile.mkdtemp(prefix='assembly_bench_')
+    pool = SegmentPool(os.path.join(work_dir, 'pool'), min_seconds, max_seconds)
+    runs = []
+    try:
+        for audio_format in formats:
+            for segments in segment_counts:
+                show = prepare_show(pool, work_dir, segments, audio_format)
+                audio_hours = show['audio_seconds'] / 3600
+                for function in functions:
+                    trials = [
+                        run_trial(function, show, os.path.join(work_dir, f'{function}.mp3'), use_tracemalloc)
+                        for _ in range(repeat)
+                    ]
+                    failed = [trial for trial in trials if not trial['ok']]
+                    best = min((t for t in trials if t['ok']), key=lambda t: t['seconds'], default=None)
+                    run = {
+                        'function': function,
+                        'format': audio_format,
+                        'segments': segments,
+                        'songs': show['songs'],
+                        'transitions': show['transitions'],
+                        'audio_seconds': show['audio_seconds'],
+                        'input_bytes': show['input_bytes'],
+                        'ok': best is not None and not failed,
+                        'errors': [trial.get('error') for trial in failed if trial.get('error')]
+                    }
+                    if best:
+                        run.update(best)
+                        run['seconds_per_audio_hour'] = round(best['seconds'] / audio_hours, 2)
+                        run['peak_rss_bytes'] = max(t['peak_rss_bytes'] for t in trials if t['ok'])
+                        run['peak_rss_per_audio_hour'] = int(run['peak_rss_bytes'] / audio_hours)
+                    runs.append(run)
+                    print(_format_row(run), flush=True)
+    finally:
+        if keep:
+            print(f"Kept {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        **git_revision(),
+        'params': {
+            'segments': list(segment_counts),
+            'formats': list(formats),
+            'song_seconds': [min_seconds, max_seconds],
+            'spoken_seconds': list(SPOKEN_SECONDS),
+            'repeat': repeat
+        },
+        'runs': runs,
+        'scaling': _scaling(runs)
+    }
+
+
+def _scaling(runs: list) -> dict:
+    """Seconds per audio-hour of the largest show divided by that of the smallest, per function and format"""
+    scaling = {}
+    for function in FUNCTIONS:
+        for audio_format in {run['format'] for run in runs}:
+            points = sorted((run['segments'], run['seconds_per_audio_hour']) for run in runs
+                            if run['function'] == function and run['format'] == audio_format and run['ok'])
+            if len(points) >= 2 and points[0][1] > 0:
+                scaling[f'{function}/{audio_format}'] = round(points[-1][1] / points[0][1], 2)
+    return scaling
+
+
+def _format_row(run: dict) -> str:
+    if not run['ok']:
+        return f"{run['function']:<24} {run['format']:<4} {run['segments']:>4} segments  FAILED {run['errors']}"
+    return (f"{run['function']:<24} {run['format']:<4} {run['segments']:>4} segments "
+            f"{run['audio_seconds'] / 60:7.1f} min  {run['seconds']:8.2f} s  "
+            f"{run['seconds_per_audio_hour']:8.1f} s/audio-h  "
+            f"peak {run['peak_rss_bytes'] / 2 ** 20:7.1f} MiB  ffmpeg {run['peak_child_rss_bytes'] / 2 ** 20:6.1f} MiB")
+
+
+def _int_list(value: str):
+    return [int(item) for item in value.split(',') if item]
+
+
+def _str_list(choices):
+    def parse(value: str):
+        items = [item for item in value.split(',') if item]
+        unknown = set(items) - set(choices)
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown value(s): {', '.join(sorted(unknown))}")
+        return items
+    return parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--segments', type=_int_list, default=[5, 20, 50, 100],
+                        help='Comma-separated segment counts per show (default: 5,20,50,100)')
+    parser.add_argument('--formats', type=_str_list(('mp3', 'wav', 'm4a')), default=['mp3', 'wav', 'm4a'],
+                        help='Comma-separated song formats (default: mp3,wav,m4a)')
+    parser.add_argument('--functions', type=_str_list(FUNCTIONS), default=list(FUNCTIONS),
+                        help='Comma-separated functions to measure (default: both)')
+    parser.add_argument('--min-seconds', type=float, default=20.0, help='Shortest song (default: 20)')
+    parser.add_argument('--max-seconds', type=float, default=60.0, help='Longest song (default: 60)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per measurement; the fastest is kept (default: 1)')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='Also report peak Python heap allocations (slows assembly down)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated segments for inspection')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    result = run_benchmark(sorted(args.segments), args.formats, args.functions, args.min_seconds,
+                           args.max_seconds, args.repeat, args.tracemalloc, args.keep)
+    print(json.dumps(result['scaling'], indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
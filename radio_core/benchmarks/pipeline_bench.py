@@ -0,0 +1,380 @@
+"""
+Benchmark the radio generation pipeline on a synthetic catalog.
+
+Builds a throwaway BACKEND_ROOT with a music_uploads/<artist>/ folder of
+generated tones or noise, replaces the OpenAI, Ollama and ElevenLabs calls
+with stubs that sleep for a fixed latency, then times each stage on its own
+(transcription, script, SSML, TTS, transitions, assembly) and a full
+generate_radio task through TaskProcessor.
+
+Usage (from radio_core/):
+    python benchmarks/pipeline_bench.py --songs 5 --song-seconds 60
+    python benchmarks/pipeline_bench.py --songs 20 --transitions --json results/$(git rev-parse --short HEAD).json
+    python benchmarks/pipeline_bench.py --stub-transcription 0.05 --mode e2e
+
+Whisper runs for real unless --stub-transcription is given, so transcription
+numbers depend on the machine. Peak RSS is the process high-water mark, so a
+stage's peak includes everything that ran before it.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_audio import silent_mp3_bytes, write_audio
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATES_PATH = os.path.join(REPO_DIR, 'data', 'radio_intro_templates.json')
+ARTIST = 'Bench Artist'
+# Speaking rate used to size the fake TTS audio
+SPOKEN_CHARS_PER_SECOND = 15
+# Spoken stand-in returned by the LLM stubs (about 80 words, like a real intro)
+_SCRIPT = ' '.join(
+    ["Good evening and welcome back, this is your late night companion on the airwaves."] * 5
+)
+
+
+def git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    status = git('status', '--porcelain')
+    return {'commit': git('rev-parse', 'HEAD'), 'dirty': bool(status) if status is not None else None}
+
+
+def current_rss() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss()
+
+
+def peak_rss(who=resource.RUSAGE_SELF) -> int:
+    """High-water RSS in bytes (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    usage = resource.getrusage(who).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def build_catalog(root: str, songs: int, song_seconds: float, kind: str, audio_format: str) -> dict:
+    """Create BACKEND_ROOT with the intro templates and one artist's synthetic songs"""
+    os.makedirs(os.path.join(root, 'data'), exist_ok=True)
+    shutil.copy(TEMPLATES_PATH, os.path.join(root, 'data'))
+    artist_dir = os.path.join(root, 'music_uploads', ARTIST)
+    os.makedirs(artist_dir, exist_ok=True)
+
+    durations = {}
+    started = time.perf_counter()
+    for i in range(songs):
+        path = os.path.join(artist_dir, f'Song {i + 1:03d}.{audio_format}')
+        write_audio(path, song_seconds, kind=kind, frequency=220 + 55 * i, seed=i)
+        durations[os.path.abspath(path)] = song_seconds
+    return {
+        'songs': songs,
+        'song_seconds': song_seconds,
+        'audio_seconds': songs * song_seconds,
+        'kind': kind,
+        'format': audio_format,
+        'bytes': sum(os.path.getsize(path) for path in durations),
+        'build_seconds': round(time.perf_counter() - started, 3),
+        'durations': durations
+    }
+
+
+def install_api_stubs(llm_latency: float, tts_latency: float, tts_latency_per_char: float) -> dict:
+    """
+    Replace the OpenAI, Ollama and ElevenLabs calls with deterministic stubs
+
+    Returns:
+        dict: Call counts per API, updated as the stubs are used
+    """
+    import openai
+    import requests
+
+    calls = {'openai': 0, 'ollama': 0, 'elevenlabs': 0}
+
+    def reply(prompt: str) -> str:
+        if 'SSML' in prompt:
+            return f'<speak><prosody rate="medium">{_SCRIPT}</prosody><break time="500ms"/></speak>'
+        return _SCRIPT
+
+    def chat_completion(model=None, messages=(), max_tokens=300, **kwargs):
+        calls['openai'] += 1
+        time.sleep(llm_latency)
+        prompt = messages[-1]['content'] if messages else ''
+        content = reply(prompt)
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+    real_post = requests.post
+
+    def post(url, *args, **kwargs):
+        payload = kwargs.get('json') or {}
+        if url.startswith('http://localhost:11434/'):
+            calls['ollama'] += 1
+            time.sleep(llm_latency)
+            content = reply(payload.get('prompt', ''))
+            return SimpleNamespace(status_code=200, text='', json=lambda: {
+                'response': content,
+                'prompt_eval_count': len(payload.get('prompt', '')) // 4,
+                'eval_count': len(content) // 4
+            })
+        if url.startswith('https://api.elevenlabs.io/'):
+            calls['elevenlabs'] += 1
+            text = payload.get('text', '')
+            time.sleep(tts_latency + tts_latency_per_char * len(text))
+            return SimpleNamespace(status_code=200, text='',
+                                   content=silent_mp3_bytes(len(text) / SPOKEN_CHARS_PER_SECOND))
+        return real_post(url, *args, **kwargs)
+
+    openai.ChatCompletion = SimpleNamespace(create=chat_completion)
+    requests.post = post
+    return calls
+
+
+def install_transcription_stub(durations: dict, realtime_factor: float):
+    """Replace Whisper with a stub that takes realtime_factor seconds per second of audio"""
+    import services.ai_radio_generator as ai_radio_generator
+
+    class StubTranscriber:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def transcribe(self, audio_path: str) -> str:
+            time.sleep(durations.get(os.path.abspath(audio_path), 0.0) * realtime_factor)
+            return 'la la la, synthetic lyrics for a synthetic song'
+
+    ai_radio_generator.WhisperTranscriber = StubTranscriber
+
+
+def _clear_transcripts(songs):
+    """Remove cached transcripts so transcription is measured again"""
+    for song in songs:
+        json_path = os.path.splitext(song['path'])[0] + '.json'
+        if os.path.exists(json_path):
+            os.remove(json_path)
+
+
+def run_stages(generator, output_dir: str, enable_dj_transitions: bool, dj_options: dict) -> dict:
+    """Time each pipeline stage on its own, feeding each stage the previous one's output"""
+    from services.audio_generator import AudioGenerator
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+
+    def stage(name, func):
+        start = time.perf_counter()
+        value = func()
+        results[name] = {
+            'seconds': round(time.perf_counter() - start, 4),
+            'rss_bytes': current_rss(),
+            'peak_rss_bytes': peak_rss()
+        }
+        return value
+
+    songs = generator.music_manager.get_artist_songs(ARTIST)
+    _clear_transcripts(songs)
+    songs_data = stage('transcription', lambda: generator.get_songs_data(ARTIST))
+    script = stage('script', lambda: generator.generate_enhanced_script(ARTIST, songs_data))
+    ssml = stage('ssml', lambda: generator.enhance_script_with_emphasis(script))
+
+    intro_path = os.path.join(output_dir, f'{ARTIST}_radio_intro_combined.mp3')
+    stage('tts', lambda: AudioGenerator().generate_radio_intro_audio(ssml, output_path=intro_path, use_ssml=True))
+
+    transitions = []
+    if enable_dj_transitions:
+        transitions = stage('transitions', lambda: [
+            generator.generate_transition_audio(ARTIST, i, songs[i], songs[i + 1], dj_options, output_dir)
+            for i in range(len(songs) - 1)
+        ])
+
+    audio_files = [intro_path]
+    for i, song in enumerate(songs):
+        audio_files.append(os.path.abspath(song['path']))
+        if i < len(transitions):
+            audio_files.append(transitions[i])
+    show_path = os.path.join(output_dir, f'{ARTIST}_full_show.mp3')
+    combined = stage('assembly', lambda: generator.combine_audio_files(
+        audio_files, show_path, enable_dj_transitions, ARTIST
+    ))
+    results['assembly']['ok'] = bool(combined) and os.path.exists(show_path)
+    return results
+
+
+def _stage_totals() -> dict:
+    """Cumulative seconds per stage from the pipeline's stage histogram"""
+    from services.metrics import REGISTRY, STAGE_SECONDS
+
+    totals = {}
+    prefix = f'{STAGE_SECONDS.name}_sum{{'
+    for line in REGISTRY.render().splitlines():
+        if line.startswith(prefix):
+            labels, value = line.rsplit(' ', 1)
+            totals[labels.split('stage="', 1)[1].split('"', 1)[0]] = float(value)
+    return totals
+
+
+def make_task_processor(app, generator):
+    """One TaskProcessor for all end-to-end runs; each one adds a log handler and listener thread"""
+    from services.task_processor import TaskProcessor
+
+    task_processor = TaskProcessor(os.path.join(app.config['BACKEND_ROOT'], 'logs'), app.config)
+    task_processor.set_ai_radio_generator(generator)
+    task_processor.set_app(app)
+    return task_processor
+
+
+def close_task_processor(task_processor):
+    """Stop the workers and the log listener, and detach the processor's handler"""
+    task_processor.stop()
+    task_processor.log_manager.stop()
+    task_processor.logger.removeHandler(task_processor.log_manager.queue_handler)
+
+
+def run_end_to_end(task_processor, generator, enable_dj_transitions: bool, dj_options: dict, timeout: float) -> dict:
+    """Run one generate_radio task through TaskProcessor and wait for it to finish"""
+    from services.task_processor import FINISHED_STATES
+
+    _clear_transcripts(generator.music_manager.get_artist_songs(ARTIST))
+    before = _stage_totals()
+    start = time.perf_counter()
+    task = task_processor.create_task('generate_radio', {
+        'artist_name': ARTIST,
+        'enable_dj_transitions': enable_dj_transitions,
+        'dj_options': dj_options
+    })
+    status = task_processor.get_task_status(task['task_id'])
+    while status['status'] not in FINISHED_STATES and time.perf_counter() - start < timeout:
+        time.sleep(0.05)
+        status = task_processor.get_task_status(task['task_id'])
+    wall = time.perf_counter() - start
+
+    after = _stage_totals()
+    return {
+        'status': status['status'],
+        'error': status['error'],
+        'wall_seconds': round(wall, 4),
+        'stages': {name: round(total - before.get(name, 0.0), 4) for name, total in after.items()
+                   if total - before.get(name, 0.0) > 0},
+        'peak_rss_bytes': peak_rss()
+    }
+
+
+def run_benchmark(args) -> dict:
+    root = args.workdir or tempfile.mkdtemp(prefix='pipeline_bench_')
+    previous_dir = os.getcwd()
+    catalog = build_catalog(root, args.songs, args.song_seconds, args.kind, args.format)
+    durations = catalog.pop('durations')
+
+    calls = install_api_stubs(args.llm_latency, args.tts_latency, args.tts_latency_per_char)
+    if args.stub_transcription is not None:
+        install_transcription_stub(durations, args.stub_transcription)
+
+    from flask import Flask
+    from services.ai_radio_generator import AIRadioGenerator
+
+    app = Flask('pipeline_bench')
+    app.config.update(BACKEND_ROOT=root, PROJECT_ROOT=root)
+    dj_options = {'style': 'smooth', 'length': 'medium'}
+
+    result = {
+        **git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'params': {
+            'llm': args.llm,
+            'llm_latency': args.llm_latency,
+            'tts_latency': args.tts_latency,
+            'tts_latency_per_char': args.tts_latency_per_char,
+            'transcription': 'whisper' if args.stub_transcription is None else 'stub',
+            'stub_transcription_factor': args.stub_transcription,
+            'transitions': args.transitions
+        },
+        'catalog': catalog
+    }
+
+    # generate_audio writes to cache/audio relative to the working directory
+    os.chdir(root)
+    try:
+        with app.app_context():
+            start = time.perf_counter()
+            generator = AIRadioGenerator(use_openai=args.llm == 'openai')
+            result['setup_seconds'] = round(time.perf_counter() - start, 4)
+
+            if args.mode in ('stages', 'all'):
+                result['stages'] = run_stages(generator, os.path.join(root, 'bench_output'),
+                                              args.transitions, dj_options)
+            if args.mode in ('e2e', 'all') and args.repeat > 0:
+                task_processor = make_task_processor(app, generator)
+                try:
+                    for repetition in range(args.repeat):
+                        run = run_end_to_end(task_processor, generator, args.transitions,
+                                             {**dj_options, 'enable_dj_transitions': args.transitions},
+                                             args.timeout)
+                        result.setdefault('end_to_end', []).append(run)
+                finally:
+                    close_task_processor(task_processor)
+    finally:
+        os.chdir(previous_dir)
+        if not args.keep and not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    result['api_calls'] = dict(calls)
+    result['peak_rss_bytes'] = peak_rss()
+    result['peak_child_rss_bytes'] = peak_rss(resource.RUSAGE_CHILDREN)  # Largest subprocess, usually ffmpeg
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--songs', type=int, default=5, help='Songs in the synthetic catalog (default: 5)')
+    parser.add_argument('--song-seconds', type=float, default=60.0, help='Length of each song (default: 60)')
+    parser.add_argument('--kind', choices=('tone', 'noise'), default='tone', help='Synthetic audio (default: tone)')
+    parser.add_argument('--format', choices=('wav', 'mp3', 'm4a'), default='wav',
+                        help='Song file format; mp3 and m4a need ffmpeg (default: wav)')
+    parser.add_argument('--transitions', action='store_true', help='Generate DJ transitions between songs')
+    parser.add_argument('--llm', choices=('openai', 'ollama'), default='openai',
+                        help='LLM backend whose stub is used (default: openai)')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='Seconds per stubbed LLM call (default: 1)')
+    parser.add_argument('--tts-latency', type=float, default=0.5,
+                        help='Fixed seconds per stubbed ElevenLabs call (default: 0.5)')
+    parser.add_argument('--tts-latency-per-char', type=float, default=0.001,
+                        help='Additional stubbed ElevenLabs seconds per character (default: 0.001)')
+    parser.add_argument('--stub-transcription', type=float, default=None, metavar='FACTOR',
+                        help='Replace Whisper with a stub taking FACTOR seconds per second of audio')
+    parser.add_argument('--mode', choices=('stages', 'e2e', 'all'), default='all',
+                        help='Run the stages separately, a full task, or both (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='End-to-end runs (default: 1)')
+    parser.add_argument('--timeout', type=float, default=3600.0, help='Give up on an end-to-end run after this long')
+    parser.add_argument('--workdir', help='Build the catalog here instead of a temporary directory (kept)')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary directory for inspection')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            f.write(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Simulate many local listeners against StreamFanoutServer and report the
+server-side CPU and memory cost per listener.
+
+Usage (from radio_core/):
+    python benchmarks/stream_fanout_bench.py --listeners 2000 --duration 30
+    python benchmarks/stream_fanout_bench.py --listeners 500 --slow-fraction 0.1 --json results.json
+
+Listeners run in a separate process so only the broadcaster and fan-out
+server are measured. Slow listeners connect and never read, to exercise
+backpressure and slow-client dropping.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.broadcast_manager import BroadcastManager
+from services.stream_fanout import StreamFanoutServer
+
+# One MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, no padding (417 bytes, ~26 ms)
+_SILENT_FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+_FRAME_SECONDS = 1152 / 44100
+
+
+def _write_synthetic_mp3(seconds: float) -> str:
+    path = os.path.join(tempfile.mkdtemp(prefix='fanout_bench_'), 'synthetic_show.mp3')
+    with open(path, 'wb') as f:
+        f.write(_SILENT_FRAME * int(seconds / _FRAME_SECONDS + 1))
+    return path
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # Peak RSS in KiB on Linux, bytes on macOS; only an approximation of current use
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def _raise_fd_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = hard if hard != resource.RLIM_INFINITY else max(soft, needed)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(target, max(needed, soft)), hard))
+
+
+async def _slow_listener(port: int, stop_at: float, counters: dict):
+    """Connect and never read, so the server's queue for this socket only grows"""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # A tiny receive window makes the backlog build on the server, not in the kernel
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    try:
+        await loop.sock_connect(sock, ('127.0.0.1', port))
+        await loop.sock_sendall(sock, b'GET /stream HTTP/1.0\r\nIcy-MetaData: 0\r\n\r\n')
+    except OSError:
+        counters['failed'] += 1
+        sock.close()
+        return
+    counters['connected'] += 1
+    try:
+        await asyncio.sleep(max(stop_at - time.time(), 0))
+    finally:
+        sock.close()
+
+
+async def _listener(port: int, stop_at: float, counters: dict):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        counters['failed'] += 1
+        return
+    writer.write(b'GET /stream HTTP/1.0\r\nIcy-MetaData: 0\r\n\r\n')
+    await writer.drain()
+    counters['connected'] += 1
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                if time.time() < stop_at:
+                    counters['disconnected'] += 1
+                break
+            counters['bytes'] += len(data)
+    except (asyncio.CancelledError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _run_listeners(port: int, count: int, slow_count: int, duration: float, ramp: float):
+    counters = {'connected': 0, 'failed': 0, 'disconnected': 0, 'bytes': 0}
+    stop_at = time.time() + ramp + duration
+    tasks = []
+    for i in range(count):
+        if i < slow_count:
+            tasks.append(asyncio.ensure_future(_slow_listener(port, stop_at, counters)))
+        else:
+            tasks.append(asyncio.ensure_future(_listener(port, stop_at, counters)))
+        if ramp and count:
+            await asyncio.sleep(ramp / count)
+    await asyncio.sleep(max(stop_at - time.time(), 0))
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return counters
+
+
+def _listener_process(port: int, count: int, slow_count: int, duration: float, ramp: float, results):
+    _raise_fd_limit(count + 64)
+    results.put(asyncio.run(_run_listeners(port, count, slow_count, duration, ramp)))
+
+
+def _measure(seconds: float):
+    """CPU seconds used by this process over an interval of wall time"""
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    time.sleep(seconds)
+    return time.process_time() - cpu_start, time.monotonic() - wall_start
+
+
+def run_benchmark(listeners: int, duration: float, slow_fraction: float, ramp: float, max_lag: float):
+    _raise_fd_limit(listeners + 64)
+    audio_file = _write_synthetic_mp3(duration + ramp + 30)
+
+    broadcast_manager = BroadcastManager()
+    server = StreamFanoutServer(broadcast_manager, host='127.0.0.1', port=0, max_lag_seconds=max_lag)
+    server.start()
+    broadcast_manager.start_broadcast(audio_file)
+
+    # Baseline: broadcaster and server with nobody listening
+    time.sleep(1)
+    baseline_rss = _rss_bytes()
+    baseline_cpu, baseline_wall = _measure(min(5.0, duration))
+
+    slow_count = int(listeners * slow_fraction)
+    results = multiprocessing.Queue()
+    clients = multiprocessing.Process(
+        target=_listener_process,
+        args=(server.port, listeners, slow_count, duration, ramp, results)
+    )
+    clients.start()
+
+    time.sleep(ramp)
+    peak_listeners = server.listener_count
+    loaded_cpu, loaded_wall = _measure(duration)
+    loaded_rss = _rss_bytes()
+    stats = server.get_stats(include_listeners=True)
+    peak_listeners = max(peak_listeners, stats['listeners'])
+
+    client_counters = results.get()
+    clients.join()
+    broadcast_manager.stop_broadcast()
+    server.stop()
+    os.remove(audio_file)
+
+    lags = sorted(listener['lag_seconds'] for listener in stats['listener_details'])
+    baseline_cpu_pct = 100 * baseline_cpu / baseline_wall
+    loaded_cpu_pct = 100 * loaded_cpu / loaded_wall
+    per_listener = max(peak_listeners, 1)
+
+    return {
+        'listeners_requested': listeners,
+        'slow_listeners': slow_count,
+        'peak_listeners': peak_listeners,
+        'duration_seconds': duration,
+        'client': client_counters,
+        'server': {
+            'dropped': stats['dropped'],
+            'baseline_cpu_percent': round(baseline_cpu_pct, 2),
+            'loaded_cpu_percent': round(loaded_cpu_pct, 2),
+            'cpu_percent_per_listener': round((loaded_cpu_pct - baseline_cpu_pct) / per_listener, 5),
+            'baseline_rss_mb': round(baseline_rss / 2**20, 1),
+            'loaded_rss_mb': round(loaded_rss / 2**20, 1),
+            'rss_kb_per_listener': round((loaded_rss - baseline_rss) / 1024 / per_listener, 2),
+            'lag_p50_seconds': lags[len(lags) // 2] if lags else 0.0,
+            'lag_p99_seconds': lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0,
+            'lag_max_seconds': lags[-1] if lags else 0.0
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listeners', type=int, default=1000, help='Simulated listeners (default: 1000)')
+    parser.add_argument('--duration', type=float, default=20.0, help='Measured seconds under load (default: 20)')
+    parser.add_argument('--ramp', type=float, default=5.0, help='Seconds over which listeners connect (default: 5)')
+    parser.add_argument('--slow-fraction', type=float, default=0.0,
+                        help='Fraction of listeners that never read (default: 0)')
+    parser.add_argument('--max-lag', type=float, default=10.0,
+                        help='Seconds of queued audio before a listener is dropped (default: 10)')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    result = run_benchmark(args.listeners, args.duration, args.slow_fraction, args.ramp, args.max_lag)
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            f.write(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Synthetic audio for benchmarks: tones, noise and silent MP3 bytes.
+
+WAV files are written with the standard library only; MP3 and M4A files are
+encoded from the WAV with pydub (which needs ffmpeg).
+"""
+import os
+import math
+import wave
+import random
+import shutil
+import tempfile
+from array import array
+
+SAMPLE_RATE = 44100
+
+# One MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, no padding (417 bytes, ~26 ms)
+_SILENT_FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+_FRAME_SECONDS = 1152 / 44100
+
+
+def silent_mp3_bytes(seconds: float) -> bytes:
+    """A decodable MP3 stream of silence, without needing an encoder"""
+    return _SILENT_FRAME * max(int(seconds / _FRAME_SECONDS), 1)
+
+
+def _one_second(kind: str, frequency: float, seed: int) -> array:
+    samples = array('h')
+    if kind == 'noise':
+        rng = random.Random(seed)
+        samples.extend(int(rng.uniform(-0.3, 0.3) * 32767) for _ in range(SAMPLE_RATE))
+    else:
+        step = 2 * math.pi * frequency / SAMPLE_RATE
+        samples.extend(int(0.3 * 32767 * math.sin(step * i)) for i in range(SAMPLE_RATE))
+    return samples
+
+
+def write_wav(path: str, seconds: float, kind: str = 'tone', frequency: float = 440.0, seed: int = 0,
+              channels: int = 2) -> str:
+    """
+    Write a 16-bit WAV file of a sine tone or white noise
+
+    Whole-number frequencies repeat exactly every second, so one second is
+    generated and written repeatedly to keep long files cheap to create.
+    """
+    second = _one_second(kind, round(frequency), seed)
+    if channels > 1:
+        interleaved = array('h', [0]) * (len(second) * channels)
+        for channel in range(channels):
+            interleaved[channel::channels] = second
+        second = interleaved
+    frame_bytes = 2 * channels
+    chunk = second.tobytes()
+    remaining = int(seconds * SAMPLE_RATE) * frame_bytes
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        while remaining > 0:
+            f.writeframes(chunk[:remaining])
+            remaining -= len(chunk)
+    return path
+
+
+def write_audio(path: str, seconds: float, kind: str = 'tone', frequency: float = 440.0, seed: int = 0) -> str:
+    """Write synthetic audio in the format given by the path's extension (.wav, .mp3 or .m4a)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.wav':
+        return write_wav(path, seconds, kind, frequency, seed)
+
+    from pydub import AudioSegment
+
+    formats = {'.mp3': ('mp3', None), '.m4a': ('ipod', 'aac')}
+    if extension not in formats:
+        raise ValueError(f"Unsupported synthetic audio format: {extension}")
+    export_format, codec = formats[extension]
+    scratch = tempfile.mkdtemp(prefix='synthetic_audio_')
+    try:
+        wav_path = write_wav(os.path.join(scratch, 'source.wav'), seconds, kind, frequency, seed)
+        AudioSegment.from_wav(wav_path).export(path, format=export_format, codec=codec, bitrate='192k')
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return path
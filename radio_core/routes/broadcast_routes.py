@@ -0,0 +1,219 @@
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from werkzeug.security import safe_join
+from services.stream_fanout import icy_name
+
+# Create blueprint
+broadcast_bp = Blueprint('broadcast', __name__)
+
+# Seconds a listener waits for new audio before re-checking the broadcast
+STREAM_READ_TIMEOUT = 5
+
+# Directories broadcast audio may be read from, by request 'source'
+AUDIO_SOURCES = {
+    'cache': 'CACHE_DIR',
+    'output': 'OUTPUT_DIR'
+}
+
+def _resolve_audio_file(audio_file, source):
+    """Resolve an audio_file inside an allowed directory"""
+    if not audio_file:
+        raise ValueError("audio_file is required")
+    if source not in AUDIO_SOURCES:
+        raise ValueError(f"Invalid source '{source}'. Use one of: {', '.join(AUDIO_SOURCES)}")
+    path = safe_join(current_app.config[AUDIO_SOURCES[source]], audio_file)
+    if path is None:
+        raise ValueError(f"Invalid audio_file: '{audio_file}'")
+    return path
+
+def _resolve_audio_files(data):
+    """Resolve a request's audio_file and/or audio_files list, in play order"""
+    source = data.get('source', 'cache')
+    audio_files = data.get('audio_files') or []
+    if not isinstance(audio_files, list):
+        raise ValueError("audio_files must be a list")
+    if data.get('audio_file'):
+        audio_files = [data['audio_file']] + audio_files
+    return [_resolve_audio_file(audio_file, source) for audio_file in audio_files]
+
+@broadcast_bp.route('/broadcast/start', methods=['POST'])
+def start_broadcast():
+    """Start broadcasting one show or a playlist"""
+    try:
+        data = request.json or {}
+        try:
+            audio_files = _resolve_audio_files(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not audio_files:
+            return jsonify({"error": "audio_file or audio_files is required"}), 400
+
+        broadcast_manager = current_app.config['broadcast_manager']
+        if broadcast_manager.is_broadcasting:
+            return jsonify({"error": "Broadcast is already running"}), 409
+
+        broadcast_manager.start_broadcast(
+            audio_files[0],
+            playlist=audio_files[1:],
+            repeat=bool(data.get('repeat', False))
+        )
+        return jsonify(broadcast_manager.get_status()), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@broadcast_bp.route('/broadcast/stop', methods=['POST'])
+def stop_broadcast():
+    """Stop the current broadcast"""
+    try:
+        broadcast_manager = current_app.config['broadcast_manager']
+        if not broadcast_manager.is_broadcasting:
+            return jsonify({"error": "No broadcast is running"}), 409
+
+        broadcast_manager.stop_broadcast()
+        return jsonify(broadcast_manager.get_status()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@broadcast_bp.route('/broadcast/queue', methods=['GET'])
+def get_broadcast_queue():
+    """Get the upcoming playlist items"""
+    broadcast_manager = current_app.config['broadcast_manager']
+    return jsonify({
+        "current_audio": broadcast_manager.current_audio,
+        "upcoming": broadcast_manager.get_queue(),
+        "repeat": broadcast_manager.repeat
+    }), 200
+
+@broadcast_bp.route('/broadcast/queue', methods=['POST'])
+def extend_broadcast_queue():
+    """Append files to the playlist while live"""
+    try:
+        data = request.json or {}
+        try:
+            audio_files = _resolve_audio_files(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not audio_files:
+            return jsonify({"error": "audio_file or audio_files is required"}), 400
+
+        broadcast_manager = current_app.config['broadcast_manager']
+        if 'repeat' in data:
+            broadcast_manager.repeat = bool(data['repeat'])
+        upcoming = broadcast_manager.enqueue(audio_files)
+        return jsonify({"upcoming": upcoming, "repeat": broadcast_manager.repeat}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@broadcast_bp.route('/broadcast/queue', methods=['DELETE'])
+def clear_broadcast_queue():
+    """Drop upcoming playlist items; the current item plays to its end"""
+    broadcast_manager = current_app.config['broadcast_manager']
+    return jsonify({"upcoming": broadcast_manager.clear_queue()}), 200
+
+@broadcast_bp.route('/broadcast/status', methods=['GET'])
+def get_broadcast_status():
+    """Get the current broadcast status"""
+    status = current_app.config['broadcast_manager'].get_status()
+    stream_fanout = current_app.config.get('stream_fanout')
+    if stream_fanout:
+        status['fanout'] = stream_fanout.get_stats()
+    return jsonify(status), 200
+
+@broadcast_bp.route('/broadcast/listeners', methods=['GET'])
+def get_broadcast_listeners():
+    """Get per-listener lag and throughput from the fan-out server"""
+    stream_fanout = current_app.config.get('stream_fanout')
+    if not stream_fanout:
+        return jsonify({"error": "Stream fan-out server is not enabled"}), 404
+    return jsonify(stream_fanout.get_stats(include_listeners=True)), 200
+
+@broadcast_bp.route('/stream', methods=['GET'])
+def stream_broadcast():
+    """
+    Icecast-compatible MP3 stream of the current broadcast.
+
+    Listeners are served from the broadcaster's shared ring buffer; no file
+    is opened per listener.
+    """
+    broadcast_manager = current_app.config['broadcast_manager']
+    if not broadcast_manager.is_broadcasting:
+        return jsonify({"error": "No broadcast is running"}), 404
+
+    stream_buffer = broadcast_manager.buffer
+
+    def generate():
+        position = stream_buffer.start_position()
+        while True:
+            chunks, position, closed = stream_buffer.read(position, timeout=STREAM_READ_TIMEOUT)
+            if chunks:
+                yield b''.join(chunks)
+            if closed:
+                break
+
+    headers = {
+        'Cache-Control': 'no-cache, no-store',
+        'Pragma': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'icy-name': icy_name(current_app.config.get('STATION_NAME', 'Offbeat Radio')),
+        'icy-pub': '0'
+    }
+    if broadcast_manager.bitrate:
+        headers['icy-br'] = str(broadcast_manager.bitrate // 1000)
+
+    return Response(stream_with_context(generate()), mimetype='audio/mpeg', headers=headers)
+
+@broadcast_bp.route('/live/start', methods=['POST'])
+def start_live_show():
+    """Put an artist's show on air, generating it just ahead of the playhead"""
+    try:
+        data = request.json or {}
+        artist_name = data.get('artist_name')
+        if not artist_name:
+            return jsonify({"error": "artist_name is required"}), 400
+
+        lookahead_minutes = data.get('lookahead_minutes')
+        if lookahead_minutes is not None:
+            try:
+                lookahead_minutes = float(lookahead_minutes)
+            except (TypeError, ValueError):
+                return jsonify({"error": "lookahead_minutes must be a number"}), 400
+            if lookahead_minutes <= 0:
+                return jsonify({"error": "lookahead_minutes must be positive"}), 400
+
+        live_show_scheduler = current_app.config['live_show_scheduler']
+        if live_show_scheduler.is_running:
+            return jsonify({"error": "A live show is already running"}), 409
+
+        try:
+            status = live_show_scheduler.start(
+                artist_name,
+                enable_dj_transitions=data.get('enable_dj_transitions', False),
+                dj_options=data.get('dj_options', {}),
+                lookahead_seconds=lookahead_minutes * 60 if lookahead_minutes else None
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 404
+        return jsonify(status), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@broadcast_bp.route('/live/stop', methods=['POST'])
+def stop_live_show():
+    """Stop generating the live show; queued audio keeps playing unless clear_queue is set"""
+    try:
+        data = request.json or {}
+        live_show_scheduler = current_app.config['live_show_scheduler']
+        if not live_show_scheduler.is_running:
+            return jsonify({"error": "No live show is running"}), 409
+
+        live_show_scheduler.stop(clear_queue=bool(data.get('clear_queue', False)))
+        return jsonify(live_show_scheduler.get_status()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@broadcast_bp.route('/live/status', methods=['GET'])
+def get_live_show_status():
+    """Get the state of the current or last live show"""
+    status = current_app.config['live_show_scheduler'].get_status()
+    if status is None:
+        return jsonify({"error": "No live show has been started"}), 404
+    return jsonify(status), 200
@@ -1,21 +1,46 @@
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+import json
+import threading
 from services.music_manager import MusicManager
 from services.progress_tracker import ProgressTracker
+from services.task_logging import read_task_log
+from services.task_events import format_sse
+from services.task_processor import FINISHED_STATES
+from services.media_delivery import send_media
+from services.upload_manager import UploadManager, UploadError
+from services.metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from services.task_profiler import resolve_profile_mode
 import os
 
 # Create blueprint
 music_bp = Blueprint('music', __name__)
 
+# Seconds between keep-alive comments on idle event streams
+SSE_KEEPALIVE_INTERVAL = 15
+# Reconnect delay suggested to EventSource clients
+SSE_RETRY_MS = 3000
+
 # Initialize services as None - will be set up in init_app
 music_manager = None
 progress_tracker = None
+upload_manager = None
+
+# Serialized catalog responses, valid for one catalog fingerprint
+_catalog_cache = {'fingerprint': None, 'bodies': {}}
+_catalog_cache_lock = threading.Lock()
 
 def init_app(app):
     """Initialize services with app context"""
-    global music_manager, progress_tracker
+    global music_manager, progress_tracker, upload_manager
     with app.app_context():
-        music_manager = MusicManager()
+        music_manager = app.config.get('music_manager') or MusicManager()
         progress_tracker = ProgressTracker()
+        upload_manager = UploadManager(
+            str(music_manager.base_path),
+            os.path.join(app.config['BACKEND_ROOT'], 'data', 'uploads')
+        )
 
 # Health check endpoint
 @music_bp.route('/health', methods=['GET'])
@@ -23,13 +48,82 @@ def health_check():
     """Check API health status"""
     return jsonify({"status": "healthy"}), 200
 
+@music_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose pipeline metrics in Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@music_bp.route('/cache', methods=['GET'])
+def get_cache_stats():
+    """Get cache usage and eviction counts from the last sweep"""
+    return jsonify(current_app.config['cache_manager'].get_stats()), 200
+
+@music_bp.route('/cache/sweep', methods=['POST'])
+def sweep_cache():
+    """Enforce cache quotas now instead of waiting for the sweeper"""
+    try:
+        return jsonify(current_app.config['cache_manager'].sweep()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _catalog_response(cache_key, build_payload):
+    """
+    Serve a catalog payload with an ETag derived from the catalog fingerprint.
+    
+    Matching If-None-Match requests get a 304 without touching the payload;
+    otherwise the serialized body is reused until the catalog changes.
+    """
+    music_manager.refresh()
+    fingerprint = music_manager.catalog_fingerprint
+    
+    if request.if_none_match.contains(fingerprint):
+        response = Response(status=304)
+    else:
+        with _catalog_cache_lock:
+            if _catalog_cache['fingerprint'] != fingerprint:
+                _catalog_cache['fingerprint'] = fingerprint
+                _catalog_cache['bodies'] = {}
+            body = _catalog_cache['bodies'].get(cache_key)
+        if body is None:
+            body = json.dumps(build_payload())
+            with _catalog_cache_lock:
+                if _catalog_cache['fingerprint'] == fingerprint:
+                    _catalog_cache['bodies'][cache_key] = body
+        response = Response(body, status=200, mimetype='application/json')
+    
+    response.set_etag(fingerprint)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@music_bp.route('/transition-library', methods=['GET'])
+def get_transition_library():
+    """Get the size and budget use of the pre-generated transition library"""
+    transition_library = current_app.config.get('transition_library')
+    if not transition_library:
+        return jsonify({"enabled": False}), 200
+    try:
+        return jsonify({"enabled": True, **transition_library.get_stats()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@music_bp.route('/transition-library/fill', methods=['POST'])
+def fill_transition_library():
+    """Pre-generate missing transitions now instead of at the next interval"""
+    transition_library = current_app.config.get('transition_library')
+    if not transition_library:
+        return jsonify({"error": "The transition library is disabled (TRANSITION_LIBRARY_ENABLED)"}), 409
+    try:
+        transition_library.trigger()
+        return jsonify({"message": "Transition library fill started"}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Artist endpoints
 @music_bp.route('/artists', methods=['GET'])
 def get_artists():
     """Get all artists"""
     try:
-        artists = music_manager.get_all_artists()
-        return jsonify({"artists": artists}), 200
+        return _catalog_response('artists', lambda: {"artists": music_manager.get_all_artists()})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -37,39 +131,105 @@ def get_artists():
 def get_artist_songs(artist_name):
     """Get all songs for a specific artist"""
     try:
-        songs = music_manager.get_artist_songs(artist_name)
-        return jsonify({"songs": songs}), 200
+        return _catalog_response(
+            f'songs:{artist_name}',
+            lambda: {"songs": music_manager.get_artist_songs(artist_name)}
+        )
     except ValueError as e:
         return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@music_bp.route('/artists/<artist_name>/songs', methods=['POST'])
+def upload_artist_song(artist_name):
+    """
+    Upload a song for an artist, streamed to disk in chunks.
+    
+    The body is the raw audio file; the name comes from ?filename= or X-Filename.
+    For resumable uploads send Upload-Id and Content-Range on every chunk.
+    Completed uploads are probed and transcribed in the background.
+    """
+    filename = request.args.get('filename') or request.headers.get('X-Filename')
+    if not filename:
+        return jsonify({"error": "File name is required (?filename= or X-Filename header)"}), 400
+    
+    try:
+        result = upload_manager.receive(
+            artist_name,
+            filename,
+            request.stream,
+            upload_id=request.headers.get('Upload-Id') or request.args.get('upload_id'),
+            content_range=request.headers.get('Content-Range'),
+            overwrite=request.args.get('overwrite', 'false').lower() == 'true'
+        )
+        if result['status'] == 'incomplete':
+            return jsonify(result), 200
+        
+        # Keep the upload hash, index the new file and probe its metadata in the background
+        music_manager.metadata.put(result['path'], sha256=result['sha256'])
+        music_manager.refresh(force=True)
+        
+        task_info = current_app.config['task_processor'].create_task('ingest_song', {
+            'artist_name': artist_name,
+            'song_name': result['song']
+        }, priority='batch')
+        result['ingest_task_id'] = task_info['task_id']
+        return jsonify(result), 201
+    except UploadError as e:
+        return jsonify({"error": str(e), **e.details}), e.status_code
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@music_bp.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload_status(upload_id):
+    """Get the offset to resume an interrupted upload from"""
+    upload = upload_manager.get_upload(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(upload), 200
+
 @music_bp.route('/artists-with-songs', methods=['GET'])
 def get_artists_with_songs():
     """Get up to 5 artists and their songs for UI"""
-    try:
-        artists = music_manager.get_all_artists()[:5]
+    def build_payload():
         result = []
-        for artist in artists:
+        for artist in music_manager.get_all_artists()[:5]:
             songs = music_manager.get_artist_songs(artist)
             result.append({
                 "artist": artist,
                 "songs": [song['name'] for song in songs]
             })
-        return jsonify({"artists": result}), 200
+        return {"artists": result}
+    
+    try:
+        return _catalog_response('artists-with-songs', build_payload)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # File serving endpoints
+def _send_media_from(dir_key, filename, as_attachment):
+    """Serve a file from a configured directory, offloading to nginx when mapped"""
+    cache_manager = current_app.config.get('cache_manager')
+    if cache_manager:
+        path = safe_join(current_app.config[dir_key], filename)
+        if path:
+            cache_manager.touch(path)
+    return send_media(
+        current_app.config[dir_key],
+        filename,
+        as_attachment=as_attachment,
+        accel_location=current_app.config['X_ACCEL_LOCATIONS'].get(dir_key)
+    )
+
 @music_bp.route('/audio/<path:filename>', methods=['GET'])
 def serve_audio_file(filename):
     """Serve audio files from the cache directory"""
-    return send_from_directory(current_app.config['CACHE_DIR'], filename, as_attachment=False)
+    return _send_media_from('CACHE_DIR', filename, as_attachment=False)
 
 @music_bp.route('/output/<path:filename>', methods=['GET'])
 def serve_output_file(filename):
     """Serve generated output files"""
-    return send_from_directory(current_app.config['OUTPUT_DIR'], filename, as_attachment=True)
+    return _send_media_from('OUTPUT_DIR', filename, as_attachment=True)
 
 # Task management endpoints
 @music_bp.route('/start-generation', methods=['POST'])
@@ -80,25 +240,38 @@ def start_generation():
         artist_name = data.get('artist_name')
         enable_dj_transitions = data.get('enable_dj_transitions', False)
         is_testing = data.get('is_testing', True)  # Default to testing mode
+        priority = data.get('priority')
         
         if not artist_name:
             return jsonify({"error": "Artist name is required"}), 400
         
         task_processor = current_app.config['task_processor']
         
-        # Check if there's already a task in progress
-        if task_processor.current_task:
+        try:
+            task_processor.resolve_priority(priority)
+            profile_mode = resolve_profile_mode(data.get('profile'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Check if this artist already has a show queued or in progress, alone or in a batch
+        active_task = task_processor.find_active_generation(artist_name)
+        if active_task:
             return jsonify({
-                "error": "Another task is currently in progress",
-                "current_task": task_processor.current_task['id']
+                "error": f"A task for artist '{artist_name}' is already queued or in progress",
+                "current_task": active_task['id']
             }), 409
         
         # Create new task with testing mode parameter
-        task_info = task_processor.create_task('generate_radio', {
+        params = {
             'artist_name': artist_name,
             'enable_dj_transitions': enable_dj_transitions,
             'is_testing': is_testing
-        })
+        }
+        if profile_mode:
+            params['profile'] = profile_mode
+        if data.get('incremental'):
+            params['incremental'] = True
+        task_info = task_processor.create_task('generate_radio', params, priority=priority)
         
         return jsonify({
             "message": f"Radio generation started in {'testing' if is_testing else 'production'} mode",
@@ -107,6 +280,88 @@ def start_generation():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@music_bp.route('/batch-generation', methods=['POST'])
+def start_batch_generation():
+    """Start generating shows for several artists as one task"""
+    try:
+        data = request.json or {}
+        artists = data.get('artists')
+        is_testing = data.get('is_testing', True)
+        priority = data.get('priority', 'batch')
+        max_concurrency = data.get('max_concurrency')
+        
+        if not isinstance(artists, list) or not artists:
+            return jsonify({"error": "A non-empty list of artists is required"}), 400
+        if max_concurrency is not None and (
+                isinstance(max_concurrency, bool) or not isinstance(max_concurrency, int) or max_concurrency < 1):
+            return jsonify({"error": "max_concurrency must be a positive integer"}), 400
+        
+        # Batch options apply to every artist unless an artist entry overrides them
+        plan = []
+        for artist in artists:
+            if isinstance(artist, str):
+                artist = {'artist_name': artist}
+            if not isinstance(artist, dict) or not artist.get('artist_name'):
+                return jsonify({"error": "Each artist must be a name or an object with artist_name"}), 400
+            plan.append({
+                'artist_name': artist['artist_name'],
+                'enable_dj_transitions': artist.get('enable_dj_transitions', data.get('enable_dj_transitions', False)),
+                'dj_options': artist.get('dj_options', data.get('dj_options') or {}),
+                'incremental': bool(artist.get('incremental', data.get('incremental', False)))
+            })
+        
+        names = [artist['artist_name'] for artist in plan]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            return jsonify({"error": f"Artists listed more than once: {', '.join(duplicates)}"}), 400
+        unknown = sorted(set(names) - set(music_manager.get_all_artists()))
+        if unknown:
+            return jsonify({"error": f"Artists not found: {', '.join(unknown)}"}), 404
+        
+        task_processor = current_app.config['task_processor']
+        try:
+            task_processor.resolve_priority(priority)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        conflicts = {}
+        for name in names:
+            active_task = task_processor.find_active_generation(name)
+            if active_task:
+                conflicts[name] = active_task['id']
+        if conflicts:
+            return jsonify({
+                "error": f"Shows already queued or in progress for: {', '.join(conflicts)}",
+                "conflicts": conflicts
+            }), 409
+        
+        params = {
+            'artists': plan,
+            'is_testing': is_testing
+        }
+        if max_concurrency:
+            params['max_concurrency'] = max_concurrency
+        task_info = task_processor.create_task('generate_batch', params, priority=priority)
+        
+        return jsonify({
+            "message": f"Batch generation of {len(plan)} shows started in {'testing' if is_testing else 'production'} mode",
+            "batch_id": task_info['task_id'],
+            **task_info
+        }), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@music_bp.route('/batch-generation/<batch_id>', methods=['GET'])
+def get_batch_generation(batch_id):
+    """Get a batch's status and the progress of each artist"""
+    try:
+        batch_status = current_app.config['task_processor'].get_batch_status(batch_id)
+        if not batch_status:
+            return jsonify({"error": "Batch not found"}), 404
+        return jsonify(batch_status), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @music_bp.route('/task-status/<task_id>', methods=['GET'])
 def get_task_status(task_id):
     """Get the status of a task"""
@@ -121,19 +376,133 @@ def get_task_status(task_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@music_bp.route('/tasks/<task_id>/events', methods=['GET'])
+def stream_task_events(task_id):
+    """
+    Stream task status, progress and log events as Server-Sent Events.
+    
+    Clients resume after a reconnect by sending the Last-Event-ID header
+    (or ?last_event_id=) with the id of the last event they processed.
+    """
+    task_processor = current_app.config['task_processor']
+    task_status = task_processor.get_task_status(task_id)
+    if not task_status:
+        return jsonify({"error": "Task not found"}), 404
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+    
+    task_processor.ensure_event_feed(task_id)
+    events = task_processor.events
+    # The stream of a task that finished long ago may have been dropped; nothing would close a new one
+    finished_without_history = task_status['status'] in FINISHED_STATES and not events.has_stream(task_id)
+    
+    def generate():
+        after_id = last_event_id
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        if finished_without_history:
+            yield format_sse(None, 'snapshot', task_status)
+            return
+        while True:
+            batch, closed, missed = events.wait_for_events(task_id, after_id, timeout=SSE_KEEPALIVE_INTERVAL)
+            if missed:
+                # The reader fell behind the bounded history; resync with a snapshot
+                yield format_sse(None, 'snapshot', task_processor.get_task_status(task_id))
+            for event_id, event_type, data in batch:
+                yield format_sse(event_id, event_type, data)
+                after_id = event_id
+            if closed:
+                break
+            if not batch:
+                yield ": keep-alive\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@music_bp.route('/tasks/<task_id>', methods=['DELETE'])
+def cancel_task(task_id):
+    """Cancel a pending or running task"""
+    try:
+        task_processor = current_app.config['task_processor']
+        task_status = task_processor.cancel_task(task_id)
+        
+        if not task_status:
+            return jsonify({"error": "Task not found"}), 404
+        
+        if task_status['status'] in ('completed', 'failed'):
+            return jsonify({
+                "error": "Task already finished",
+                "status": task_status['status']
+            }), 409
+        
+        # Running tasks stop at their next cancellation check
+        status_code = 200 if task_status['status'] == 'cancelled' else 202
+        return jsonify(task_status), status_code
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @music_bp.route('/task-log/<task_id>', methods=['GET'])
 def get_task_log(task_id):
-    """Get the log file for a task"""
+    """
+    Get the log file for a task.
+    
+    Supports ?tail=N for the last N lines, or ?offset=<byte>&limit=<bytes> for
+    incremental reads; pass the returned next_offset to continue.
+    """
     try:
         log_file = os.path.join(current_app.config['LOGS_DIR'], f'task_{task_id}.log')
         
         if not os.path.exists(log_file):
             return jsonify({"error": "Log file not found"}), 404
-            
-        with open(log_file, 'r') as f:
-            log_content = f.read()
-            
-        return jsonify({"log": log_content}), 200
+        
+        offset = request.args.get('offset', type=int)
+        limit = request.args.get('limit', type=int)
+        tail = request.args.get('tail', type=int)
+        
+        return jsonify(read_task_log(log_file, offset=offset, limit=limit, tail=tail)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@music_bp.route('/task-profile/<task_id>', methods=['GET'])
+def get_task_profile(task_id):
+    """List the profile files of a task started with "profile" set"""
+    try:
+        artifacts = current_app.config['task_processor'].get_profile_artifacts(task_id)
+        if not artifacts:
+            return jsonify({"error": "No profile found for this task"}), 404
+        
+        return jsonify({
+            "task_id": task_id,
+            "artifacts": {
+                kind: {
+                    "filename": os.path.basename(path),
+                    "size": os.path.getsize(path),
+                    "url": f"/api/task-profile/{task_id}/{kind}"
+                } for kind, path in artifacts.items()
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@music_bp.route('/task-profile/<task_id>/<kind>', methods=['GET'])
+def download_task_profile(task_id, kind):
+    """Download one profile file: pstats, summary, allocations or collapsed"""
+    try:
+        path = current_app.config['task_processor'].get_profile_artifacts(task_id).get(kind)
+        if not path:
+            return jsonify({"error": f"No {kind} profile found for this task"}), 404
+        
+        mimetype = 'application/octet-stream' if kind == 'pstats' else 'text/plain'
+        return send_file(path, mimetype=mimetype, as_attachment=True, download_name=os.path.basename(path))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -157,10 +526,8 @@ def get_task_output(task_id):
         if not task_status['output_file']:
             return jsonify({"error": "No output file available"}), 404
             
-        return send_from_directory(
-            current_app.config['OUTPUT_DIR'],
-            task_status['output_file'],
-            as_attachment=True
-        )
+        return _send_media_from('OUTPUT_DIR', task_status['output_file'], as_attachment=True)
+    except NotFound:
+        return jsonify({"error": "Output file not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,301 @@
+"""
+Production server: preforked HTTP workers sharing one copy of the Whisper model.
+
+The master process imports the app and loads the Whisper model, freezes the
+garbage collector so inherited objects are never written to, opens the
+listening socket and forks:
+
+  - N HTTP workers that accept on the shared socket (debug and reloader off)
+  - one task worker that runs generation tasks from the durable queue
+
+Children share the model weights copy-on-write, so memory grows much less
+than N full copies. Tasks always go through the SQLite queue (TASK_QUEUE_DB,
+default data/tasks.db), so every HTTP worker sees the same task state and
+only the task worker runs them. Crashed children are restarted.
+
+    python serve.py --workers 4 --port 6000
+    TASK_QUEUE_DB=/shared/radio/tasks.db python serve.py --workers 8 --no-task-worker
+
+Broadcast state lives in one process, so HTTP worker 0 owns it: it also
+listens on a private loopback port, and the other workers forward the
+broadcast, stream and live routes there. Worker 0 also runs the cache
+sweeper, the stream fan-out server and the transition library fill.
+/api/metrics reports the counters of whichever worker answers; scrape the
+task worker's --metrics-port for generation metrics.
+"""
+import argparse
+import gc
+import http.client
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import threading
+
+# Seconds a child must stay up before a crash restarts it immediately
+MIN_CHILD_UPTIME = 5.0
+# Seconds to wait for children to exit before killing them on shutdown
+SHUTDOWN_TIMEOUT = 30.0
+
+PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
+# Routes served from the broadcast owner's state (HTTP worker 0)
+OWNER_ROUTE_PREFIXES = ('/api/broadcast/', '/api/stream', '/api/live/')
+# Bytes relayed per read when forwarding a response
+PROXY_CHUNK_SIZE = 64 * 1024
+# Headers that apply to one connection and are not forwarded
+HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'te', 'trailer', 'upgrade',
+                      'proxy-authenticate', 'proxy-authorization'}
+
+
+def _listen(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class OwnerProxy:
+    """WSGI middleware forwarding the broadcast routes to the worker that owns the broadcast"""
+
+    def __init__(self, app, owner_port: int):
+        self.app = app
+        self.owner_port = owner_port
+
+    def __call__(self, environ, start_response):
+        if not environ.get('PATH_INFO', '').startswith(OWNER_ROUTE_PREFIXES):
+            return self.app(environ, start_response)
+
+        path = environ.get('SCRIPT_NAME', '') + environ['PATH_INFO']
+        if environ.get('QUERY_STRING'):
+            path += '?' + environ['QUERY_STRING']
+        headers = {
+            key[5:].replace('_', '-').title(): value
+            for key, value in environ.items()
+            if key.startswith('HTTP_') and key[5:].replace('_', '-').lower() not in HOP_BY_HOP_HEADERS
+        }
+        if environ.get('CONTENT_TYPE'):
+            headers['Content-Type'] = environ['CONTENT_TYPE']
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        body = environ['wsgi.input'].read(length) if length else None
+        forwarded_for = headers.get('X-Forwarded-For')
+        client = environ.get('REMOTE_ADDR', '')
+        headers['X-Forwarded-For'] = f"{forwarded_for}, {client}" if forwarded_for else client
+
+        # No timeout: /api/stream responses last as long as the listener stays
+        connection = http.client.HTTPConnection('127.0.0.1', self.owner_port)
+        try:
+            connection.request(environ['REQUEST_METHOD'], path, body=body, headers=headers)
+            response = connection.getresponse()
+        except OSError as e:
+            connection.close()
+            start_response('503 Service Unavailable', [('Content-Type', 'application/json')])
+            return [json.dumps({"error": f"Broadcast worker unavailable: {str(e)}"}).encode('utf-8')]
+
+        start_response(f"{response.status} {response.reason}", [
+            (name, value) for name, value in response.getheaders()
+            if name.lower() not in HOP_BY_HOP_HEADERS
+        ])
+
+        def relay():
+            try:
+                while True:
+                    chunk = response.read1(PROXY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                connection.close()
+        return relay()
+
+
+def _run_http_worker(sock: socket.socket, owner_sock: socket.socket, host: str, port: int, index: int):
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    owner_port = owner_sock.getsockname()[1]
+    # Only the first worker broadcasts, sweeps the cache and serves the stream fan-out
+    app = create_app(background_services=index == 0)
+    servers = [make_server(host, port, app if index == 0 else OwnerProxy(app, owner_port),
+                           threaded=True, fd=sock.fileno())]
+    if index == 0:
+        servers.append(make_server('127.0.0.1', owner_port, app, threaded=True, fd=owner_sock.fileno()))
+        threading.Thread(target=servers[1].serve_forever, name='OwnerServer', daemon=True).start()
+    else:
+        owner_sock.close()
+
+    # Stop accepting; shutdown() waits for serve_forever, so call it from another thread
+    def handle_stop(signum, frame):
+        for server in servers:
+            threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, handle_stop)
+
+    print(f"HTTP worker {index} (pid {os.getpid()}) serving on {host}:{port}")
+    servers[0].serve_forever()
+
+
+def _run_task_worker(sock: socket.socket, owner_sock: socket.socket, metrics_port):
+    from app import create_app
+    from services.metrics import start_metrics_server
+
+    # Requests are only accepted by the HTTP workers
+    sock.close()
+    owner_sock.close()
+    app = create_app(background_services=False)
+    task_processor = app.config['task_processor']
+    if metrics_port:
+        start_metrics_server(metrics_port)
+
+    # Finish the current task, then exit
+    def handle_stop(signum, frame):
+        task_processor.stop()
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The master forwards Ctrl+C as SIGTERM
+
+    task_processor.run_worker()
+
+
+def _fork(target, *args) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # Child: collect garbage again, but leave the frozen inherited objects alone
+    gc.enable()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    status = 0
+    try:
+        target(*args)
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else 0
+    except BaseException as e:
+        print(f"Worker {os.getpid()} crashed: {str(e)}")
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+
+def _preload(load_whisper: bool = True):
+    """Import everything the children need and load the model before forking"""
+    import app  # Imports Flask and the services once for all children, and loads .env
+    from services.whisper_transcriber import default_device, load_model
+
+    if not load_whisper:
+        # HTTP workers only enqueue tasks and never load the model
+        print("No task worker here; not loading the Whisper model")
+        return
+
+    backend = os.getenv('TRANSCRIPTION_BACKEND', 'openai-whisper')
+    model_name = os.getenv('WHISPER_MODEL', 'base')
+    if backend != 'openai-whisper':
+        # CTranslate2's thread pools don't survive fork; its int8 models are small
+        print(f"Transcribing with {backend}; each process loads its own model")
+        return
+    device = default_device()
+    if device != 'cpu':
+        # A CUDA context can't be used across fork; each process loads its own
+        print(f"Whisper runs on {device}; not preloading the model in the master")
+        return
+    started = time.perf_counter()
+    load_model(model_name, device=device)
+    print(f"Loaded Whisper '{model_name}' in {time.perf_counter() - started:.1f} seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with preforked workers")
+    parser.add_argument('--host', default='0.0.0.0', help="Address to listen on (default: 0.0.0.0)")
+    parser.add_argument('--port', type=int, default=6000, help="Port to listen on (default: 6000)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="HTTP worker processes (default: number of CPUs)")
+    parser.add_argument('--backlog', type=int, default=2048, help="Listen backlog of the shared socket")
+    parser.add_argument('--model', default=None, help="Whisper model to preload and use (default: WHISPER_MODEL or base)")
+    parser.add_argument('--no-task-worker', action='store_true',
+                        help="Don't run tasks here (use worker.py processes elsewhere)")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve the task worker's stage timings and API metrics on this port")
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.model:
+        os.environ['WHISPER_MODEL'] = args.model
+
+    # All processes must share task state, so tasks always go through the durable queue
+    os.environ.setdefault('TASK_QUEUE_DB', os.path.join(PROJECT_ROOT, 'data', 'tasks.db'))
+    print(f"Task queue: {os.environ['TASK_QUEUE_DB']}")
+
+    # Objects created from here on are shared with the children; keep the
+    # collector from touching (and so copying) their pages
+    gc.disable()
+    _preload(load_whisper=not args.no_task_worker)
+    sock = _listen(args.host, args.port, args.backlog)
+    # Private port of the broadcast owner, for requests forwarded by the other workers
+    owner_sock = _listen('127.0.0.1', 0, args.backlog)
+    gc.freeze()
+
+    roles = {}  # pid -> (role, index, started_at)
+    stopping = False
+
+    def spawn(role: str, index: int):
+        if role == 'http':
+            pid = _fork(_run_http_worker, sock, owner_sock, args.host, args.port, index)
+        else:
+            pid = _fork(_run_task_worker, sock, owner_sock, args.metrics_port)
+        roles[pid] = (role, index, time.monotonic())
+
+    def handle_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(roles):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    for index in range(args.workers):
+        spawn('http', index)
+    if not args.no_task_worker:
+        spawn('task', 0)
+    print(f"Master {os.getpid()} started {args.workers} HTTP worker(s)"
+          f"{'' if args.no_task_worker else ' and a task worker'}")
+
+    deadline = None
+    while roles:
+        if stopping and deadline is None:
+            deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        if deadline and time.monotonic() > deadline:
+            for pid in list(roles):
+                print(f"Killing worker {pid} after {SHUTDOWN_TIMEOUT:.0f} seconds")
+                os.kill(pid, signal.SIGKILL)
+            deadline = float('inf')
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        role, index, started_at = roles.pop(pid)
+        if stopping:
+            continue
+        print(f"{role} worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+        if time.monotonic() - started_at < MIN_CHILD_UPTIME:
+            time.sleep(MIN_CHILD_UPTIME)  # Don't spin when a worker fails at startup
+        spawn(role, index)
+
+    sock.close()
+    owner_sock.close()
+    print("All workers stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,12 @@
 import os
 import json
+import time
 import openai
 import requests
 from typing import Dict, Optional
 from flask import current_app
 from .whisper_transcriber import WhisperTranscriber
+from .metrics import LLM_REQUEST_SECONDS, LLM_TOKENS
 
 class AIProcessor:
     def __init__(self, use_openai: bool = True):
@@ -50,6 +52,7 @@ class AIProcessor:
         Returns:
             str: Generated text
         """
+        start = time.perf_counter()
         try:
             response = openai.ChatCompletion.create(
                 model=self.model,
@@ -63,8 +66,14 @@ class AIProcessor:
                 frequency_penalty=0.3,
                 presence_penalty=0.3
             )
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, backend='openai', outcome='success')
+            usage = getattr(response, 'usage', None)
+            if usage:
+                LLM_TOKENS.inc(usage.prompt_tokens, backend='openai', kind='prompt')
+                LLM_TOKENS.inc(usage.completion_tokens, backend='openai', kind='completion')
             return response.choices[0].message.content.strip()
         except Exception as e:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, backend='openai', outcome='error')
             print(f"Error generating with OpenAI: {str(e)}")
             return self._generate_locally(prompt)
 
@@ -78,6 +87,8 @@ class AIProcessor:
         Returns:
             str: Generated text
         """
+        start = time.perf_counter()
+        outcome = 'error'
         try:
             # Try using local API first
             response = requests.post(
@@ -91,9 +102,15 @@ class AIProcessor:
 
             if response.status_code == 200:
                 result = response.json()
+                outcome = 'success'
+                # Ollama reports prompt and generated token counts
+                LLM_TOKENS.inc(result.get('prompt_eval_count', 0), backend='ollama', kind='prompt')
+                LLM_TOKENS.inc(result.get('eval_count', 0), backend='ollama', kind='completion')
                 return result['response'].strip()
         except Exception as e:
             print(f"Error with local API: {str(e)}")
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, backend='ollama', outcome=outcome)
 
         # Fallback to templates if local API fails
         if "radio intro" in prompt.lower():
@@ -1,17 +1,22 @@
 import os
 import json
 import hashlib
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
 from flask import current_app
 from .music_manager import MusicManager
 from .whisper_transcriber import WhisperTranscriber
 from .ai_processor import AIProcessor
 from .audio_generator import AudioGenerator
+from .show_manifest import ShowManifest, file_hash, manifest_path, transition_key
 import uuid
 from pydub import AudioSegment
 import re
 import random
 
+class GenerationCancelled(Exception):
+    """Raised when a generation run is stopped by a cancellation request"""
+    pass
+
 class AIRadioGenerator:
     def __init__(self, use_openai: bool = True):
         """
@@ -21,9 +26,36 @@ class AIRadioGenerator:
             use_openai (bool): Whether to use OpenAI (True) or local processing (False)
         """
         self.music_manager = MusicManager()
-        self.transcriber = WhisperTranscriber()
+        config = current_app.config
+        self.transcriber = WhisperTranscriber(
+            model_name=config.get('WHISPER_MODEL', 'base'),
+            vocal_gating=config.get('VOCAL_GATING', True),
+            backend=config.get('TRANSCRIPTION_BACKEND', 'openai-whisper'),
+            threads=config.get('TRANSCRIPTION_THREADS', 0),
+            beam_size=config.get('TRANSCRIPTION_BEAM_SIZE'),
+            compute_type=config.get('TRANSCRIPTION_COMPUTE_TYPE')
+        )
         self.templates = self._load_templates()
         self.ai_processor = AIProcessor(use_openai=use_openai)
+        self.transition_library = None  # Pre-generated transitions, see set_transition_library
+        self.cache_manager = None  # Pins clips while a show is assembled, see set_cache_manager
+
+    def set_transition_library(self, library):
+        """Look up transitions in a TransitionLibrary before generating them"""
+        self.transition_library = library
+
+    def set_cache_manager(self, cache_manager):
+        """Pin the clips of shows being assembled so the cache sweeper keeps them"""
+        self.cache_manager = cache_manager
+
+    def _pin(self, pinned: List[str], path: str):
+        if self.cache_manager:
+            self.cache_manager.pin([path])
+            pinned.append(path)
+
+    def _unpin(self, pinned: List[str]):
+        if self.cache_manager and pinned:
+            self.cache_manager.unpin(pinned)
 
     def _load_templates(self) -> Dict:
         """
@@ -92,12 +124,13 @@ Provide ONLY the final energetic radio script—no explanations or additional fo
         return prompt
 
 
-    def get_songs_data(self, artist_name: str) -> List[Dict]:
+    def get_songs_data(self, artist_name: str, should_cancel: Optional[Callable[[], bool]] = None) -> List[Dict]:
         """
         Get song data for an artist, including transcripts.
         
         Args:
             artist_name (str): Name of the artist
+            should_cancel (Optional[Callable[[], bool]]): Checked before each transcription
             
         Returns:
             List[Dict]: List of song data with transcripts
@@ -108,23 +141,38 @@ Provide ONLY the final energetic radio script—no explanations or additional fo
 
         songs_data = []
         for song in songs:
-            json_path = os.path.splitext(song['path'])[0] + ".json"
-            if os.path.exists(json_path):
-                with open(json_path, "r", encoding="utf-8") as f:
-                    song_data = json.load(f)
-            else:
-                transcript = self.transcriber.transcribe(song['path'])
-                song_data = {
-                    "artist": artist_name,
-                    "song_name": song['name'],
-                    "transcript": transcript
-                }
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(song_data, f, ensure_ascii=False, indent=2)
-            songs_data.append(song_data)
+            songs_data.append(self.get_song_data(artist_name, song, should_cancel=should_cancel))
         
         return songs_data
 
+    def get_song_data(self, artist_name: str, song: Dict, should_cancel: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        Get the transcript data for one song, transcribing it on first use.
+        
+        Args:
+            artist_name (str): Name of the artist
+            song (Dict): Song entry from MusicManager
+            should_cancel (Optional[Callable[[], bool]]): Checked before transcribing
+            
+        Returns:
+            Dict: Song data with transcript, cached next to the song as JSON
+        """
+        json_path = os.path.splitext(song['path'])[0] + ".json"
+        if os.path.exists(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        
+        self._raise_if_cancelled(should_cancel)
+        transcript = self.transcriber.transcribe(song['path'])
+        song_data = {
+            "artist": artist_name,
+            "song_name": song['name'],
+            "transcript": transcript
+        }
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(song_data, f, ensure_ascii=False, indent=2)
+        return song_data
+
     def generate_script(self, artist_name: str, songs_data: List[Dict]) -> str:
         """
         Generate the radio intro script for an artist.
@@ -172,76 +220,62 @@ Provide ONLY the final energetic radio script—no explanations or additional fo
         """
         Combine multiple audio files into a single output file, properly handling transitions.
         """
+        print(f"\n=== Starting Audio Combination ===")
+        print(f"Output path: {output_path}")
+        print(f"Number of audio files to combine: {len(audio_files)}")
+        print(f"Files to combine: {audio_files}")
+        
+        songs = self.music_manager.get_artist_songs(artist_name)
+        if not songs:
+            print(f"No songs found for artist '{artist_name}'")
+            return False
+        
+        expected_duration = self.music_manager.get_total_duration(artist_name)
+        if expected_duration is not None:
+            print(f"Expected song duration from metadata index: {expected_duration:.2f} seconds")
+
+        # Group files by type
+        intro_files = [f for f in audio_files if 'intro_' in f.lower()]
+        transition_files = [f for f in audio_files if 'transition_' in f.lower()]
+        
+        print(f"\nFound {len(intro_files)} intro segments and {len(transition_files)} transitions")
+        print(f"Intro files: {intro_files}")
+        print(f"Transition files: {transition_files}")
+        
+        # Intro segments first, then songs and transitions alternately
+        ordered = list(intro_files)
+        for i, song in enumerate(songs):
+            ordered.append(song['path'])
+            if enable_dj_transitions and i < len(songs) - 1:
+                matching_transitions = [t for t in transition_files if f'transition_{i}' in t]
+                if matching_transitions:
+                    ordered.append(matching_transitions[0])
+        return self.concatenate_audio(ordered, output_path)
+
+    def concatenate_audio(self, audio_files: List[str], output_path: str) -> bool:
+        """
+        Join audio files in the given order into one MP3.
+        
+        Missing or unreadable files are skipped with a warning.
+        
+        Returns:
+            bool: Whether a non-empty output file was written
+        """
         try:
             from pydub import AudioSegment
             
-            # Initialize the combined audio
             combined = AudioSegment.empty()
-            
-            print(f"\n=== Starting Audio Combination ===")
-            print(f"Output path: {output_path}")
-            print(f"Number of audio files to combine: {len(audio_files)}")
-            print(f"Files to combine: {audio_files}")
-            
-            songs = self.music_manager.get_artist_songs(artist_name)
-            if not songs:
-                print(f"No songs found for artist '{artist_name}'")
-                return False
-
-            # Group files by type
-            intro_files = [f for f in audio_files if 'intro_' in f.lower()]
-            transition_files = [f for f in audio_files if 'transition_' in f.lower()]
-            
-            print(f"\nFound {len(intro_files)} intro segments and {len(transition_files)} transitions")
-            print(f"Intro files: {intro_files}")
-            print(f"Transition files: {transition_files}")
-            
-            # Add intro segments first
-            for intro in intro_files:
+            for path in audio_files:
                 try:
-                    print(f"\nProcessing intro: {intro}")
-                    if not os.path.exists(intro):
-                        print(f"Warning: Intro file not found: {intro}")
+                    print(f"\nProcessing: {path}")
+                    if not os.path.exists(path):
+                        print(f"Warning: Audio file not found: {path}")
                         continue
-                        
-                    audio = AudioSegment.from_file(intro)
-                    print(f"Intro duration: {len(audio)/1000:.2f} seconds")
+                    audio = AudioSegment.from_file(path)
+                    print(f"Duration: {len(audio)/1000:.2f} seconds")
                     combined += audio
-                    print(f"Successfully added intro segment: {os.path.basename(intro)}")
-                except Exception as e:
-                    print(f"Error adding intro {intro}: {str(e)}")
-                    continue
-            
-            # Add songs and transitions alternately
-            for i, song in enumerate(songs):
-                try:
-                    print(f"\nProcessing song {i+1}: {song['name']}")
-                    if not os.path.exists(song['path']):
-                        print(f"Warning: Song file not found: {song['path']}")
-                        continue
-                        
-                    # Add the song
-                    song_audio = AudioSegment.from_file(song['path'])
-                    print(f"Song duration: {len(song_audio)/1000:.2f} seconds")
-                    combined += song_audio
-                    print(f"Successfully added song: {song['name']}")
-                    
-                    # Add transition if available and not the last song
-                    if enable_dj_transitions and i < len(songs) - 1:
-                        matching_transitions = [t for t in transition_files if f'transition_{i}' in t]
-                        if matching_transitions:
-                            transition_path = matching_transitions[0]
-                            print(f"\nProcessing transition: {transition_path}")
-                            if not os.path.exists(transition_path):
-                                print(f"Warning: Transition file not found: {transition_path}")
-                                continue
-                                
-                            transition_audio = AudioSegment.from_file(transition_path)
-                            print(f"Transition duration: {len(transition_audio)/1000:.2f} seconds")
-                            combined += transition_audio
-                            print(f"Successfully added transition after song {i+1}")
                 except Exception as e:
-                    print(f"Error processing song {song['name']}: {str(e)}")
+                    print(f"Error adding {path}: {str(e)}")
                     continue
             
             print(f"\nFinal combined duration: {len(combined)/1000:.2f} seconds")
@@ -266,14 +300,25 @@ Provide ONLY the final energetic radio script—no explanations or additional fo
             print(f"\nError combining audio files: {str(e)}")
             return False
 
-    def generate_audio(self, artist_name: str, script: str, dj_options: Dict = None) -> Dict:
+    @staticmethod
+    def _raise_if_cancelled(should_cancel: Optional[Callable[[], bool]]):
+        """Raise GenerationCancelled when the cancellation callback says so"""
+        if should_cancel and should_cancel():
+            raise GenerationCancelled("Generation cancelled")
+
+    def generate_audio(self, artist_name: str, script: str, dj_options: Dict = None,
+                       should_cancel: Optional[Callable[[], bool]] = None) -> Dict:
         """
         Generate audio from an SSML-enhanced script.
         This is the second step in the radio generation process.
+        
+        should_cancel is checked before every paid API call and before the final
+        combination, so a cancelled task stops without generating further audio.
         """
         # Initialize all_audio_paths at the start
         all_audio_paths = []
         generated_files = []  # Track only the files we generate
+        pinned = []  # Clips kept from the cache sweeper until the show is assembled
         
         try:
             # Create cache directory if it doesn't exist
@@ -282,6 +327,7 @@ Provide ONLY the final energetic radio script—no explanations or additional fo
             
             # Generate intro audio with SSML
             final_audio_path = os.path.join(cache_dir, f"{artist_name}_radio_intro_combined.mp3")
+            self._pin(pinned, final_audio_path)
             audio_gen = AudioGenerator()
             
             print("\n=== Script being sent to ElevenLabs ===")
@@ -289,6 +335,7 @@ Provide ONLY the final energetic radio script—no explanations or additional fo
             print(f"Content: {script}\n")
             
             # Generate audio with SSML support
+            self._raise_if_cancelled(should_cancel)
             audio_gen.generate_radio_intro_audio(
                 script,
                 output_path=final_audio_path,
@@ -306,6 +353,12 @@ Provide ONLY the final energetic radio script—no explanations or additional fo
             # Add the intro audio path
             all_audio_paths.append(final_audio_path)
             generated_files.append(final_audio_path)  # Track this as a generated file
+            
+            # Record the pieces so update_show can reuse them; an earlier
+            # manifest saves rehashing unchanged songs
+            full_show_path = os.path.join(cache_dir, f"{artist_name}_full_show.mp3")
+            known_songs = ShowManifest.load(manifest_path(full_show_path)) or ShowManifest(artist_name, {})
+            manifest_items = [ShowManifest.spoken_item('intro', final_audio_path, script)]
 
             # Process each song and add transitions
             for i in range(len(songs)):
@@ -315,47 +368,32 @@ Provide ONLY the final energetic radio script—no explanations or additional fo
                 if not os.path.exists(song_path):
                     raise ValueError(f"Song file not found: {song_path}")
                 all_audio_paths.append(song_path)
+                manifest_items.append(known_songs.song_item(current_song))
                 
-                # If there's a next song and transitions are enabled, generate transition
+                # If there's a next song and transitions are enabled, use a pre-built transition or generate one
                 if i < len(songs) - 1 and dj_options and dj_options.get('enable_dj_transitions', False):
-                    next_song = songs[i + 1]
-                    
-                    # Generate transition script
-                    transition_text = self.generate_dj_transition(
-                        current_song,
-                        next_song,
-                        style=dj_options.get('style', 'smooth'),
-                        length=dj_options.get('length', 'medium')
-                    )
-                    
-                    # Enhance transition with SSML
-                    enhanced_transition = self.enhance_script_with_emphasis(transition_text)
-                    
-                    # Generate audio for transition
-                    transition_filename = f"{artist_name}_transition_{i}_{uuid.uuid4().hex[:8]}.mp3"
-                    transition_path = os.path.join(cache_dir, transition_filename)
-                    print(f"Generating transition: {transition_path}")
-                    
-                    audio_gen.generate_radio_intro_audio(
-                        enhanced_transition,
-                        output_path=transition_path,
-                        use_ssml=True  # New parameter to indicate SSML support
-                    )
-                    
-                    if os.path.exists(transition_path) and os.path.getsize(transition_path) > 0:
-                        all_audio_paths.append(transition_path)
+                    key = self._transition_key(known_songs, current_song, songs[i + 1], dj_options)
+                    transition = self._prebuilt_transition(key)
+                    if not transition:
+                        transition_path, transition_script = self._generate_transition(
+                            artist_name, i, current_song, songs[i + 1], dj_options, cache_dir,
+                            audio_gen=audio_gen, should_cancel=should_cancel
+                        )
                         generated_files.append(transition_path)  # Track this as a generated file
-                    else:
-                        raise ValueError(f"Failed to create transition audio file: {transition_path}")
+                        transition = ShowManifest.spoken_item('transition', transition_path, transition_script, key=key)
+                    self._pin(pinned, transition['path'])
+                    all_audio_paths.append(transition['path'])
+                    manifest_items.append(transition)
 
-            # Combine everything into the final show
-            full_show_path = os.path.join(cache_dir, f"{artist_name}_full_show.mp3")
+            # Combine everything into the final show, in playing order
             print(f"Creating final show: {full_show_path}")
-            self.combine_audio_files(all_audio_paths, full_show_path, dj_options.get('enable_dj_transitions', False), artist_name)
+            self._raise_if_cancelled(should_cancel)
+            self.concatenate_audio(all_audio_paths, full_show_path)
 
             # Verify the final file was created
             if not os.path.exists(full_show_path) or os.path.getsize(full_show_path) == 0:
                 raise ValueError(f"Failed to create final show audio file: {full_show_path}")
+            self._save_manifest(artist_name, dj_options, manifest_items, full_show_path)
 
             return {
                 "intro_audio": os.path.basename(final_audio_path),
@@ -369,7 +407,198 @@ Provide ONLY the final energetic radio script—no explanations or additional fo
                 if os.path.exists(path):
                     print(f"Cleaning up generated file: {path}")
                     os.remove(path)
+            if isinstance(e, GenerationCancelled):
+                raise
             raise ValueError(f"Audio generation failed: {str(e)}")
+        finally:
+            self._unpin(pinned)
+
+    @staticmethod
+    def _transition_key(known_songs: ShowManifest, current_song: Dict, next_song: Dict, dj_options: Dict) -> str:
+        return transition_key(
+            known_songs.song_item(current_song)['content_hash'],
+            known_songs.song_item(next_song)['content_hash'],
+            dj_options.get('style', 'smooth'),
+            dj_options.get('length', 'medium')
+        )
+
+    def _prebuilt_transition(self, key: str) -> Optional[Dict]:
+        """A transition from the library with this key, if one is ready"""
+        if not self.transition_library:
+            return None
+        transition = self.transition_library.lookup(key)
+        if transition:
+            print(f"Using pre-built transition: {transition['path']}")
+        return transition
+
+    @staticmethod
+    def _save_manifest(artist_name: str, dj_options: Dict, items: List[Dict], show_path: str):
+        manifest = ShowManifest(
+            artist_name,
+            {
+                'enable_dj_transitions': dj_options.get('enable_dj_transitions', False),
+                'style': dj_options.get('style', 'smooth'),
+                'length': dj_options.get('length', 'medium')
+            },
+            items,
+            output={'path': os.path.abspath(show_path), 'audio_hash': file_hash(show_path)}
+        )
+        manifest.save(manifest_path(show_path))
+
+    def update_show(self, artist_name: str, dj_options: Dict = None,
+                    should_cancel: Optional[Callable[[], bool]] = None) -> Optional[Dict]:
+        """
+        Bring an artist's show up to date with the catalog, reusing what is unchanged.
+        
+        The manifest written with the last show is diffed against the current
+        songs: the intro and every transition whose two songs and options are
+        unchanged are reused, and only new or affected transitions are
+        generated. Adding one song therefore costs two transitions. The intro
+        is kept as it is (its clip is re-voiced from the stored script if the
+        cache sweeper removed it). Missing transitions are taken from the
+        transition library when it has them.
+        
+        Args:
+            artist_name (str): Name of the artist
+            dj_options (Dict): 'enable_dj_transitions', 'style' and 'length'
+            should_cancel (Optional[Callable[[], bool]]): Checked before each paid API call
+            
+        Returns:
+            Optional[Dict]: Audio files, scripts and reuse counts, or None when
+                there is no usable manifest and the show must be generated in full
+        """
+        dj_options = dj_options or {}
+        cache_dir = os.path.join("cache", "audio")
+        full_show_path = os.path.join(cache_dir, f"{artist_name}_full_show.mp3")
+        previous = ShowManifest.load(manifest_path(full_show_path))
+        if not previous or previous.artist_name != artist_name or not previous.intro:
+            return None
+        songs = self.music_manager.get_artist_songs(artist_name)
+        if not songs:
+            return None
+        
+        audio_gen = AudioGenerator()
+        generated_files = []
+        pinned = []
+        reused = generated = 0
+        try:
+            intro = previous.intro
+            self._pin(pinned, intro['path'])
+            if not previous.is_intact(intro):
+                print(f"Intro clip missing or changed, voicing the stored script again: {intro['path']}")
+                self._raise_if_cancelled(should_cancel)
+                os.makedirs(os.path.dirname(intro['path']), exist_ok=True)
+                audio_gen.generate_radio_intro_audio(intro['script'], output_path=intro['path'], use_ssml=True)
+                generated_files.append(intro['path'])
+                intro = ShowManifest.spoken_item('intro', intro['path'], intro['script'])
+            items = [intro]
+            
+            enable_dj_transitions = dj_options.get('enable_dj_transitions', False)
+            for i, current_song in enumerate(songs):
+                if not os.path.exists(current_song['path']):
+                    raise ValueError(f"Song file not found: {current_song['path']}")
+                items.append(previous.song_item(current_song))
+                if not enable_dj_transitions or i == len(songs) - 1:
+                    continue
+                
+                key = self._transition_key(previous, current_song, songs[i + 1], dj_options)
+                transition = previous.find_transition(key) or self._prebuilt_transition(key)
+                if transition:
+                    reused += 1
+                else:
+                    transition_path, transition_script = self._generate_transition(
+                        artist_name, i, current_song, songs[i + 1], dj_options, cache_dir,
+                        audio_gen=audio_gen, should_cancel=should_cancel
+                    )
+                    generated_files.append(transition_path)
+                    transition = ShowManifest.spoken_item('transition', transition_path, transition_script, key=key)
+                    generated += 1
+                self._pin(pinned, transition['path'])
+                items.append(transition)
+            print(f"Updating show for {artist_name}: {reused} transitions reused, {generated} generated")
+            
+            self._raise_if_cancelled(should_cancel)
+            if not self.concatenate_audio([item['path'] for item in items], full_show_path):
+                raise ValueError(f"Failed to create final show audio file: {full_show_path}")
+            self._save_manifest(artist_name, dj_options, items, full_show_path)
+            
+            return {
+                "enhanced_script": intro['script'],
+                "intro_audio": os.path.basename(intro['path']),
+                "full_show_audio": os.path.basename(full_show_path),
+                "reused_transitions": reused,
+                "generated_transitions": generated
+            }
+        except Exception as e:
+            print(f"Error updating show: {str(e)}")
+            for path in generated_files:
+                if os.path.exists(path):
+                    print(f"Cleaning up generated file: {path}")
+                    os.remove(path)
+            if isinstance(e, GenerationCancelled):
+                raise
+            raise ValueError(f"Show update failed: {str(e)}")
+        finally:
+            self._unpin(pinned)
+
+    def generate_transition_audio(self, artist_name: str, index: int, current_song: Dict, next_song: Dict,
+                                  dj_options: Dict, cache_dir: str, audio_gen: AudioGenerator = None,
+                                  should_cancel: Optional[Callable[[], bool]] = None) -> str:
+        """
+        Generate the spoken DJ transition between two songs.
+        
+        Args:
+            artist_name (str): Name of the artist
+            index (int): Position of current_song in the show
+            current_song (Dict): Song that just played
+            next_song (Dict): Song that plays next
+            dj_options (Dict): 'style' and 'length' of the transition
+            cache_dir (str): Directory to write the audio to
+            audio_gen (AudioGenerator): Generator to reuse, created if omitted
+            should_cancel (Optional[Callable[[], bool]]): Checked before each paid API call
+            
+        Returns:
+            str: Path of the generated transition audio
+        """
+        return self._generate_transition(
+            artist_name, index, current_song, next_song, dj_options, cache_dir,
+            audio_gen=audio_gen, should_cancel=should_cancel
+        )[0]
+
+    def _generate_transition(self, artist_name: str, index: int, current_song: Dict, next_song: Dict,
+                             dj_options: Dict, cache_dir: str, audio_gen: AudioGenerator = None,
+                             should_cancel: Optional[Callable[[], bool]] = None) -> Tuple[str, str]:
+        """Generate a transition (see generate_transition_audio); returns its path and SSML script"""
+        audio_gen = audio_gen or AudioGenerator()
+        
+        # Generate transition script
+        self._raise_if_cancelled(should_cancel)
+        transition_text = self.generate_dj_transition(
+            current_song,
+            next_song,
+            style=dj_options.get('style', 'smooth'),
+            length=dj_options.get('length', 'medium')
+        )
+        
+        # Enhance transition with SSML
+        self._raise_if_cancelled(should_cancel)
+        enhanced_transition = self.enhance_script_with_emphasis(transition_text)
+        
+        # Generate audio for transition
+        transition_filename = f"{artist_name}_transition_{index}_{uuid.uuid4().hex[:8]}.mp3"
+        transition_path = os.path.join(cache_dir, transition_filename)
+        print(f"Generating transition: {transition_path}")
+        
+        self._raise_if_cancelled(should_cancel)
+        audio_gen.generate_radio_intro_audio(
+            enhanced_transition,
+            output_path=transition_path,
+            use_ssml=True  # New parameter to indicate SSML support
+        )
+        
+        if not os.path.exists(transition_path) or os.path.getsize(transition_path) == 0:
+            raise ValueError(f"Failed to create transition audio file: {transition_path}")
+        return transition_path, enhanced_transition
 
     def generate_content(self, artist_name: str) -> Dict:
         """
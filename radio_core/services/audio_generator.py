@@ -1,6 +1,8 @@
 import os
+import time
 import requests
 from gtts import gTTS
+from .metrics import TTS_REQUEST_SECONDS, TTS_CHARACTERS, TTS_AUDIO_BYTES
 
 class AudioGenerator:
     def __init__(self):
@@ -59,8 +61,17 @@ class AudioGenerator:
         print(f"Text length: {len(radio_intro_text)} characters")
         print(f"Text content: {radio_intro_text}\n") 
         
-        response = requests.post(url, headers=headers, json=payload)
+        TTS_CHARACTERS.inc(len(radio_intro_text), provider='elevenlabs')
+        start = time.perf_counter()
+        try:
+            response = requests.post(url, headers=headers, json=payload)
+        except Exception:
+            TTS_REQUEST_SECONDS.observe(time.perf_counter() - start, provider='elevenlabs', outcome='error')
+            raise
+        outcome = 'success' if response.status_code == 200 else 'error'
+        TTS_REQUEST_SECONDS.observe(time.perf_counter() - start, provider='elevenlabs', outcome=outcome)
         if response.status_code == 200:
+            TTS_AUDIO_BYTES.inc(len(response.content), provider='elevenlabs')
             with open(output_path, "wb") as f:
                 f.write(response.content)
             return output_path
@@ -73,14 +84,19 @@ class AudioGenerator:
         This is the default method for local testing.
         Note: gTTS doesn't support SSML, so SSML tags will be stripped.
         """
+        start = time.perf_counter()
         try:
             # Strip SSML tags if present
             if use_ssml:
                 import re
                 radio_intro_text = re.sub(r'<[^>]+>', '', radio_intro_text)
             
+            TTS_CHARACTERS.inc(len(radio_intro_text), provider='gtts')
             tts = gTTS(text=radio_intro_text, lang=self.language, slow=False)
             tts.save(output_path)
+            TTS_REQUEST_SECONDS.observe(time.perf_counter() - start, provider='gtts', outcome='success')
+            TTS_AUDIO_BYTES.inc(os.path.getsize(output_path), provider='gtts')
             return output_path
         except Exception as e:
+            TTS_REQUEST_SECONDS.observe(time.perf_counter() - start, provider='gtts', outcome='error')
             raise Exception(f"Text-to-speech error: {str(e)}")
\ No newline at end of file
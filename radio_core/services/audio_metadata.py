@@ -0,0 +1,260 @@
+import os
+import re
+import json
+import fcntl
+import queue
+import hashlib
+import tempfile
+import threading
+import subprocess
+from typing import Callable, Dict, Iterable, Optional, Set
+from pydub.utils import mediainfo_json, get_encoder_name
+
+# Song dictionary keys filled in from the metadata index
+SONG_METADATA_FIELDS = ('duration', 'codec', 'sample_rate', 'channels', 'bitrate', 'loudness', 'sha256')
+
+_LOUDNESS_PATTERN = re.compile(r'I:\s+(-?[\d.]+|-inf) LUFS')
+_HASH_CHUNK_SIZE = 1024 * 1024
+# Seconds new entries are collected before the index is written, so a batch of probes costs one write
+SAVE_DELAY_SECONDS = 2.0
+
+
+def probe_audio_file(path: str, measure_loudness: bool = True, known_sha256: Optional[str] = None) -> Dict:
+    """
+    Read audio metadata without decoding the file in Python.
+
+    Stream properties come from an ffprobe header probe. Integrated loudness
+    (EBU R128) needs one streaming decode pass, done by ffmpeg itself.
+
+    Args:
+        path (str): Audio file to probe
+        measure_loudness (bool): Whether to run the loudness pass
+        known_sha256 (Optional[str]): Content hash already computed (e.g. during upload)
+
+    Returns:
+        Dict: duration (seconds), codec, sample_rate, channels, bitrate,
+        loudness (LUFS or None) and sha256 of the file content
+    """
+    info = mediainfo_json(path)
+    audio_stream = next((s for s in info.get('streams', []) if s.get('codec_type') == 'audio'), {})
+    file_format = info.get('format', {})
+
+    duration = file_format.get('duration') or audio_stream.get('duration')
+    bitrate = file_format.get('bit_rate') or audio_stream.get('bit_rate')
+
+    return {
+        'duration': round(float(duration), 3) if duration else None,
+        'codec': audio_stream.get('codec_name'),
+        'sample_rate': int(audio_stream['sample_rate']) if audio_stream.get('sample_rate') else None,
+        'channels': audio_stream.get('channels'),
+        'bitrate': int(bitrate) if bitrate else None,
+        'loudness': measure_integrated_loudness(path) if measure_loudness else None,
+        'sha256': known_sha256 or hash_file(path)
+    }
+
+
+def measure_integrated_loudness(path: str) -> Optional[float]:
+    """Measure EBU R128 integrated loudness (LUFS) with ffmpeg's ebur128 filter"""
+    try:
+        result = subprocess.run(
+            [get_encoder_name(), '-nostats', '-hide_banner', '-i', path,
+             '-af', 'ebur128=framelog=quiet', '-f', 'null', '-'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors='replace'
+        )
+    except OSError as e:
+        print(f"Loudness measurement unavailable: {str(e)}")
+        return None
+
+    matches = _LOUDNESS_PATTERN.findall(result.stderr)
+    if not matches or matches[-1] == '-inf':
+        return None
+    return float(matches[-1])
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AudioMetadataIndex:
+    """
+    Persistent per-song metadata, computed once per file version.
+
+    Entries are keyed by absolute path and validated against the file's size and
+    mtime, so a replaced file is probed again. Probing runs on a background
+    thread; lookups never decode or probe audio. New entries are written a
+    moment later in one batch, merged under a file lock with the entries
+    other processes sharing the index have saved.
+    """
+
+    def __init__(self, index_path: str, measure_loudness: bool = True,
+                 on_update: Optional[Callable[[str, Dict], None]] = None):
+        self.index_path = index_path
+        self.measure_loudness = measure_loudness
+        self.on_update = on_update
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # Serializes flush() within the process
+        self._entries: Dict[str, Dict] = self._load()
+        self._dirty: Set[str] = set()  # Paths changed since the last flush
+        self._save_timer = None
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._scheduled = set()
+        self._worker = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable metadata index {self.index_path}: {str(e)}")
+            return {}
+
+    def _mark_dirty(self, path: str):
+        """Queue an entry for the next write, starting the save delay if none is pending"""
+        with self._lock:
+            self._dirty.add(path)
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(SAVE_DELAY_SECONDS, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """Write pending entries now, merged with the index on disk"""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                return
+            directory = os.path.dirname(self.index_path)
+            os.makedirs(directory, exist_ok=True)
+            with open(f"{self.index_path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                on_disk = self._load()
+                with self._lock:
+                    # Learn what other processes probed; our own new entries win
+                    for path, entry in on_disk.items():
+                        if path not in dirty and path not in self._dirty:
+                            self._entries[path] = entry
+                    merged = {**on_disk, **{path: self._entries[path] for path in dirty if path in self._entries}}
+                    data = json.dumps(merged, ensure_ascii=False, indent=2)
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.index_path),
+                                                 suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(temp_path, self.index_path)
+
+    @staticmethod
+    def _file_version(path: str) -> Optional[Dict]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def get(self, path: str) -> Optional[Dict]:
+        """
+        Get stored metadata for a file if it is still current
+
+        Returns:
+            Optional[Dict]: Metadata, or None if unknown or the file changed
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if not entry:
+            return None
+        version = self._file_version(path)
+        if not version or version['size'] != entry['size'] or version['mtime_ns'] != entry['mtime_ns']:
+            return None
+        return {field: entry.get(field) for field in SONG_METADATA_FIELDS}
+
+    def ensure(self, path: str) -> Optional[Dict]:
+        """Get metadata for a file, probing it synchronously if needed"""
+        metadata = self.get(path)
+        if metadata is None or metadata.get('duration') is None:
+            metadata = self._probe_and_store(os.path.abspath(path))
+        return metadata
+
+    def put(self, path: str, **known_fields):
+        """
+        Record metadata computed elsewhere (e.g. a hash taken during upload)
+
+        Fields are kept only if the entry is still current when probing finishes.
+        """
+        path = os.path.abspath(path)
+        version = self._file_version(path)
+        if not version:
+            return
+        with self._lock:
+            entry = self._entries.get(path)
+            if not entry or entry['size'] != version['size'] or entry['mtime_ns'] != version['mtime_ns']:
+                entry = dict(version)
+                self._entries[path] = entry
+            entry.update({k: v for k, v in known_fields.items() if k in SONG_METADATA_FIELDS})
+        self._mark_dirty(path)
+
+    def schedule(self, paths: Iterable[str]):
+        """Probe files in the background unless they already have current metadata"""
+        started = False
+        for path in paths:
+            path = os.path.abspath(path)
+            metadata = self.get(path)
+            if metadata and metadata.get('duration') is not None:
+                continue
+            with self._lock:
+                if path in self._scheduled:
+                    continue
+                self._scheduled.add(path)
+            self._queue.put(path)
+            started = True
+        if started:
+            self._start_worker()
+
+    def wait_idle(self):
+        """Block until every scheduled probe has finished and been saved"""
+        self._queue.join()
+        self.flush()
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._probe_loop, daemon=True)
+            self._worker.start()
+
+    def _probe_loop(self):
+        while True:
+            path = self._queue.get()
+            try:
+                self._probe_and_store(path)
+            except Exception as e:
+                print(f"Error probing audio metadata for {path}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._scheduled.discard(path)
+                self._queue.task_done()
+
+    def _probe_and_store(self, path: str) -> Optional[Dict]:
+        version = self._file_version(path)
+        if not version:
+            return None
+        with self._lock:
+            entry = self._entries.get(path) or {}
+        known_sha256 = entry.get('sha256') if entry.get('size') == version['size'] and \
+            entry.get('mtime_ns') == version['mtime_ns'] else None
+        metadata = probe_audio_file(path, measure_loudness=self.measure_loudness, known_sha256=known_sha256)
+        with self._lock:
+            self._entries[path] = {**version, **metadata}
+        self._mark_dirty(path)
+        if self.on_update:
+            self.on_update(path, metadata)
+        return metadata
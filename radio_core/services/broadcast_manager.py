@@ -1,28 +1,108 @@
 import os
 import time
-from threading import Thread, Event
+from collections import deque
+from threading import Thread, Event, Lock
+from typing import List, Optional
+from .mp3_frames import iter_mp3_frames, is_info_frame
+from .stream_buffer import StreamBuffer
+
+class _PreparedItem:
+    """A playlist item opened ahead of time with its first frames already parsed"""
+
+    def __init__(self, path: str, prebuffer_seconds: float):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.frames = iter_mp3_frames(self.file)
+        self.head = []
+        buffered = 0.0
+        for index, frame in enumerate(self.frames):
+            if index == 0 and is_info_frame(frame):
+                continue
+            self.head.append(frame)
+            buffered += frame.duration
+            if buffered >= prebuffer_seconds:
+                break
+
+    def __iter__(self):
+        head, self.head = self.head, []
+        yield from head
+        yield from self.frames
+
+    def close(self):
+        self.file.close()
 
 class BroadcastManager:
-    def __init__(self):
+    def __init__(self, lead_seconds: float = 0.5, buffer_seconds: float = 30.0, burst_seconds: float = 2.0,
+                 prebuffer_seconds: float = 5.0):
+        """
+        Broadcast a playlist of MP3 files in real time through a shared StreamBuffer.
+
+        Args:
+            lead_seconds (float): How far ahead of real time frames are published
+            buffer_seconds (float): Audio kept in the ring buffer for listeners
+            burst_seconds (float): Audio sent immediately to a newly connected listener
+            prebuffer_seconds (float): Audio of the next item parsed before it is due
+        """
         self.is_broadcasting = False
         self.stop_event = Event()
         self.broadcast_thread = None
         self.current_audio = None
+        self.lead_seconds = lead_seconds
+        self.prebuffer_seconds = prebuffer_seconds
+        self.buffer = StreamBuffer(capacity_seconds=buffer_seconds, burst_seconds=burst_seconds)
+        self.position = 0.0  # Seconds of audio published for the current broadcast
+        self.item_started_at = 0.0  # Broadcast position where the current item began
+        self.items_played = 0
+        self.bitrate = None
+        self.error = None
+
+        self.playlist = deque()  # Upcoming audio files, after the prepared one
+        self.repeat = False
+        self._next_item: Optional[_PreparedItem] = None
+        self._prefetch_thread = None
+        self._playlist_lock = Lock()
+        self._playlist_generation = 0  # Bumped when the queue is cleared
 
-    def start_broadcast(self, audio_file):
+    def start_broadcast(self, audio_file=None, playlist: Optional[List[str]] = None, repeat: bool = False):
         """
-        Start broadcasting the audio file
+        Start broadcasting the audio file, followed by the playlist
+
+        Args:
+            audio_file (str): First file to play
+            playlist (Optional[List[str]]): Files to play afterwards; with no
+                files at all, the already queued playlist is played
+            repeat (bool): Re-queue each item after it starts, looping forever
         """
         if self.is_broadcasting:
             raise Exception("Broadcast is already running")
 
-        self.current_audio = audio_file
+        audio_files = ([audio_file] if audio_file else []) + list(playlist or [])
+        self._check_files(audio_files)
+
+        with self._playlist_lock:
+            if audio_files:
+                self.playlist = deque(audio_files)
+            if not self.playlist:
+                raise Exception("No audio files to broadcast")
+            self.repeat = repeat
+
         self.stop_event.clear()
+        self.buffer.reset()
+        self.position = 0.0
+        self.item_started_at = 0.0
+        self.items_played = 0
+        self.bitrate = None
+        self.error = None
         self.is_broadcasting = True
-        
-        self.broadcast_thread = Thread(target=self._broadcast_loop)
+
+        self.broadcast_thread = Thread(target=self._broadcast_loop, daemon=True)
         self.broadcast_thread.start()
 
+    @property
+    def stop_requested(self) -> bool:
+        """Whether the last broadcast was ended by stop_broadcast rather than running out of audio"""
+        return self.stop_event.is_set()
+
     def stop_broadcast(self):
         """
         Stop the current broadcast
@@ -32,22 +112,139 @@ class BroadcastManager:
 
         self.stop_event.set()
         self.broadcast_thread.join()
+        self.clear_queue()
         self.is_broadcasting = False
         self.current_audio = None
 
+    def enqueue(self, audio_files: List[str]) -> List[str]:
+        """
+        Append files to the playlist, also while live
+
+        Returns:
+            List[str]: Upcoming files in play order
+        """
+        self._check_files(audio_files)
+        with self._playlist_lock:
+            self.playlist.extend(audio_files)
+        if self.is_broadcasting:
+            self._start_prefetch()
+        return self.get_queue()
+
+    def clear_queue(self) -> List[str]:
+        """Drop all upcoming files; the current one plays to its end"""
+        with self._playlist_lock:
+            self.playlist.clear()
+            self._playlist_generation += 1
+            prepared, self._next_item = self._next_item, None
+        if prepared:
+            prepared.close()
+        return self.get_queue()
+
+    def get_queue(self) -> List[str]:
+        """Get upcoming files in play order"""
+        with self._playlist_lock:
+            upcoming = [self._next_item.path] if self._next_item else []
+            return upcoming + list(self.playlist)
+
+    @staticmethod
+    def _check_files(audio_files: List[str]):
+        for audio_file in audio_files:
+            if not os.path.isfile(audio_file):
+                raise Exception(f"Audio file not found: {audio_file}")
+
+    def _prepare(self, path: str) -> Optional[_PreparedItem]:
+        try:
+            return _PreparedItem(path, self.prebuffer_seconds)
+        except OSError as e:
+            print(f"Skipping playlist item {path}: {str(e)}")
+            return None
+
+    def _start_prefetch(self):
+        """Prepare the next item in the background unless one is ready or loading"""
+        with self._playlist_lock:
+            if self._next_item or not self.playlist:
+                return
+            if self._prefetch_thread and self._prefetch_thread.is_alive():
+                return
+            self._prefetch_thread = Thread(target=self._prefetch_next, daemon=True)
+            self._prefetch_thread.start()
+
+    def _prefetch_next(self):
+        with self._playlist_lock:
+            if self._next_item or not self.playlist:
+                return
+            path = self.playlist.popleft()
+            generation = self._playlist_generation
+        item = self._prepare(path)
+        if item is None:
+            return
+        with self._playlist_lock:
+            if generation == self._playlist_generation and self._next_item is None:
+                self._next_item = item
+                return
+        item.close()  # Queue was cleared while loading
+
+    def _take_next_item(self) -> Optional[_PreparedItem]:
+        """Get the prepared next item, preparing it now if the prefetch missed it"""
+        prefetch_thread = self._prefetch_thread
+        if prefetch_thread:
+            prefetch_thread.join()
+        while not self.stop_event.is_set():
+            with self._playlist_lock:
+                if self._next_item:
+                    item, self._next_item = self._next_item, None
+                    return item
+                if not self.playlist:
+                    return None
+                path = self.playlist.popleft()
+            item = self._prepare(path)
+            if item:
+                return item
+        return None
+
+    def _start_item(self, item: _PreparedItem):
+        self.current_audio = item.path
+        self.item_started_at = self.position
+        self.items_played += 1
+        if self.repeat:
+            with self._playlist_lock:
+                self.playlist.append(item.path)
+        print(f"Broadcasting {item.path}")
+        self._start_prefetch()
+
     def _broadcast_loop(self):
         """
         Main broadcasting loop
+
+        Plays playlist items back to back, publishing each frame when the
+        playhead reaches it (minus lead_seconds). The clock runs across item
+        boundaries, and the next item is opened and parsed while the current
+        one plays, so the switch happens at a frame boundary without a gap.
         """
-        while not self.stop_event.is_set():
-            try:
-                # TODO: Implement actual broadcasting logic
-                # This could involve streaming to a radio server
-                # or playing through a local audio device
-                time.sleep(1)  # Placeholder for actual broadcasting
-            except Exception as e:
-                self.is_broadcasting = False
-                raise Exception(f"Broadcast error: {str(e)}")
+        try:
+            started = time.monotonic()
+            item = self._take_next_item()
+            while item is not None and not self.stop_event.is_set():
+                self._start_item(item)
+                try:
+                    for frame in item:
+                        wait = started + self.position - self.lead_seconds - time.monotonic()
+                        if wait > 0 and self.stop_event.wait(wait):
+                            break
+                        if self.stop_event.is_set():
+                            break
+                        self.buffer.publish(frame.data, frame.duration)
+                        self.position += frame.duration
+                        self.bitrate = frame.bitrate
+                finally:
+                    item.close()
+                item = self._take_next_item()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Broadcast error: {str(e)}")
+        finally:
+            self.buffer.close()
+            self.is_broadcasting = False
 
     def get_status(self):
         """
@@ -55,5 +252,12 @@ class BroadcastManager:
         """
         return {
             "is_broadcasting": self.is_broadcasting,
-            "current_audio": self.current_audio
-        } 
\ No newline at end of file
+            "current_audio": self.current_audio,
+            "position": round(self.position, 3),
+            "item_position": round(self.position - self.item_started_at, 3),
+            "items_played": self.items_played,
+            "upcoming": self.get_queue(),
+            "repeat": self.repeat,
+            "bitrate": self.bitrate,
+            "error": self.error
+        }
@@ -0,0 +1,276 @@
+import os
+import time
+import socket
+import hashlib
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+# Seconds between background sweeps
+DEFAULT_SWEEP_INTERVAL = 300
+# Files younger than this are never evicted, so audio being generated right now survives
+DEFAULT_GRACE_SECONDS = 600
+# Eviction stops once usage falls to this fraction of the quota, so sweeps don't thrash
+LOW_WATER_RATIO = 0.9
+
+
+class CacheQuota(NamedTuple):
+    path: str
+    max_bytes: Optional[int] = None
+    max_files: Optional[int] = None
+    max_age_seconds: Optional[float] = None
+
+
+class _CachedFile(NamedTuple):
+    path: str
+    size: int
+    last_used: float
+
+
+class CacheManager:
+    """
+    Keep generated audio within per-directory size, count and age limits.
+
+    Each quota covers a directory tree, except subdirectories that have a
+    quota of their own. A sweep deletes expired files first and then the
+    least recently used ones until the directory is back under its limits.
+    touch() records use in memory and in the file's access time (set
+    explicitly, since most filesystems don't update it on read), so a sweeper
+    in another process sees it too; otherwise the modification time counts.
+    Files that are pinned, reported by a pin source (such as the broadcast
+    queue) or younger than the grace period are never evicted. With a pin_dir,
+    pins are also recorded as files there, so shows being assembled in worker
+    processes are protected from the sweeper running elsewhere.
+    """
+
+    def __init__(self, quotas: List[CacheQuota], sweep_interval: float = DEFAULT_SWEEP_INTERVAL,
+                 grace_seconds: float = DEFAULT_GRACE_SECONDS, pin_dir: Optional[str] = None):
+        self.quotas = [quota._replace(path=os.path.abspath(quota.path)) for quota in quotas]
+        self.pin_dir = os.path.abspath(pin_dir) if pin_dir else None
+        self.sweep_interval = sweep_interval
+        self.grace_seconds = grace_seconds
+        self._quota_roots = {quota.path for quota in self.quotas}
+        self._last_used: Dict[str, float] = {}
+        self._pins: Dict[str, int] = {}  # Reference count per pinned path
+        self._pin_sources: List[Callable[[], Iterable[str]]] = []
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        for quota in self.quotas:
+            os.makedirs(quota.path, exist_ok=True)
+        if self.pin_dir:
+            os.makedirs(self.pin_dir, exist_ok=True)
+
+    def start(self):
+        """Start the background sweeper"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._sweep_loop, name='CacheSweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def touch(self, path: str):
+        """Record that a cached file was used"""
+        path = os.path.abspath(path)
+        now = time.time()
+        with self._lock:
+            self._last_used[path] = now
+        try:
+            # Keep the modification time: it backs the ETags of served files
+            os.utime(path, ns=(int(now * 1e9), os.stat(path).st_mtime_ns))
+        except OSError:
+            pass
+
+    def _pin_file(self, path: str) -> str:
+        """Pin file of this process for a path: <path hash>.<host>.<pid>"""
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        return os.path.join(self.pin_dir, f"{digest}.{socket.gethostname()}.{os.getpid()}")
+
+    def pin(self, paths: Iterable[str]):
+        """Protect files from eviction until unpin() is called for them"""
+        with self._lock:
+            for path in paths:
+                path = os.path.abspath(path)
+                self._pins[path] = self._pins.get(path, 0) + 1
+                if self.pin_dir and self._pins[path] == 1:
+                    with open(self._pin_file(path), 'w', encoding='utf-8') as f:
+                        f.write(path)
+
+    def unpin(self, paths: Iterable[str]):
+        with self._lock:
+            for path in paths:
+                path = os.path.abspath(path)
+                count = self._pins.get(path, 0) - 1
+                if count > 0:
+                    self._pins[path] = count
+                elif self._pins.pop(path, None) is not None and self.pin_dir:
+                    try:
+                        os.remove(self._pin_file(path))
+                    except FileNotFoundError:
+                        pass
+
+    def _shared_pins(self) -> Set[str]:
+        """Paths pinned by any process, dropping the pin files of processes on this host that have exited"""
+        pinned = set()
+        host = socket.gethostname()
+        try:
+            entries = list(os.scandir(self.pin_dir))
+        except FileNotFoundError:
+            return pinned
+        for entry in entries:
+            pin_host, _, pid = entry.name.partition('.')[2].rpartition('.')
+            if pin_host == host and pid.isdigit():
+                try:
+                    os.kill(int(pid), 0)
+                except ProcessLookupError:
+                    # The process died without unpinning
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                except PermissionError:
+                    pass  # Alive, owned by another user
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    pinned.add(f.read())
+            except FileNotFoundError:
+                pass  # Unpinned meanwhile
+        return pinned
+
+    def add_pin_source(self, source: Callable[[], Iterable[str]]):
+        """Register a callable returning paths currently in use, consulted on every sweep"""
+        self._pin_sources.append(source)
+
+    def _pinned_paths(self) -> Set[str]:
+        with self._lock:
+            pinned = set(self._pins)
+        if self.pin_dir:
+            pinned.update(self._shared_pins())
+        for source in self._pin_sources:
+            try:
+                pinned.update(os.path.abspath(path) for path in source() if path)
+            except Exception as e:
+                print(f"Cache pin source failed: {str(e)}")
+        return pinned
+
+    def _scan(self, quota: CacheQuota) -> List[_CachedFile]:
+        """List files under a quota's directory, skipping trees owned by other quotas"""
+        files = []
+        pending = [quota.path]
+        with self._lock:
+            last_used = dict(self._last_used)
+        while pending:
+            directory = pending.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in self._quota_roots and entry.path != self.pin_dir:
+                        pending.append(entry.path)
+                elif entry.name.startswith('.'):
+                    continue  # Bookkeeping such as lock files and the transition library's call log
+                elif entry.is_file(follow_symlinks=False):
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    used = max(stat.st_mtime, stat.st_atime, last_used.get(entry.path, 0.0))
+                    files.append(_CachedFile(entry.path, stat.st_size, used))
+        return files
+
+    def sweep(self) -> Dict[str, Dict]:
+        """
+        Enforce every quota once
+
+        Returns:
+            Dict[str, Dict]: Per-directory usage and what was evicted
+        """
+        with self._sweep_lock:
+            pinned = self._pinned_paths()
+            now = time.time()
+            for quota in self.quotas:
+                self._stats[quota.path] = self._sweep_quota(quota, pinned, now)
+            with self._lock:
+                # Forget use times of files that no longer exist
+                self._last_used = {path: used for path, used in self._last_used.items() if os.path.exists(path)}
+            return self.get_stats()
+
+    def _sweep_quota(self, quota: CacheQuota, pinned: Set[str], now: float) -> Dict:
+        files = sorted(self._scan(quota), key=lambda f: f.last_used)
+        total_bytes = sum(f.size for f in files)
+        total_files = len(files)
+        evicted_files = evicted_bytes = 0
+
+        def evictable(f: _CachedFile) -> bool:
+            return f.path not in pinned and now - f.last_used >= self.grace_seconds
+
+        def evict(f: _CachedFile) -> bool:
+            try:
+                os.remove(f.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Could not evict {f.path}: {str(e)}")
+                return False
+            return True
+
+        remaining = []
+        for f in files:
+            if quota.max_age_seconds is not None and now - f.last_used > quota.max_age_seconds \
+                    and evictable(f) and evict(f):
+                total_bytes -= f.size
+                total_files -= 1
+                evicted_files += 1
+                evicted_bytes += f.size
+            else:
+                remaining.append(f)
+
+        over_bytes = quota.max_bytes is not None and total_bytes > quota.max_bytes
+        over_files = quota.max_files is not None and total_files > quota.max_files
+        if over_bytes or over_files:
+            target_bytes = quota.max_bytes * LOW_WATER_RATIO if quota.max_bytes is not None else None
+            target_files = int(quota.max_files * LOW_WATER_RATIO) if quota.max_files is not None else None
+            for f in remaining:  # Least recently used first
+                if (target_bytes is None or total_bytes <= target_bytes) and \
+                        (target_files is None or total_files <= target_files):
+                    break
+                if evictable(f) and evict(f):
+                    total_bytes -= f.size
+                    total_files -= 1
+                    evicted_files += 1
+                    evicted_bytes += f.size
+
+        if evicted_files:
+            print(f"Cache sweep of {quota.path}: evicted {evicted_files} files ({evicted_bytes} bytes)")
+
+        return {
+            'bytes': total_bytes,
+            'files': total_files,
+            'max_bytes': quota.max_bytes,
+            'max_files': quota.max_files,
+            'max_age_seconds': quota.max_age_seconds,
+            'evicted_files': evicted_files,
+            'evicted_bytes': evicted_bytes,
+            'swept_at': now
+        }
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Get the result of the last sweep per directory"""
+        return {path: dict(stats) for path, stats in self._stats.items()}
+
+    def _sweep_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Cache sweep failed: {str(e)}")
+            self._stop_event.wait(self.sweep_interval)
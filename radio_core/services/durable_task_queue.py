@@ -0,0 +1,211 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Columns that hold JSON documents rather than scalars
+_JSON_COLUMNS = ('params', 'result')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT,
+    started_at TEXT,
+    completed_at TEXT,
+    current_step TEXT,
+    progress INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    log_file TEXT,
+    output_file TEXT,
+    worker_id TEXT,
+    heartbeat_at REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks (status, priority, seq);
+"""
+
+# Fields a worker may write back while it owns a task
+UPDATABLE_FIELDS = (
+    'status', 'started_at', 'completed_at', 'current_step', 'progress',
+    'result', 'error', 'output_file'
+)
+
+
+class DurableTaskQueue:
+    """
+    Priority task queue persisted in SQLite.
+
+    Lets the Flask app enqueue work that any number of worker processes claim,
+    as long as they can all open the same database file. Claiming happens in an
+    IMMEDIATE transaction so a task is handed to exactly one worker.
+
+    WAL journaling (the default) needs all processes on the same host; pass
+    journal_mode='DELETE' when the database lives on a network share.
+    """
+
+    def __init__(self, db_path: str, journal_mode: str = 'WAL', busy_timeout: float = 30.0):
+        self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _row_to_task(row: sqlite3.Row) -> Dict:
+        task = dict(row)
+        for column in _JSON_COLUMNS:
+            if task.get(column) is not None:
+                task[column] = json.loads(task[column])
+        task['cancel_requested'] = bool(task['cancel_requested'])
+        return task
+
+    def enqueue(self, task: Dict):
+        """Persist a new pending task"""
+        self._connection().execute(
+            """INSERT INTO tasks (id, type, params, priority, status, created_at, log_file, progress)
+               VALUES (?, ?, ?, ?, 'pending', ?, ?, 0)""",
+            (task['id'], task['type'], json.dumps(task['params']), task['priority'],
+             task['created_at'], task['log_file'])
+        )
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """
+        Atomically take the highest-priority pending task.
+
+        Returns:
+            Optional[Dict]: The claimed task, or None if the queue is empty
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT id FROM tasks WHERE status = 'pending' ORDER BY priority, seq LIMIT 1"
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                """UPDATE tasks SET status = 'processing', worker_id = ?, started_at = ?, heartbeat_at = ?
+                   WHERE id = ?""",
+                (worker_id, datetime.now().isoformat(), time.time(), row['id'])
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return self.get(row['id'])
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """Get a task by id"""
+        row = self._connection().execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._row_to_task(row) if row else None
+
+    def update(self, task_id: str, **fields):
+        """Write back task fields (see UPDATABLE_FIELDS)"""
+        invalid = set(fields) - set(UPDATABLE_FIELDS)
+        if invalid:
+            raise ValueError(f"Cannot update task fields: {', '.join(sorted(invalid))}")
+        if not fields:
+            return
+        values = [json.dumps(value) if key in _JSON_COLUMNS and value is not None else value
+                  for key, value in fields.items()]
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        self._connection().execute(
+            f"UPDATE tasks SET {assignments}, heartbeat_at = ? WHERE id = ?",
+            (*values, time.time(), task_id)
+        )
+
+    def heartbeat(self, task_id: str):
+        """Record that the owning worker is still alive"""
+        self._connection().execute("UPDATE tasks SET heartbeat_at = ? WHERE id = ?", (time.time(), task_id))
+
+    def list_active(self, task_type: Optional[str] = None) -> List[Dict]:
+        """List tasks that are pending or running"""
+        query = "SELECT * FROM tasks WHERE status IN ('pending', 'processing', 'cancelling')"
+        args = ()
+        if task_type:
+            query += " AND type = ?"
+            args = (task_type,)
+        rows = self._connection().execute(query + " ORDER BY priority, seq", args).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Count tasks per status"""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def request_cancel(self, task_id: str) -> Optional[Dict]:
+        """
+        Cancel a pending task, or flag a running task for its worker to stop.
+
+        Returns:
+            Optional[Dict]: The updated task, or None if it does not exist
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "UPDATE tasks SET status = 'cancelled', completed_at = ?, cancel_requested = 1 "
+                "WHERE id = ? AND status = 'pending'",
+                (datetime.now().isoformat(), task_id)
+            )
+            connection.execute(
+                "UPDATE tasks SET status = 'cancelling', cancel_requested = 1 "
+                "WHERE id = ? AND status = 'processing'",
+                (task_id,)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return self.get(task_id)
+
+    def is_cancel_requested(self, task_id: str) -> bool:
+        """Check whether cancellation was requested for a task"""
+        row = self._connection().execute(
+            "SELECT cancel_requested FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def requeue_stale(self, timeout: float) -> int:
+        """
+        Return tasks whose worker stopped heartbeating to the pending state.
+
+        Returns:
+            int: Number of tasks requeued
+        """
+        cutoff = time.time() - timeout
+        connection = self._connection()
+        # Tasks that were being cancelled when their worker died are simply finished
+        connection.execute(
+            """UPDATE tasks SET status = 'cancelled', completed_at = ?
+               WHERE status IN ('processing', 'cancelling') AND heartbeat_at < ? AND cancel_requested = 1""",
+            (datetime.now().isoformat(), cutoff)
+        )
+        cursor = connection.execute(
+            """UPDATE tasks SET status = 'pending', worker_id = NULL, started_at = NULL
+               WHERE status = 'processing' AND heartbeat_at < ? AND cancel_requested = 0""",
+            (cutoff,)
+        )
+        return cursor.rowcount
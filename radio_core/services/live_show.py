@@ -0,0 +1,301 @@
+import os
+import time
+import uuid
+import threading
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+from pydub import AudioSegment
+from .ai_radio_generator import GenerationCancelled
+from .audio_generator import AudioGenerator
+from .mp3_frames import mp3_duration
+
+# Default minutes of audio kept queued ahead of the playhead
+DEFAULT_LOOKAHEAD_MINUTES = 5
+# Seconds between checks of how much audio is queued
+LOOKAHEAD_POLL_INTERVAL = 1.0
+# Assumed song length when the metadata index has no duration yet
+ASSUMED_SONG_SECONDS = 180.0
+# Seconds stop() waits for the scheduler thread before returning
+STOP_JOIN_TIMEOUT = 2.0
+
+class LiveShowScheduler:
+    """
+    Generate a show just in time while it is on air.
+
+    The intro and first song go on air as soon as the intro is synthesized.
+    After that, each transition and the following song are generated and
+    queued on the BroadcastManager only when less than lookahead_seconds of
+    audio is left ahead of the playhead, so nothing is generated for content
+    that is never reached because the show is stopped. Generated files stay
+    pinned in the cache until the broadcast queue holds them. If the queue
+    runs dry while the next piece is still being generated (an underrun), the
+    broadcast ends and is restarted as soon as that piece is queued; only
+    stop() or stop_broadcast ends the show.
+    """
+
+    def __init__(self, ai_radio_generator, broadcast_manager, cache_dir: str, app=None,
+                 lookahead_seconds: float = DEFAULT_LOOKAHEAD_MINUTES * 60):
+        """
+        Args:
+            ai_radio_generator (AIRadioGenerator): Generates scripts and speech
+            broadcast_manager (BroadcastManager): Plays the queued audio
+            cache_dir (str): Directory for live intros, transitions and transcoded songs
+            app (Flask): Application whose context generation runs in
+            lookahead_seconds (float): Default audio to keep queued ahead of the playhead
+        """
+        self.ai_radio_generator = ai_radio_generator
+        self.broadcast_manager = broadcast_manager
+        self.cache_dir = cache_dir
+        self.app = app
+        self.lookahead_seconds = lookahead_seconds
+        self.show: Optional[Dict] = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._durations: Dict[str, float] = {}  # Cached playing time per queued file
+        self.cache_manager = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def set_cache_manager(self, cache_manager):
+        """Pin files between generation and queueing so the cache sweeper keeps them"""
+        self.cache_manager = cache_manager
+
+    def _pin(self, paths: List[str]):
+        if self.cache_manager:
+            self.cache_manager.pin(paths)
+
+    def _unpin(self, paths: List[str]):
+        if self.cache_manager:
+            self.cache_manager.unpin(paths)
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self, artist_name: str, enable_dj_transitions: bool = False, dj_options: Dict = None,
+              lookahead_seconds: Optional[float] = None) -> Dict:
+        """
+        Start a live show for an artist
+
+        Raises:
+            ValueError: If the artist doesn't exist or has no songs
+            Exception: If a live show is already running
+        """
+        if self.is_running:
+            raise Exception("A live show is already running")
+        songs = self.ai_radio_generator.music_manager.get_artist_songs(artist_name)
+        if not songs:
+            raise ValueError(f"No songs found for artist '{artist_name}'")
+
+        self._stop_event.clear()
+        self.show = {
+            'show_id': uuid.uuid4().hex[:8],
+            'artist': artist_name,
+            'state': 'preparing_intro',
+            'enable_dj_transitions': enable_dj_transitions,
+            'dj_options': dj_options or {},
+            'lookahead_seconds': lookahead_seconds or self.lookahead_seconds,
+            'songs_total': len(songs),
+            'songs_queued': 0,
+            'transitions_generated': 0,
+            'underruns': 0,
+            'started_at': time.time(),
+            'time_to_air': None,
+            'error': None
+        }
+        self._thread = threading.Thread(target=self._run, args=(songs,), daemon=True)
+        self._thread.start()
+        return self.get_status()
+
+    def stop(self, clear_queue: bool = False):
+        """
+        Stop generating further content
+
+        Waits at most STOP_JOIN_TIMEOUT for the scheduler thread; one stuck in
+        an LLM or TTS call stops when the call returns and queues nothing more.
+
+        Args:
+            clear_queue (bool): Also drop queued items; otherwise what is
+                already queued keeps playing
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(STOP_JOIN_TIMEOUT)
+        if clear_queue and self.broadcast_manager.is_broadcasting:
+            self.broadcast_manager.clear_queue()
+
+    def get_status(self) -> Optional[Dict]:
+        if self.show is None:
+            return None
+        status = dict(self.show)
+        if status['state'] == 'live':
+            status['queued_seconds'] = round(self._queued_seconds(), 1)
+        return status
+
+    def _should_cancel(self) -> bool:
+        # A broadcast that ended on its own ran out of audio; only an explicit stop ends the show
+        on_air = self.show['time_to_air'] is not None
+        broadcast_stopped = not self.broadcast_manager.is_broadcasting and self.broadcast_manager.stop_requested
+        return self._stop_event.is_set() or (on_air and broadcast_stopped)
+
+    def _resume_after_underrun(self):
+        """Restart a broadcast that ran out of audio with what has been queued since"""
+        broadcast_manager = self.broadcast_manager
+        if broadcast_manager.is_broadcasting or not broadcast_manager.get_queue():
+            return
+        try:
+            broadcast_manager.start_broadcast()
+        except Exception:
+            if not broadcast_manager.is_broadcasting:
+                raise
+            return  # Restarted by someone else meanwhile
+        self.show['underruns'] += 1
+        print(f"Live show {self.show['show_id']}: queue ran dry, broadcast restarted")
+
+    def _check_cancelled(self):
+        if self._should_cancel():
+            raise GenerationCancelled("Live show stopped")
+
+    def _run(self, songs: List[Dict]):
+        show = self.show
+        context = self.app.app_context() if self.app else nullcontext()
+        with context:
+            try:
+                self._air_intro(songs)
+                next_index = 1
+                while next_index < len(songs):
+                    self._check_cancelled()
+                    self._resume_after_underrun()
+                    if self._queued_seconds() > show['lookahead_seconds']:
+                        self._stop_event.wait(LOOKAHEAD_POLL_INTERVAL)
+                        continue
+                    items = self._next_items(songs, next_index)
+                    try:
+                        self._check_cancelled()  # Stopped while generating: queue nothing more
+                        self.broadcast_manager.enqueue(items)
+                        self._resume_after_underrun()
+                    finally:
+                        self._unpin(items)  # The broadcast queue protects them from here
+                    show['songs_queued'] += 1
+                    next_index += 1
+                show['state'] = 'completed'
+                print(f"Live show {show['show_id']}: all {len(songs)} songs queued")
+            except GenerationCancelled:
+                show['state'] = 'stopped'
+                print(f"Live show {show['show_id']} stopped")
+            except Exception as e:
+                show['state'] = 'failed'
+                show['error'] = str(e)
+                print(f"Live show {show['show_id']} failed: {str(e)}")
+
+    def _air_intro(self, songs: List[Dict]):
+        """Generate the intro and put it on air with the first song"""
+        show = self.show
+        artist_name = show['artist']
+        started = time.monotonic()
+
+        # The intro only needs transcripts for the songs of the first lookahead window
+        songs_data = [
+            self.ai_radio_generator.get_song_data(artist_name, song, should_cancel=self._should_cancel)
+            for song in self._songs_within(songs, show['lookahead_seconds'])
+        ]
+        generator = self.ai_radio_generator
+        self._check_cancelled()
+        script = generator.generate_enhanced_script(artist_name, songs_data)
+        self._check_cancelled()
+        enhanced_script = generator.enhance_script_with_emphasis(script)
+
+        intro_path = os.path.join(self.cache_dir, f"{artist_name}_live_intro_{show['show_id']}.mp3")
+        self._pin([intro_path])
+        try:
+            self._check_cancelled()
+            AudioGenerator().generate_radio_intro_audio(enhanced_script, output_path=intro_path, use_ssml=True)
+            if not os.path.exists(intro_path) or os.path.getsize(intro_path) == 0:
+                raise ValueError(f"Failed to create intro audio file: {intro_path}")
+
+            first_song = self._pinned_playable_path(songs[0])
+            try:
+                if self.broadcast_manager.is_broadcasting:
+                    self.broadcast_manager.enqueue([intro_path, first_song])
+                else:
+                    self.broadcast_manager.start_broadcast(intro_path, playlist=[first_song])
+            finally:
+                self._unpin([first_song])
+        finally:
+            self._unpin([intro_path])
+
+        show['songs_queued'] = 1
+        show['time_to_air'] = round(time.monotonic() - started, 2)
+        show['state'] = 'live'
+        print(f"Live show {show['show_id']} on air after {show['time_to_air']} seconds")
+
+    def _next_items(self, songs: List[Dict], index: int) -> List[str]:
+        """
+        Generate the transition into songs[index] (if enabled) and return the
+        files to queue, pinned; the caller unpins them once they are queued
+        """
+        show = self.show
+        items = []
+        try:
+            if show['enable_dj_transitions']:
+                transition_path = self.ai_radio_generator.generate_transition_audio(
+                    show['artist'], index - 1, songs[index - 1], songs[index], show['dj_options'],
+                    self.cache_dir, should_cancel=self._should_cancel
+                )
+                self._pin([transition_path])
+                items.append(transition_path)
+                show['transitions_generated'] += 1
+            items.append(self._pinned_playable_path(songs[index]))
+        except Exception:
+            self._unpin(items)
+            raise
+        return items
+
+    def _pinned_playable_path(self, song: Dict) -> str:
+        """_playable_path, pinned before an earlier transcode is reused so it can't be evicted meanwhile"""
+        path = os.path.abspath(song['path'])
+        if not path.lower().endswith('.mp3'):
+            path = os.path.join(self.cache_dir, f"{self.show['artist']}_{song['name']}.mp3")
+        self._pin([path])
+        try:
+            return self._playable_path(song)
+        except Exception:
+            self._unpin([path])
+            raise
+
+    @staticmethod
+    def _songs_within(songs: List[Dict], seconds: float) -> List[Dict]:
+        """Leading songs that fill the given playing time (at least one)"""
+        selected, total = [], 0.0
+        for song in songs:
+            selected.append(song)
+            total += song.get('duration') or ASSUMED_SONG_SECONDS
+            if total >= seconds:
+                break
+        return selected
+
+    def _playable_path(self, song: Dict) -> str:
+        """Path of an MP3 version of the song, transcoding other formats into the cache"""
+        path = os.path.abspath(song['path'])
+        if path.lower().endswith('.mp3'):
+            return path
+        transcoded = os.path.join(self.cache_dir, f"{self.show['artist']}_{song['name']}.mp3")
+        if not os.path.exists(transcoded) or os.path.getmtime(transcoded) < os.path.getmtime(path):
+            print(f"Transcoding {path} for broadcast")
+            AudioSegment.from_file(path).export(transcoded, format="mp3", bitrate="192k")
+        return transcoded
+
+    def _duration(self, path: str) -> float:
+        if path not in self._durations:
+            self._durations[path] = mp3_duration(path)
+        return self._durations[path]
+
+    def _queued_seconds(self) -> float:
+        """Audio left ahead of the playhead: the rest of the current item plus the queue"""
+        broadcast_manager = self.broadcast_manager
+        if not broadcast_manager.is_broadcasting:
+            return 0.0
+        queued = sum(self._duration(path) for path in broadcast_manager.get_queue())
+        if broadcast_manager.current_audio:
+            played = broadcast_manager.position - broadcast_manager.item_started_at
+            queued += max(self._duration(broadcast_manager.current_audio) - played, 0.0)
+        return queued
@@ -0,0 +1,81 @@
+import os
+import re
+import mimetypes
+from typing import Optional
+from urllib.parse import quote
+from flask import Response, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+# Files never rewritten in place: generated clips with a uuid suffix and
+# transition library clips named by their content key
+CONTENT_ADDRESSED_PATTERN = re.compile(r'(_transition_\d+_|_live_intro_)[0-9a-f]{8}\.mp3$|^[0-9a-f]{64}\.mp3$')
+
+# One year, the conventional ceiling for immutable assets
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def is_content_addressed(filename: str) -> bool:
+    """Check whether a file name identifies immutable content"""
+    return bool(CONTENT_ADDRESSED_PATTERN.search(os.path.basename(filename)))
+
+
+def content_disposition(filename: str) -> str:
+    """Attachment header with an ASCII fallback name and the RFC 5987 UTF-8 name"""
+    fallback = filename.encode('ascii', 'replace').decode('ascii').replace('\\', '_').replace('"', '_')
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def send_media(directory: str, filename: str, as_attachment: bool = False,
+               accel_location: Optional[str] = None) -> Response:
+    """
+    Serve an audio file with byte ranges, validators and cache headers.
+
+    Range requests get 206 Partial Content, and ETag / Last-Modified validators
+    answer If-None-Match / If-Modified-Since with 304 (Werkzeug conditional
+    responses). Content-addressed files are marked immutable; everything else
+    must be revalidated.
+
+    If accel_location is set, the response only carries an X-Accel-Redirect
+    header and nginx streams the file (including ranges) itself. Otherwise the
+    file object is handed to the WSGI server, which uses sendfile() when it
+    supports wsgi.file_wrapper. With Flask's USE_X_SENDFILE enabled, Apache or
+    lighttpd serve it via X-Sendfile.
+
+    Args:
+        directory (str): Directory the file must live in
+        filename (str): Path relative to directory
+        as_attachment (bool): Send Content-Disposition: attachment
+        accel_location (Optional[str]): nginx internal location mapped to directory
+
+    Raises:
+        NotFound: If the file does not exist or escapes directory
+    """
+    immutable = is_content_addressed(filename)
+
+    if accel_location:
+        path = safe_join(directory, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+        response = Response(status=200)
+        # nginx decodes the URI, so names with spaces, '%', '?' or non-latin-1 characters must be quoted
+        response.headers['X-Accel-Redirect'] = f"{accel_location.rstrip('/')}/{quote(filename, safe='/')}"
+        response.headers['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if as_attachment:
+            response.headers['Content-Disposition'] = content_disposition(os.path.basename(filename))
+    else:
+        response = send_from_directory(
+            directory,
+            filename,
+            as_attachment=as_attachment,
+            conditional=True,
+            etag=True,
+            max_age=IMMUTABLE_MAX_AGE if immutable else 0
+        )
+        response.headers['Accept-Ranges'] = 'bytes'
+
+    if immutable:
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
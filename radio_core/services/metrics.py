@@ -0,0 +1,250 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bucket upper bounds in seconds, from fast API calls to whole generation stages
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List['_Metric'] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: '_Metric'):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.render_samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[MetricsRegistry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. tokens or bytes"""
+    type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render_samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in values]
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down
+
+    set_function() makes the gauge read its value(s) at scrape time instead,
+    which costs nothing on the hot path. For labelled gauges the function
+    returns a dict of label value tuples to values.
+    """
+    type = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable):
+        self._function = function
+
+    def render_samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                print(f"Error reading gauge {self.name}: {str(e)}")
+                return []
+            values = list(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in values]
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets, plus their sum and count"""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[MetricsRegistry] = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a block, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render_samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0', registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve the registry at /metrics from a background thread (for processes without Flask routes)"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood the console
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='MetricsServer', daemon=True).start()
+    return server
+
+
+# Pipeline metrics shared by the services
+
+STAGE_SECONDS = Histogram(
+    'radio_generation_stage_seconds', 'Time spent in each radio generation stage', ['stage']
+)
+TASK_SECONDS = Histogram(
+    'radio_task_seconds', 'Time from task start to completion, failure or cancellation', ['type', 'status']
+)
+LLM_REQUEST_SECONDS = Histogram(
+    'radio_llm_request_seconds', 'Latency of LLM requests', ['backend', 'outcome']
+)
+LLM_TOKENS = Counter(
+    'radio_llm_tokens_total', 'Tokens reported by LLM backends', ['backend', 'kind']
+)
+TTS_REQUEST_SECONDS = Histogram(
+    'radio_tts_request_seconds', 'Latency of text-to-speech requests', ['provider', 'outcome']
+)
+TTS_CHARACTERS = Counter(
+    'radio_tts_characters_total', 'Characters sent to text-to-speech', ['provider']
+)
+TTS_AUDIO_BYTES = Counter(
+    'radio_tts_audio_bytes_total', 'Audio bytes received from text-to-speech', ['provider']
+)
+WHISPER_SECONDS = Histogram(
+    'radio_whisper_transcribe_seconds', 'Time to transcribe one song', ['device', 'backend']
+)
+WHISPER_REALTIME_FACTOR = Histogram(
+    'radio_whisper_realtime_factor', 'Transcription time divided by audio duration (below 1 is faster than real time)',
+    ['device', 'backend'], buckets=(0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10)
+)
+WHISPER_TRANSCRIBED_FRACTION = Histogram(
+    'radio_whisper_transcribed_fraction', 'Share of each song passed to Whisper after vocal gating',
+    ['device'], buckets=(0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1)
+)
+TRANSITION_LIBRARY_LOOKUPS = Counter(
+    'radio_transition_library_lookups_total', 'Transitions looked up in the pre-generated library', ['outcome']
+)
+TRANSITION_LIBRARY_GENERATED = Counter(
+    'radio_transition_library_generated_total', 'Transitions pre-generated in the background', ['style']
+)
+QUEUE_DEPTH = Gauge('radio_task_queue_depth', 'Tasks waiting to be processed')
+ACTIVE_WORKERS = Gauge('radio_active_workers', 'Tasks currently being processed')
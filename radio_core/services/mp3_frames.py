@@ -0,0 +1,145 @@
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+
+# Bitrates in kbps indexed by [version_group][layer][bitrate_index]
+# version_group: 0 = MPEG-1, 1 = MPEG-2/2.5; layer: 1..3
+_BITRATES = {
+    (0, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (0, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (0, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (1, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (1, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (1, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Sample rates indexed by version bits (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1)
+_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+_READ_SIZE = 64 * 1024
+
+
+class Mp3Frame(NamedTuple):
+    data: bytes
+    duration: float  # Seconds of audio in this frame
+    bitrate: int  # Bits per second
+    sample_rate: int
+
+
+def parse_frame_header(header: bytes) -> Optional[tuple]:
+    """
+    Decode a 4-byte MPEG audio frame header
+
+    Returns:
+        Optional[tuple]: (frame_length, samples_per_frame, sample_rate, bitrate)
+        or None if the bytes are not a valid header
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    version_group = 0 if version_bits == 3 else 1
+    bitrate = _BITRATES[(version_group, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or version_group == 0:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+
+    return length, samples, sample_rate, bitrate
+
+
+def _id3v2_size(header: bytes) -> int:
+    """Total size of an ID3v2 tag given its 10-byte header"""
+    size = 0
+    for byte in header[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def iter_mp3_frames(f: BinaryIO) -> Iterator[Mp3Frame]:
+    """
+    Yield the audio frames of an MP3 stream in order
+
+    ID3 tags and garbage between frames are skipped. A candidate header is only
+    accepted when the following frame also starts with a valid header (or the
+    data ends), so sync bytes inside tag data don't produce bogus frames.
+    """
+    buffer = f.read(_READ_SIZE)
+    position = 0
+    eof = not buffer
+
+    def fill(needed: int) -> bool:
+        nonlocal buffer, position, eof
+        while len(buffer) - position < needed and not eof:
+            more = f.read(_READ_SIZE)
+            if not more:
+                eof = True
+                break
+            buffer = buffer[position:] + more
+            position = 0
+        return len(buffer) - position >= needed
+
+    # Skip leading ID3v2 tags (there may be several)
+    while fill(10) and buffer[position:position + 3] == b'ID3':
+        tag_size = _id3v2_size(buffer[position:position + 10])
+        while tag_size > 0:
+            if not fill(1):
+                return
+            skip = min(tag_size, len(buffer) - position)
+            position += skip
+            tag_size -= skip
+
+    while fill(4):
+        header = parse_frame_header(buffer[position:position + 4])
+        if header is None:
+            if buffer[position:position + 3] == b'TAG':
+                return  # ID3v1 trailer
+            position += 1
+            continue
+
+        length, samples, sample_rate, bitrate = header
+        if not fill(length):
+            return  # Truncated final frame
+        if fill(length + 4) and parse_frame_header(buffer[position + length:position + length + 4]) is None \
+                and buffer[position + length:position + length + 3] != b'TAG':
+            position += 1
+            continue
+
+        yield Mp3Frame(bytes(buffer[position:position + length]), samples / sample_rate, bitrate, sample_rate)
+        position += length
+
+
+def is_info_frame(frame: Mp3Frame) -> bool:
+    """
+    Whether a frame is a Xing/Info/VBRI header frame
+
+    Encoders put this metadata frame first; it decodes to silence, so
+    skipping it avoids a short gap when files are played back to back.
+    """
+    return b'Xing' in frame.data[4:40] or b'Info' in frame.data[4:40] or frame.data[36:40] == b'VBRI'
+
+
+def mp3_duration(path: str) -> float:
+    """Playing time of an MP3 file in seconds, from its frame headers"""
+    with open(path, 'rb') as f:
+        return sum(frame.duration for index, frame in enumerate(iter_mp3_frames(f))
+                   if not (index == 0 and is_info_frame(frame)))
@@ -1,28 +1,183 @@
 import os
-from typing import List, Dict
+import time
+import hashlib
+import threading
+from typing import List, Dict, Optional
 from pathlib import Path
 from flask import current_app
+from .audio_metadata import AudioMetadataIndex, SONG_METADATA_FIELDS
+
+# Audio file extensions treated as songs
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a')
+
+# Minimum seconds between directory mtime checks for the same directory
+DEFAULT_REFRESH_INTERVAL = 2.0
 
 class MusicManager:
-    def __init__(self):
+    def __init__(self, refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
         """
         Initialize the MusicManager with the base path for music uploads
+        
+        The catalog is indexed once here and kept in memory. Each directory's
+        mtime is re-checked at most every refresh_interval seconds, and only a
+        directory whose mtime changed is rescanned.
         """
         self.base_path = Path(current_app.config['BACKEND_ROOT']) / "music_uploads"
+        self.refresh_interval = refresh_interval
+        self.catalog_version = 0  # Incremented whenever the indexed catalog changes
+        self._fingerprint = None
+        self._fingerprint_version = None
+        self._lock = threading.RLock()
+        self._artists: Dict[str, Dict] = {}
+        self._base_mtime = None
+        self._base_checked_at = 0.0
+        
+        # Duration, codec, loudness etc. are probed once per file in the background
+        self.metadata = AudioMetadataIndex(
+            os.path.join(current_app.config['BACKEND_ROOT'], 'data', 'audio_metadata.json'),
+            on_update=self._on_metadata_update
+        )
+        
         self._ensure_base_directory()
+        self.refresh(force=True)
 
     def _ensure_base_directory(self):
         """Ensure the base directory exists"""
         self.base_path.mkdir(parents=True, exist_ok=True)
 
+    def refresh(self, force: bool = False):
+        """
+        Bring the index up to date with the music_uploads directory
+        
+        Args:
+            force (bool): Check every directory now, ignoring refresh_interval
+        """
+        with self._lock:
+            self._refresh_artist_list(force)
+            for artist_name in list(self._artists):
+                self._refresh_artist(artist_name, force)
+
+    def _refresh_artist_list(self, force: bool = False):
+        """Re-list artist directories if the base directory changed"""
+        now = time.monotonic()
+        if not force and now - self._base_checked_at < self.refresh_interval:
+            return
+        self._base_checked_at = now
+
+        mtime = self.base_path.stat().st_mtime_ns
+        if mtime == self._base_mtime:
+            return
+        self._base_mtime = mtime
+
+        current = {d.name for d in self.base_path.iterdir() if d.is_dir()}
+        changed = False
+        for artist_name in list(self._artists):
+            if artist_name not in current:
+                del self._artists[artist_name]
+                changed = True
+        for artist_name in current:
+            if artist_name not in self._artists:
+                self._artists[artist_name] = {'mtime': None, 'checked_at': 0.0, 'songs': [], 'by_name': {}}
+                self._refresh_artist(artist_name, force=True)
+                changed = True
+        if changed:
+            self.catalog_version += 1
+
+    def _refresh_artist(self, artist_name: str, force: bool = False):
+        """Rescan an artist directory if its mtime changed"""
+        entry = self._artists[artist_name]
+        now = time.monotonic()
+        if not force and now - entry['checked_at'] < self.refresh_interval:
+            return
+        entry['checked_at'] = now
+
+        artist_path = self.base_path / artist_name
+        try:
+            mtime = artist_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            del self._artists[artist_name]
+            self.catalog_version += 1
+            return
+        if mtime == entry['mtime']:
+            return
+
+        songs = []
+        for song_file in artist_path.iterdir():
+            if song_file.is_file() and song_file.suffix.lower() in AUDIO_EXTENSIONS:
+                song = {
+                    'name': song_file.stem,
+                    'path': str(song_file),
+                    'format': song_file.suffix[1:],
+                    'size': song_file.stat().st_size
+                }
+                song.update(self.metadata.get(song['path']) or {})
+                songs.append(song)
+        # Stable ordering regardless of filesystem listing order
+        songs.sort(key=lambda song: (song['name'].lower(), song['format']))
+
+        entry['mtime'] = mtime
+        entry['songs'] = songs
+        entry['by_name'] = {song['name']: song for song in songs}
+        self.catalog_version += 1
+        print(f"Indexed {len(songs)} audio files for artist '{artist_name}'")
+        
+        self.metadata.schedule(song['path'] for song in songs if song.get('duration') is None)
+
+    def _on_metadata_update(self, path: str, metadata: Dict):
+        """Merge freshly probed metadata into the indexed song (probe thread)"""
+        song_path = Path(path)
+        with self._lock:
+            entry = self._artists.get(song_path.parent.name)
+            song = entry['by_name'].get(song_path.stem) if entry else None
+            if song and os.path.abspath(song['path']) == path:
+                song.update({field: metadata.get(field) for field in SONG_METADATA_FIELDS})
+                self.catalog_version += 1
+
+    def get_total_duration(self, artist_name: str) -> Optional[float]:
+        """
+        Total playing time of an artist's songs from the metadata index
+        
+        Returns:
+            Optional[float]: Seconds, or None while any song is still unprobed
+        """
+        durations = [song.get('duration') for song in self.get_artist_songs(artist_name)]
+        if any(duration is None for duration in durations):
+            return None
+        return sum(durations)
+
+    @property
+    def catalog_fingerprint(self) -> str:
+        """
+        Content hash of the indexed catalog
+        
+        Derived from artist and song names, formats, sizes and durations rather than the
+        process-local catalog_version, so every process serving the same files
+        produces the same value (usable as an HTTP ETag).
+        """
+        with self._lock:
+            if self._fingerprint_version != self.catalog_version:
+                digest = hashlib.sha1()
+                for artist_name in sorted(self._artists):
+                    digest.update(artist_name.encode('utf-8') + b'\0')
+                    for song in self._artists[artist_name]['songs']:
+                        digest.update(
+                            f"{song['name']}\0{song['format']}\0{song['size']}\0{song.get('duration')}\0".encode('utf-8')
+                        )
+                    digest.update(b'\1')
+                self._fingerprint = digest.hexdigest()
+                self._fingerprint_version = self.catalog_version
+            return self._fingerprint
+
     def get_all_artists(self) -> List[str]:
         """
         Get a list of all artist directories
         
         Returns:
-            List[str]: List of artist names
+            List[str]: List of artist names, sorted
         """
-        return [d.name for d in self.base_path.iterdir() if d.is_dir()]
+        with self._lock:
+            self._refresh_artist_list()
+            return sorted(self._artists)
 
     def get_artist_songs(self, artist_name: str) -> List[Dict[str, str]]:
         """
@@ -32,32 +187,38 @@ class MusicManager:
             artist_name (str): Name of the artist
             
         Returns:
-            List[Dict[str, str]]: List of song information dictionaries
+            List[Dict[str, str]]: List of song information dictionaries, sorted by name
         """
-        artist_path = self.base_path / artist_name
-        if not artist_path.exists():
-            raise ValueError(f"Artist directory '{artist_name}' does not exist")
+        with self._lock:
+            entry = self._get_artist_entry(artist_name)
+            return [dict(song) for song in entry['songs']]
 
-        print(f"\n=== Scanning for songs in {artist_path} ===")
-        print("Found files:")
-        for file in artist_path.iterdir():
-            print(f"- {file.name} ({file.suffix})")
-
-        songs = []
-        for song_file in artist_path.glob("*"):
-            if song_file.is_file() and song_file.suffix.lower() in ['.mp3', '.wav', '.m4a']:
-                songs.append({
-                    'name': song_file.stem,
-                    'path': str(song_file),
-                    'format': song_file.suffix[1:],
-                    'size': song_file.stat().st_size
-                })
-        
-        print(f"\nFound {len(songs)} audio files:")
-        for song in songs:
-            print(f"- {song['name']} ({song['format']})")
+    def get_song(self, artist_name: str, song_name: str) -> Optional[Dict[str, str]]:
+        """
+        Look up a single song by name
         
-        return songs
+        Args:
+            artist_name (str): Name of the artist
+            song_name (str): Song name (file name without extension)
+            
+        Returns:
+            Optional[Dict[str, str]]: Song information, or None if not found
+        """
+        with self._lock:
+            song = self._get_artist_entry(artist_name)['by_name'].get(song_name)
+            return dict(song) if song else None
+
+    def _get_artist_entry(self, artist_name: str) -> Dict:
+        """Get an up-to-date index entry for an artist"""
+        if artist_name not in self._artists:
+            # The artist may have been added since the last check
+            self._refresh_artist_list(force=True)
+        if artist_name not in self._artists:
+            raise ValueError(f"Artist directory '{artist_name}' does not exist")
+        self._refresh_artist(artist_name)
+        if artist_name not in self._artists:
+            raise ValueError(f"Artist directory '{artist_name}' does not exist")
+        return self._artists[artist_name]
 
     def create_artist_directory(self, artist_name: str) -> bool:
         """
@@ -74,6 +235,8 @@ class MusicManager:
             return False
         
         artist_path.mkdir(parents=True)
+        with self._lock:
+            self._refresh_artist_list(force=True)
         return True
 
     def get_artist_info(self, artist_name: str) -> Dict:
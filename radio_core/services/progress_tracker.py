@@ -1,13 +1,36 @@
 import os
+import copy
 import json
 import uuid
-from typing import Dict, List, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, TextIO
 from datetime import datetime
 
+# Journal entries applied before a snapshot is rewritten and the journal truncated
+COMPACT_EVERY = 50
+# Sessions kept in memory; the least recently used are flushed and dropped beyond this
+MAX_LOADED_SESSIONS = 256
+
 class ProgressTracker:
-    def __init__(self):
+    """
+    Track generation progress in memory, backed by a snapshot and an update journal.
+    
+    Each progress session is stored as <id>.json (a compacted snapshot written
+    with write-to-temp-and-rename) plus <id>.journal (one JSON line per update
+    since that snapshot). An update costs one small append; reads never touch disk
+    once a session is loaded. Flushed sessions are dropped from memory and
+    loaded again on their next use.
+    """
+    def __init__(self, compact_every: int = COMPACT_EVERY, max_loaded_sessions: int = MAX_LOADED_SESSIONS):
         self.progress_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'progress')
         os.makedirs(self.progress_dir, exist_ok=True)
+        self.compact_every = compact_every
+        self.max_loaded_sessions = max_loaded_sessions
+        self._states: 'OrderedDict[str, Dict]' = OrderedDict()  # Least recently used first
+        self._journals: Dict[str, TextIO] = {}
+        self._pending_entries: Dict[str, int] = {}
+        self._lock = threading.RLock()
 
     def create_progress(self, artist_name: str, enable_dj_transitions: bool = False, dj_options: Dict = None) -> str:
         """Create a new progress tracking session"""
@@ -47,64 +70,166 @@ class ProgressTracker:
                 }
             }
         }
-        self._save_progress(progress_id, progress_data)
+        with self._lock:
+            self._states[progress_id] = progress_data
+            self._write_snapshot(progress_id)
+            self._evict_idle()
         return progress_id
 
     def update_step(self, progress_id: str, step: str, status: str, data: Optional[Dict] = None) -> Dict:
         """Update the status of a specific step"""
-        progress_data = self._load_progress(progress_id)
-        if step in progress_data["steps"]:
-            progress_data["steps"][step]["status"] = status
-            if data is not None:
-                progress_data["steps"][step]["data"] = data
-            progress_data["current_step"] = step
-            self._save_progress(progress_id, progress_data)
-        return progress_data
+        return self._apply_update(progress_id, {"op": "step", "step": step, "status": status, "data": data})
 
     def update_audio_segment(self, progress_id: str, segment_index: int, status: str, file_path: Optional[str] = None) -> Dict:
         """Update the status of a specific audio segment"""
-        progress_data = self._load_progress(progress_id)
-        segments = progress_data["steps"]["audio_generation"]["segments"]
-        
-        # Ensure we have enough segments
-        while len(segments) <= segment_index:
-            segments.append({"status": "pending", "file_path": None})
-        
-        segments[segment_index]["status"] = status
-        if file_path is not None:
-            segments[segment_index]["file_path"] = file_path
-        
-        self._save_progress(progress_id, progress_data)
-        return progress_data
+        return self._apply_update(progress_id, {
+            "op": "audio_segment", "index": segment_index, "status": status, "file_path": file_path
+        })
 
     def update_dj_transition(self, progress_id: str, transition_index: int, status: str, file_path: Optional[str] = None) -> Dict:
         """Update the status of a specific DJ transition"""
-        progress_data = self._load_progress(progress_id)
-        transitions = progress_data["steps"]["dj_transitions"]["transitions"]
+        return self._apply_update(progress_id, {
+            "op": "dj_transition", "index": transition_index, "status": status, "file_path": file_path
+        })
+
+    def get_progress(self, progress_id: str) -> Dict:
+        """Get the current progress data"""
+        with self._lock:
+            return copy.deepcopy(self._load_progress(progress_id))
+
+    def flush(self, progress_id: Optional[str] = None):
+        """Compact one session (or all loaded sessions) into its snapshot and drop it from memory"""
+        with self._lock:
+            progress_ids = [progress_id] if progress_id else list(self._states)
+            for pid in progress_ids:
+                if pid in self._states:
+                    self._unload(pid)
+
+    def _unload(self, progress_id: str):
+        if self._pending_entries.get(progress_id):
+            self._write_snapshot(progress_id)
+        self._states.pop(progress_id, None)
+        self._pending_entries.pop(progress_id, None)
+
+    def _evict_idle(self):
+        """Flush and drop the least recently used sessions beyond max_loaded_sessions"""
+        while len(self._states) > self.max_loaded_sessions:
+            self._unload(next(iter(self._states)))
+
+    def close(self):
+        """Compact all sessions and release journal file handles"""
+        with self._lock:
+            self.flush()
+            for journal in self._journals.values():
+                journal.close()
+            self._journals.clear()
+
+    def _apply_update(self, progress_id: str, entry: Dict) -> Dict:
+        """Apply an update in memory, journal it and compact when due"""
+        with self._lock:
+            progress_data = self._load_progress(progress_id)
+            if not self._apply_entry(progress_data, entry):
+                return copy.deepcopy(progress_data)
+            
+            journal = self._journals.get(progress_id)
+            if journal is None:
+                journal = open(self._journal_path(progress_id), 'a', encoding='utf-8')
+                self._journals[progress_id] = journal
+            journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            journal.flush()
+            
+            self._pending_entries[progress_id] = self._pending_entries.get(progress_id, 0) + 1
+            if self._pending_entries[progress_id] >= self.compact_every:
+                self._write_snapshot(progress_id)
+            return copy.deepcopy(progress_data)
+
+    @staticmethod
+    def _apply_entry(progress_data: Dict, entry: Dict) -> bool:
+        """
+        Apply one journal entry to progress data.
         
-        # Ensure we have enough transitions
-        while len(transitions) <= transition_index:
-            transitions.append({"status": "pending", "file_path": None})
+        Returns:
+            bool: False if the entry did not change anything
+        """
+        op = entry["op"]
+        if op == "step":
+            step = entry["step"]
+            if step not in progress_data["steps"]:
+                return False
+            progress_data["steps"][step]["status"] = entry["status"]
+            if entry.get("data") is not None:
+                progress_data["steps"][step]["data"] = entry["data"]
+            progress_data["current_step"] = step
+            return True
         
-        transitions[transition_index]["status"] = status
-        if file_path is not None:
-            transitions[transition_index]["file_path"] = file_path
+        if op == "audio_segment":
+            items = progress_data["steps"]["audio_generation"]["segments"]
+        elif op == "dj_transition":
+            items = progress_data["steps"]["dj_transitions"]["transitions"]
+        else:
+            return False
         
-        self._save_progress(progress_id, progress_data)
-        return progress_data
+        # Ensure we have enough entries
+        index = entry["index"]
+        while len(items) <= index:
+            items.append({"status": "pending", "file_path": None})
+        
+        items[index]["status"] = entry["status"]
+        if entry.get("file_path") is not None:
+            items[index]["file_path"] = entry["file_path"]
+        return True
 
-    def get_progress(self, progress_id: str) -> Dict:
-        """Get the current progress data"""
-        return self._load_progress(progress_id)
+    def _snapshot_path(self, progress_id: str) -> str:
+        return os.path.join(self.progress_dir, f"{progress_id}.json")
 
-    def _save_progress(self, progress_id: str, data: Dict):
-        """Save progress data to file"""
-        file_path = os.path.join(self.progress_dir, f"{progress_id}.json")
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def _journal_path(self, progress_id: str) -> str:
+        return os.path.join(self.progress_dir, f"{progress_id}.journal")
+
+    def _write_snapshot(self, progress_id: str):
+        """Atomically replace the snapshot with in-memory state and reset the journal"""
+        file_path = self._snapshot_path(progress_id)
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._states[progress_id], f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+        
+        # The snapshot now contains every journaled entry
+        journal = self._journals.pop(progress_id, None)
+        if journal:
+            journal.close()
+        if os.path.exists(self._journal_path(progress_id)):
+            os.remove(self._journal_path(progress_id))
+        self._pending_entries[progress_id] = 0
 
     def _load_progress(self, progress_id: str) -> Dict:
-        """Load progress data from file"""
-        file_path = os.path.join(self.progress_dir, f"{progress_id}.json")
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f) 
\ No newline at end of file
+        """Get progress data from memory, loading snapshot plus journal on first use"""
+        if progress_id in self._states:
+            self._states.move_to_end(progress_id)
+            return self._states[progress_id]
+        
+        with open(self._snapshot_path(progress_id), 'r', encoding='utf-8') as f:
+            progress_data = json.load(f)
+        
+        replayed = 0
+        journal_path = self._journal_path(progress_id)
+        if os.path.exists(journal_path):
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A crash mid-append leaves at most one partial trailing line
+                        break
+                    self._apply_entry(progress_data, entry)
+                    replayed += 1
+        
+        self._states[progress_id] = progress_data
+        self._pending_entries[progress_id] = replayed
+        if os.path.exists(journal_path):
+            # Fold the journal into the snapshot, dropping a partial line (even a
+            # torn first one) so later appends start on a clean line
+            self._write_snapshot(progress_id)
+        self._evict_idle()
+        return progress_data
@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = '.manifest.json'
+FULL_SHOW_SUFFIX = '_full_show.mp3'
+# Bytes read at a time when hashing audio files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def transition_key(from_song_hash: str, to_song_hash: str, style: str, length: str) -> str:
+    """
+    Identify a transition by what it is generated from.
+
+    The same pair of songs with the same style and length gets the same key
+    wherever it appears in a show, so reordering or inserting songs only
+    invalidates the transitions around the change.
+    """
+    return hashlib.sha256(f"{from_song_hash}\0{to_song_hash}\0{style}\0{length}".encode('utf-8')).hexdigest()
+
+
+def manifest_path(show_path: str) -> str:
+    """The manifest stored next to a show's audio file"""
+    return os.path.splitext(show_path)[0] + MANIFEST_SUFFIX
+
+
+def finished_show_paths(directory: str) -> List[str]:
+    """
+    Finished shows in a directory and their manifests.
+
+    These are the only copy of each generated show, so the cache sweeper
+    treats them as pinned; the clips they were assembled from stay evictable.
+    """
+    paths = []
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return paths
+    for entry in entries:
+        if entry.name.endswith(FULL_SHOW_SUFFIX):
+            paths.append(entry.path)
+        elif entry.name.endswith(MANIFEST_SUFFIX):
+            paths.append(entry.path)
+            manifest = ShowManifest.load(entry.path)
+            if manifest and manifest.output:
+                paths.append(manifest.output['path'])
+    return paths
+
+
+class ShowManifest:
+    """
+    Ordered pieces of a generated show with content hashes.
+
+    Items are the intro, songs and transitions in playing order. Songs carry
+    the hash of their file, spoken pieces the hash of their script and of
+    their audio clip, so a later update can tell which pieces are still
+    valid and reuse them.
+    """
+
+    def __init__(self, artist_name: str, dj_options: Dict, items: Optional[List[Dict]] = None,
+                 output: Optional[Dict] = None, created_at: Optional[str] = None):
+        self.artist_name = artist_name
+        self.dj_options = dj_options
+        self.items = items or []
+        self.output = output
+        self.created_at = created_at or datetime.now().isoformat()
+        self._song_hashes = {}
+        self._transitions = {}
+        for item in self.items:
+            if item['type'] == 'song':
+                self._song_hashes[item['path']] = item
+            elif item['type'] == 'transition':
+                self._transitions[item['key']] = item
+
+    @classmethod
+    def load(cls, path: str) -> Optional['ShowManifest']:
+        """Read a manifest, or None if it is missing, unreadable or from another version"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != MANIFEST_VERSION:
+            return None
+        return cls(data['artist'], data.get('dj_options') or {}, data.get('items'), data.get('output'),
+                   data.get('created_at'))
+
+    def save(self, path: str):
+        """Write the manifest atomically"""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'artist': self.artist_name,
+                'created_at': self.created_at,
+                'dj_options': self.dj_options,
+                'items': self.items,
+                'output': self.output
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+    @property
+    def intro(self) -> Optional[Dict]:
+        return next((item for item in self.items if item['type'] == 'intro'), None)
+
+    def song_item(self, song: Dict) -> Dict:
+        """
+        Manifest entry for a catalog song.
+
+        The file is only hashed again when its size or modification time
+        differs from this manifest's entry.
+        """
+        path = os.path.abspath(song['path'])
+        stat = os.stat(path)
+        known = self._song_hashes.get(path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            content_hash = known['content_hash']
+        else:
+            content_hash = file_hash(path)
+        item = {
+            'type': 'song',
+            'name': song['name'],
+            'path': path,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'content_hash': content_hash
+        }
+        self._song_hashes[path] = item
+        return item
+
+    @staticmethod
+    def spoken_item(item_type: str, path: str, script: str, **fields) -> Dict:
+        """Manifest entry for an intro or transition clip"""
+        return {
+            'type': item_type,
+            'path': os.path.abspath(path),
+            'script': script,
+            'script_hash': text_hash(script),
+            'audio_hash': file_hash(path),
+            **fields
+        }
+
+    @staticmethod
+    def is_intact(item: Dict) -> bool:
+        """Whether a spoken clip is still on disk unchanged (the cache sweeper may have removed it)"""
+        try:
+            return file_hash(item['path']) == item['audio_hash']
+        except OSError:
+            return False
+
+    def find_transition(self, key: str) -> Optional[Dict]:
+        """A transition with this key whose clip is still intact"""
+        item = self._transitions.get(key)
+        return item if item and self.is_intact(item) else None
@@ -0,0 +1,105 @@
+import threading
+from collections import deque
+from itertools import islice
+from typing import List, Optional, Tuple
+
+
+class StreamBuffer:
+    """
+    Shared ring buffer of encoded audio chunks for live listeners.
+
+    One broadcaster publishes chunks; any number of listeners read from it by
+    sequence number, so the audio is read from disk once no matter how many
+    people are listening. Listeners that fall further behind than the buffer
+    holds skip ahead to the oldest retained chunk.
+    """
+
+    def __init__(self, capacity_seconds: float = 30.0, burst_seconds: float = 2.0):
+        self.capacity_seconds = capacity_seconds
+        self.burst_seconds = burst_seconds
+        self._chunks = deque()  # (sequence, data, duration)
+        self._buffered_seconds = 0.0
+        self._next_sequence = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def next_sequence(self) -> int:
+        """Sequence number the next published chunk will get"""
+        with self._condition:
+            return self._next_sequence
+
+    @property
+    def closed(self) -> bool:
+        with self._condition:
+            return self._closed
+
+    def reset(self):
+        """Drop buffered audio and reopen the buffer for a new broadcast"""
+        with self._condition:
+            self._chunks.clear()
+            self._buffered_seconds = 0.0
+            self._closed = False
+            self._condition.notify_all()
+
+    def publish(self, data: bytes, duration: float) -> int:
+        """
+        Append a chunk and wake waiting listeners
+
+        Returns:
+            int: Sequence number of the chunk
+        """
+        with self._condition:
+            sequence = self._next_sequence
+            self._next_sequence += 1
+            self._chunks.append((sequence, data, duration))
+            self._buffered_seconds += duration
+            while self._chunks and self._buffered_seconds - self._chunks[0][2] >= self.capacity_seconds:
+                self._buffered_seconds -= self._chunks.popleft()[2]
+            self._condition.notify_all()
+            return sequence
+
+    def close(self):
+        """Signal listeners that the broadcast ended"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def start_position(self) -> int:
+        """
+        Sequence number a new listener should start from
+
+        Starts burst_seconds behind live so players can fill their buffer
+        immediately instead of waiting in real time.
+        """
+        with self._condition:
+            seconds = 0.0
+            position = self._next_sequence
+            for sequence, _, duration in reversed(self._chunks):
+                if seconds >= self.burst_seconds:
+                    break
+                seconds += duration
+                position = sequence
+            return position
+
+    def read(self, after: int, timeout: Optional[float] = None) -> Tuple[List[bytes], int, bool]:
+        """
+        Get chunks with sequence >= after, waiting for new ones if necessary
+
+        Args:
+            after (int): First sequence number the listener wants
+            timeout (Optional[float]): Seconds to wait for new data
+
+        Returns:
+            Tuple[List[bytes], int, bool]: (chunks, next position, closed)
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._closed or self._next_sequence > after, timeout=timeout)
+            if not self._chunks:
+                return [], max(after, self._next_sequence), self._closed
+            first = self._chunks[0][0]
+            # Sequences are contiguous, so the start index is an offset; listeners
+            # too far behind skip what was already dropped
+            start = max(after - first, 0)
+            chunks = [data for _, data, _ in islice(self._chunks, start, None)]
+            return chunks, max(after, self._next_sequence), self._closed and not chunks
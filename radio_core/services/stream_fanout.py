@@ -0,0 +1,315 @@
+import socket
+import asyncio
+import unicodedata
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Listener socket buffer size at which asyncio stops reporting the socket as writable
+LISTENER_HIGH_WATER = 64 * 1024
+# Kernel send buffer per listener; keeps the backlog visible to lag accounting
+LISTENER_SEND_BUFFER = 32 * 1024
+# Seconds of audio a listener may have queued before it is dropped as too slow
+DEFAULT_MAX_LAG_SECONDS = 10.0
+# Seconds the pump waits on the broadcast buffer before re-checking state
+PUMP_READ_TIMEOUT = 1.0
+# Minimum seconds between writes to listeners; batching frames cuts syscalls per listener
+SEND_INTERVAL = 0.1
+# Seconds a client has to send its request headers
+REQUEST_TIMEOUT = 10.0
+# Pending connections the listening socket queues while listeners tune in at once
+ACCEPT_BACKLOG = 1024
+
+
+def icy_name(station_name: str) -> str:
+    """
+    Station name safe for the latin-1 icy-name header
+
+    Accents are folded to ASCII (Café -> Cafe) and other non-ASCII
+    characters, such as CJK or emoji, become '?'. Line breaks are dropped
+    so the name can't end the header.
+    """
+    folded = unicodedata.normalize('NFKD', station_name)
+    folded = ''.join(char for char in folded if not unicodedata.combining(char))
+    folded = ' '.join(folded.split())
+    return folded.encode('ascii', 'replace').decode('ascii')
+# Assumed stream bitrate until the broadcaster reports the real one
+FALLBACK_BITRATE = 128000
+
+STREAM_PATHS = ('/', '/stream', '/api/stream')
+
+
+class _Listener:
+    __slots__ = ('id', 'address', 'writer', 'connected_at', 'bytes_sent')
+
+    def __init__(self, listener_id: int, address, writer: asyncio.StreamWriter):
+        self.id = listener_id
+        self.address = address
+        self.writer = writer
+        self.connected_at = time.time()
+        self.bytes_sent = 0
+
+    @property
+    def queued_bytes(self) -> int:
+        return self.writer.transport.get_write_buffer_size()
+
+
+class StreamFanoutServer:
+    """
+    Asyncio HTTP server that fans the live broadcast out to many listeners.
+
+    One pump coroutine reads new chunks from the broadcaster's StreamBuffer and
+    writes the same bytes object to every listener's transport, so the cost per
+    listener is one non-blocking socket write per chunk instead of a thread.
+    A listener whose unsent backlog exceeds max_lag_seconds of audio is
+    disconnected rather than buffered without bound.
+    """
+
+    def __init__(self, broadcast_manager, host: str = '0.0.0.0', port: int = 8000,
+                 max_lag_seconds: float = DEFAULT_MAX_LAG_SECONDS, station_name: str = 'Offbeat Radio'):
+        """
+        Args:
+            broadcast_manager (BroadcastManager): Source of the audio buffer and bitrate
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free port)
+            max_lag_seconds (float): Queued audio after which a listener is dropped
+            station_name (str): Sent to listeners as icy-name, folded to ASCII
+        """
+        self.broadcast_manager = broadcast_manager
+        self.host = host
+        self.port = port
+        self.max_lag_seconds = max_lag_seconds
+        self.station_name = icy_name(station_name)
+        self._listeners: Dict[int, _Listener] = {}
+        self._next_listener_id = 0
+        self._position = broadcast_manager.buffer.next_sequence  # Next sequence the pump will send
+        self._dropped = 0
+        self._total_connections = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._start_error: Optional[OSError] = None
+        self._stopping = False
+
+    @property
+    def listener_count(self) -> int:
+        return len(self._listeners)
+
+    def start(self):
+        """
+        Run the server on its own event loop thread, returning once it listens
+
+        Raises:
+            OSError: If the port can't be bound
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._start_error = None
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name='StreamFanoutServer', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._start_error:
+            self._thread.join()
+            self._thread = None
+            raise self._start_error
+
+    def stop(self):
+        """Disconnect all listeners and stop the event loop"""
+        if not self._thread or not self._thread.is_alive():
+            return
+        self._stopping = True
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_server(self._handle_client, self.host, self.port,
+                                         reuse_address=True, backlog=ACCEPT_BACKLOG)
+                )
+            except OSError as e:
+                self._start_error = e
+                return
+            self.port = self._server.sockets[0].getsockname()[1]
+            pump = self._loop.create_task(self._pump())
+            print(f"Stream fan-out listening on {self.host}:{self.port}")
+            self._ready.set()
+            self._loop.run_forever()
+
+            pump.cancel()
+            self._server.close()
+            for listener in list(self._listeners.values()):
+                listener.writer.transport.abort()
+            self._listeners.clear()
+            self._loop.run_until_complete(asyncio.gather(pump, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+        finally:
+            self._ready.set()
+            self._loop.close()
+
+    def _byte_rate(self) -> float:
+        return (self.broadcast_manager.bitrate or FALLBACK_BITRATE) / 8
+
+    async def _pump(self):
+        """Copy new broadcast chunks to every listener"""
+        loop = asyncio.get_running_loop()
+        stream_buffer = self.broadcast_manager.buffer
+        while not self._stopping:
+            chunks, position, closed = await loop.run_in_executor(
+                None, stream_buffer.read, self._position, PUMP_READ_TIMEOUT
+            )
+            if chunks:
+                self._send_to_all(b''.join(chunks))
+            self._position = position
+            if chunks and not closed:
+                await asyncio.sleep(SEND_INTERVAL)
+
+            if closed:
+                # Broadcast ended: let listeners drain, then wait for the next one
+                for listener in list(self._listeners.values()):
+                    listener.writer.close()
+                while stream_buffer.closed and not self._stopping:
+                    await asyncio.sleep(PUMP_READ_TIMEOUT)
+
+    def _send_to_all(self, payload: bytes):
+        max_queued = self.max_lag_seconds * self._byte_rate()
+        for listener in list(self._listeners.values()):
+            if listener.writer.transport.is_closing():
+                continue
+            if listener.queued_bytes > max_queued:
+                self._drop(listener, 'too slow')
+                continue
+            listener.writer.write(payload)
+            listener.bytes_sent += len(payload)
+
+    def _drop(self, listener: _Listener, reason: str):
+        self._listeners.pop(listener.id, None)
+        self._dropped += 1
+        print(f"Dropping listener {listener.address}: {reason}")
+        listener.writer.transport.abort()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        address = writer.get_extra_info('peername')
+        try:
+            try:
+                request_line = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            parts = request_line.split()
+            if len(parts) < 2 or parts[0] != 'GET':
+                await self._send_error(writer, '405 Method Not Allowed')
+                return
+            if parts[1].split('?')[0] not in STREAM_PATHS:
+                await self._send_error(writer, '404 Not Found')
+                return
+            if not self.broadcast_manager.is_broadcasting:
+                await self._send_error(writer, '503 Service Unavailable')
+                return
+
+            sock = writer.get_extra_info('socket')
+            if sock is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, LISTENER_SEND_BUFFER)
+            writer.transport.set_write_buffer_limits(high=LISTENER_HIGH_WATER)
+            writer.write(self._response_headers())
+            listener = self._register(address, writer)
+            try:
+                # Listeners never send anything after the request; EOF means they left
+                while await reader.read(1024):
+                    pass
+            finally:
+                self._listeners.pop(listener.id, None)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if not writer.transport.is_closing():
+                writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> str:
+        """Read the request headers and return the request line"""
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        while (await reader.readline()).strip():
+            pass
+        return request_line
+
+    def _response_headers(self) -> bytes:
+        bitrate = self.broadcast_manager.bitrate or FALLBACK_BITRATE
+        headers = [
+            'HTTP/1.0 200 OK',
+            'Content-Type: audio/mpeg',
+            'Cache-Control: no-cache, no-store',
+            'Pragma: no-cache',
+            'Connection: close',
+            f'icy-name: {self.station_name}',
+            f'icy-br: {bitrate // 1000}',
+            'icy-pub: 0'
+        ]
+        return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1')
+
+    @staticmethod
+    async def _send_error(writer: asyncio.StreamWriter, status: str):
+        writer.write(f'HTTP/1.0 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+        await writer.drain()
+
+    def _register(self, address, writer: asyncio.StreamWriter) -> _Listener:
+        """
+        Add a listener, starting it with the buffered burst behind live
+
+        Runs without awaiting between reading the burst and registering, so
+        the burst ends exactly where the pump will continue.
+        """
+        stream_buffer = self.broadcast_manager.buffer
+        chunks, next_position, _ = stream_buffer.read(stream_buffer.start_position(), timeout=0)
+        extra = next_position - self._position
+        if extra > 0:
+            chunks = chunks[:-extra]  # Not sent by the pump yet
+        listener = _Listener(self._next_listener_id, address, writer)
+        self._next_listener_id += 1
+        self._total_connections += 1
+        if chunks:
+            burst = b''.join(chunks)
+            writer.write(burst)
+            listener.bytes_sent += len(burst)
+        self._listeners[listener.id] = listener
+        return listener
+
+    def get_stats(self, include_listeners: bool = False) -> Dict:
+        """
+        Get listener counts and lag
+
+        Lag is the audio a listener has queued but not yet received, in seconds.
+        """
+        byte_rate = self._byte_rate()
+        now = time.time()
+        listeners: List[Dict] = []
+        lags = []
+        for listener in list(self._listeners.values()):
+            lag = listener.queued_bytes / byte_rate
+            lags.append(lag)
+            if include_listeners:
+                listeners.append({
+                    'id': listener.id,
+                    'address': f"{listener.address[0]}:{listener.address[1]}" if listener.address else None,
+                    'connected_seconds': round(now - listener.connected_at, 1),
+                    'bytes_sent': listener.bytes_sent,
+                    'lag_seconds': round(lag, 3)
+                })
+
+        stats = {
+            'port': self.port,
+            'listeners': len(lags),
+            'total_connections': self._total_connections,
+            'dropped': self._dropped,
+            'max_lag_seconds': round(max(lags), 3) if lags else 0.0,
+            'mean_lag_seconds': round(sum(lags) / len(lags), 3) if lags else 0.0
+        }
+        if include_listeners:
+            stats['listener_details'] = listeners
+        return stats
@@ -0,0 +1,111 @@
+import json
+import threading
+from collections import deque, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class TaskEventStream:
+    """Bounded, append-only history of events for a single task"""
+
+    def __init__(self, history_size: int):
+        self.events = deque(maxlen=history_size)
+        self.next_id = 1
+        self.closed = False
+        self.condition = threading.Condition()
+
+
+class TaskEventBroker:
+    """
+    Publish task events to any number of waiting readers.
+
+    Every task gets its own numbered event history so a reader can resume
+    from the last id it saw (Server-Sent Events Last-Event-ID semantics).
+    Readers block on a per-task condition instead of polling.
+    """
+
+    def __init__(self, history_size: int = 500, max_closed_streams: int = 200):
+        self.history_size = history_size
+        self.max_closed_streams = max_closed_streams
+        self._streams: Dict[str, TaskEventStream] = {}
+        self._closed_order: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_stream(self, task_id: str, create: bool = False) -> Optional[TaskEventStream]:
+        with self._lock:
+            stream = self._streams.get(task_id)
+            if stream is None and create:
+                stream = TaskEventStream(self.history_size)
+                self._streams[task_id] = stream
+            return stream
+
+    def has_stream(self, task_id: str) -> bool:
+        """Check whether any event has been published for a task"""
+        return self._get_stream(task_id) is not None
+
+    def is_closed(self, task_id: str) -> bool:
+        """Check whether a task's stream has been closed"""
+        stream = self._get_stream(task_id)
+        return bool(stream and stream.closed)
+
+    def publish(self, task_id: str, event_type: str, data: Dict) -> int:
+        """
+        Append an event to a task's history and wake its readers.
+
+        Returns:
+            int: The id assigned to the event
+        """
+        stream = self._get_stream(task_id, create=True)
+        with stream.condition:
+            event_id = stream.next_id
+            stream.next_id += 1
+            stream.events.append((event_id, event_type, data))
+            stream.condition.notify_all()
+        return event_id
+
+    def close(self, task_id: str):
+        """Mark a task's stream as finished; readers drain it and stop"""
+        stream = self._get_stream(task_id, create=True)
+        with stream.condition:
+            stream.closed = True
+            stream.condition.notify_all()
+
+        # Keep a bounded number of finished streams around for late readers
+        with self._lock:
+            self._closed_order[task_id] = None
+            while len(self._closed_order) > self.max_closed_streams:
+                expired_id, _ = self._closed_order.popitem(last=False)
+                self._streams.pop(expired_id, None)
+
+    def wait_for_events(self, task_id: str, after_id: int = 0,
+                        timeout: Optional[float] = None) -> Tuple[List[Tuple[int, str, Dict]], bool, bool]:
+        """
+        Wait until a task has events newer than after_id.
+
+        Args:
+            task_id (str): Task to read
+            after_id (int): Last event id the reader has seen
+            timeout (Optional[float]): Seconds to wait before returning empty-handed
+
+        Returns:
+            Tuple: (events, closed, missed) where missed is True if events
+            after after_id were already evicted from the history
+        """
+        stream = self._get_stream(task_id, create=True)
+        with stream.condition:
+            stream.condition.wait_for(
+                lambda: stream.closed or stream.next_id - 1 > after_id,
+                timeout=timeout
+            )
+            events = [event for event in stream.events if event[0] > after_id]
+            missed = bool(stream.events) and stream.events[0][0] > after_id + 1
+            return events, stream.closed, missed
+
+
+def format_sse(event_id: Optional[int], event_type: str, data: Dict) -> str:
+    """Format a single Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
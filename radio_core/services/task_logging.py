@@ -0,0 +1,235 @@
+import os
+import json
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, Optional, TextIO
+
+# Task id of the task running on the current thread
+_task_context = threading.local()
+
+# Default maximum number of bytes returned by a single log read
+DEFAULT_READ_LIMIT = 1024 * 1024
+_TAIL_BLOCK_SIZE = 8192
+# Released task ids remembered, so late records don't leave their log file open
+RELEASED_TASKS_KEPT = 1024
+
+
+def set_current_task(task_id: Optional[str]):
+    """Bind log records emitted from this thread to a task"""
+    _task_context.task_id = task_id
+
+
+def get_current_task() -> Optional[str]:
+    """Get the task id bound to the current thread"""
+    return getattr(_task_context, 'task_id', None)
+
+
+class TaskContextFilter(logging.Filter):
+    """Stamp each record with the task id of the emitting thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'task_id'):
+            record.task_id = get_current_task()
+        return True
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def to_entry(self, record: logging.LogRecord) -> Dict:
+        """Build the JSON-serialisable entry for a record"""
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'task_id': getattr(record, 'task_id', None),
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return entry
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(self.to_entry(record), ensure_ascii=False)
+
+
+class TaskLogRouter(logging.Handler):
+    """
+    Write each record to the log file of the task it belongs to.
+
+    Only ever called from the listener thread, so file handles are not shared
+    between workers and records of concurrent tasks never interleave in one file.
+    Records that arrive after a task was released are appended without keeping
+    its file open. on_release is called once every record logged before the
+    release has been written and passed to event_sink.
+    """
+
+    def __init__(self, path_for_task: Callable[[str], str],
+                 event_sink: Optional[Callable[[str, Dict], None]] = None,
+                 on_release: Optional[Callable[[str], None]] = None):
+        super().__init__()
+        self.path_for_task = path_for_task
+        self.event_sink = event_sink
+        self.on_release = on_release
+        self._files: Dict[str, TextIO] = {}
+        self._released: "OrderedDict[str, None]" = OrderedDict()
+        self.json_formatter = JsonLineFormatter()
+
+    def emit(self, record: logging.LogRecord):
+        task_id = getattr(record, 'task_id', None)
+        if not task_id:
+            return
+        try:
+            if getattr(record, 'close_task_log', False):
+                log_file = self._files.pop(task_id, None)
+                if log_file:
+                    log_file.close()
+                self._released[task_id] = None
+                while len(self._released) > RELEASED_TASKS_KEPT:
+                    self._released.popitem(last=False)
+                if self.on_release:
+                    self.on_release(task_id)
+                return
+
+            entry = self.json_formatter.to_entry(record)
+            line = json.dumps(entry, ensure_ascii=False) + '\n'
+            if task_id in self._released:
+                with open(self.path_for_task(task_id), 'a', encoding='utf-8') as log_file:
+                    log_file.write(line)
+            else:
+                log_file = self._files.get(task_id)
+                if log_file is None:
+                    log_file = open(self.path_for_task(task_id), 'a', encoding='utf-8')
+                    self._files[task_id] = log_file
+                log_file.write(line)
+                log_file.flush()
+            if self.event_sink:
+                self.event_sink(task_id, entry)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for log_file in self._files.values():
+            log_file.close()
+        self._files.clear()
+        super().close()
+
+
+class TaskLogManager:
+    """
+    Route logger output through a queue to a dedicated writer thread.
+
+    Worker threads only enqueue records; console output and per-task JSON
+    line files are written by a single QueueListener thread.
+    """
+
+    def __init__(self, path_for_task: Callable[[str], str],
+                 event_sink: Optional[Callable[[str, Dict], None]] = None,
+                 on_release: Optional[Callable[[str], None]] = None):
+        self.log_queue = queue.SimpleQueue()
+        self.queue_handler = QueueHandler(self.log_queue)
+        self.queue_handler.addFilter(TaskContextFilter())
+
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+        self.router = TaskLogRouter(path_for_task, event_sink, on_release)
+        self.listener = QueueListener(self.log_queue, console_handler, self.router, respect_handler_level=True)
+        self._started = False
+
+    def attach(self, logger: logging.Logger):
+        """Send a logger's records through the queue"""
+        logger.addHandler(self.queue_handler)
+        if not self._started:
+            self.listener.start()
+            self._started = True
+
+    def release_task(self, task_id: str):
+        """Close a task's log file (and call on_release) once all of its queued records are written"""
+        # A level is required by respect_handler_level; DEBUG keeps it off the console
+        record = logging.makeLogRecord({'task_id': task_id, 'close_task_log': True,
+                                        'levelno': logging.DEBUG, 'levelname': 'DEBUG'})
+        self.log_queue.put_nowait(record)
+
+    def stop(self):
+        """Flush queued records and stop the writer thread"""
+        if self._started:
+            self.listener.stop()
+            self._started = False
+        self.router.close()
+
+
+def read_task_log(path: str, offset: Optional[int] = None, limit: Optional[int] = None,
+                  tail: Optional[int] = None) -> Dict:
+    """
+    Read part of a task log without loading the whole file.
+
+    Args:
+        path (str): Path to the log file
+        offset (Optional[int]): Byte offset to start reading from
+        limit (Optional[int]): Maximum number of bytes to return
+        tail (Optional[int]): Return only the last N lines (overrides offset)
+
+    Returns:
+        Dict: Log text plus the offsets needed to continue reading
+    """
+    limit = limit or DEFAULT_READ_LIMIT
+    size = os.path.getsize(path)
+
+    with open(path, 'rb') as f:
+        if tail is not None:
+            start = _find_tail_start(f, size, tail)
+        else:
+            start = min(max(offset or 0, 0), size)
+
+        f.seek(start)
+        data = f.read(limit)
+
+    # Never hand out a partial line unless a single line exceeds the limit
+    if start + len(data) < size:
+        last_newline = data.rfind(b'\n')
+        if last_newline != -1:
+            data = data[:last_newline + 1]
+
+    next_offset = start + len(data)
+    return {
+        'log': data.decode('utf-8', errors='replace'),
+        'offset': start,
+        'next_offset': next_offset,
+        'size': size,
+        'eof': next_offset >= size
+    }
+
+
+def _find_tail_start(f, size: int, lines: int) -> int:
+    """Find the byte offset where the last N lines of a file begin"""
+    if lines <= 0:
+        return size
+
+    position = size
+    newlines = 0
+    # A trailing newline terminates the last line rather than starting a new one
+    if size:
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            newlines = -1
+
+    while position > 0:
+        read_size = min(_TAIL_BLOCK_SIZE, position)
+        position -= read_size
+        f.seek(position)
+        block = f.read(read_size)
+        end = len(block)
+        while True:
+            index = block.rfind(b'\n', 0, end)
+            if index == -1:
+                break
+            newlines += 1
+            if newlines == lines:
+                return position + index + 1
+            end = index
+    return 0
@@ -4,14 +4,43 @@ import logging
 import os
 import time
 import random
+import itertools
+import json
+import socket
+import uuid
 from datetime import datetime
-from typing import Dict, Optional, List
-from services.ai_radio_generator import AIRadioGenerator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, List, Union
+from services.ai_radio_generator import AIRadioGenerator, GenerationCancelled
+from services.task_logging import TaskLogManager, set_current_task, read_task_log
+from services.task_events import TaskEventBroker
+from services.durable_task_queue import DurableTaskQueue
+from services.metrics import STAGE_SECONDS, TASK_SECONDS, QUEUE_DEPTH, ACTIVE_WORKERS
+from services.task_profiler import TaskProfiler, profile_artifacts
 from flask import current_app
 
+# Lower values are dequeued first
+TASK_PRIORITIES = {
+    'urgent': 0,
+    'interactive': 10,
+    'normal': 20,
+    'batch': 30
+}
+DEFAULT_PRIORITY = 'normal'
+
+# States after which a task will never run again
+FINISHED_STATES = ('completed', 'failed', 'cancelled')
+
+# Durable-queue worker timings (seconds)
+WORKER_HEARTBEAT_INTERVAL = 10
+WORKER_STALE_TIMEOUT = 120
+DURABLE_EVENT_POLL_INTERVAL = 1
+
 class TaskProcessor:
-    def __init__(self, log_dir: str, config: Dict):
-        self.task_queue = queue.Queue()
+    def __init__(self, log_dir: str, config: Dict, durable_queue: Optional[DurableTaskQueue] = None):
+        self.task_queue = queue.PriorityQueue()
+        self._task_sequence = itertools.count()  # FIFO tie-breaker within a priority
+        self._cancel_events: Dict[str, threading.Event] = {}
         self.current_task: Optional[Dict] = None
         self.is_processing = False
         self.processing_thread = None
@@ -20,20 +49,47 @@ class TaskProcessor:
         self.ai_radio_generator = None  # Will be set later
         self.app = None  # Will store Flask app instance
         
+        # With a durable queue the API process only enqueues; worker processes
+        # started with run_worker() claim and execute the tasks
+        self.durable_queue = durable_queue
+        self._event_feeds: Dict[str, threading.Thread] = {}
+        self._event_feeds_lock = threading.Lock()
+        
         # Set up logging
         self.log_dir = log_dir
         os.makedirs(log_dir, exist_ok=True)
         
-        # Configure logging
+        # Configure logging: worker threads only enqueue records, a listener
+        # thread writes the console and the per-task JSON line files
         self.logger = logging.getLogger('TaskProcessor')
         self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        
+        # Progress, status and log-line events for live viewers
+        self.events = TaskEventBroker()
+        # A task's event stream closes once its last log line has been published
+        self.log_manager = TaskLogManager(self._get_log_filepath, event_sink=self._publish_log_line,
+                                          on_release=self.events.close)
+        self.log_manager.attach(self.logger)
         
-        # Console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        console_handler.setFormatter(console_formatter)
-        self.logger.addHandler(console_handler)
+        # Queue gauges are read when metrics are scraped, not on every change
+        QUEUE_DEPTH.set_function(self._queue_depth)
+        ACTIVE_WORKERS.set_function(self._active_workers)
+    
+    def _queue_depth(self) -> int:
+        if self.durable_queue:
+            return self.durable_queue.count_by_status().get('pending', 0)
+        return self.task_queue.qsize()
+    
+    def _active_workers(self) -> int:
+        if self.durable_queue:
+            counts = self.durable_queue.count_by_status()
+            return counts.get('processing', 0) + counts.get('cancelling', 0)
+        return 1 if self.current_task else 0
+    
+    def is_idle(self) -> bool:
+        """Whether no tasks are waiting or running, so background work can use the APIs"""
+        return self._queue_depth() == 0 and self._active_workers() == 0
     
     def set_ai_radio_generator(self, generator):
         """Set the AI radio generator instance"""
@@ -51,33 +107,56 @@ class TaskProcessor:
         """Get the full path to the log file"""
         return os.path.join(self.log_dir, self._get_log_filename(task_id))
     
+    def _get_profile_base_path(self, task_id: str) -> str:
+        """Path prefix of a task's profile artifacts, next to its log file"""
+        return os.path.splitext(self._get_log_filepath(task_id))[0]
+    
+    def get_profile_artifacts(self, task_id: str) -> Dict[str, str]:
+        """Get the profile files written for a task, by kind"""
+        return profile_artifacts(self._get_profile_base_path(task_id))
+    
     def _setup_task_logger(self, task_id: str):
-        """Setup task-specific logging"""
-        log_file = self._get_log_filepath(task_id)
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(logging.INFO)
-        file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(file_formatter)
-        self.logger.addHandler(file_handler)
+        """Route records logged from this thread to the task's log file"""
+        set_current_task(task_id)
         
         # Log initial task information
         self.logger.info(f"=== Starting new task: {task_id} ===")
-        self.logger.info(f"Log file: {log_file}")
-        
-        return file_handler
+        self.logger.info(f"Log file: {self._get_log_filepath(task_id)}")
+    
+    def _teardown_task_logger(self, task_id: str):
+        """Stop routing this thread's records to the task's log file"""
+        set_current_task(None)
+        self.log_manager.release_task(task_id)
     
-    def create_task(self, task_type: str, params: Dict) -> Dict:
+    @staticmethod
+    def resolve_priority(priority: Union[str, int, None]) -> int:
+        """Convert a priority name or number into a queue priority value"""
+        if priority is None:
+            return TASK_PRIORITIES[DEFAULT_PRIORITY]
+        if isinstance(priority, bool):
+            raise ValueError(f"Invalid priority: {priority}")
+        if isinstance(priority, int):
+            return priority
+        if isinstance(priority, str) and priority in TASK_PRIORITIES:
+            return TASK_PRIORITIES[priority]
+        raise ValueError(
+            f"Invalid priority '{priority}'. Use one of {', '.join(TASK_PRIORITIES)} or an integer"
+        )
+
+    def create_task(self, task_type: str, params: Dict, priority: Union[str, int, None] = None) -> Dict:
         """Create a new task and return task information"""
         if not self.app:
             raise RuntimeError("TaskProcessor not properly initialized with Flask app")
-            
-        task_id = f"{task_type}_{int(time.time())}"
+        
+        priority_value = self.resolve_priority(priority)
+        task_id = f"{task_type}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
         log_file = self._get_log_filename(task_id)
         
         task = {
             'id': task_id,
             'type': task_type,
             'params': params,
+            'priority': priority_value,
             'status': 'pending',
             'created_at': datetime.now().isoformat(),
             'started_at': None,
@@ -90,27 +169,36 @@ class TaskProcessor:
             'output_file': None
         }
         
-        self.tasks[task_id] = task
-        self.task_queue.put(task)
-        
-        # Start processing if not already running
-        if not self.is_processing:
-            self._start_processing()
+        if self.durable_queue:
+            self.durable_queue.enqueue(task)
+        else:
+            self.tasks[task_id] = task
+            self._cancel_events[task_id] = threading.Event()
+            self._publish_status(task)
+            self.task_queue.put((priority_value, next(self._task_sequence), task_id))
+            
+            # Start processing if not already running
+            if not self.is_processing:
+                self._start_processing()
         
         # Return only the necessary information for the API response
         return {
             'task_id': task_id,
             'log_file': log_file,
-            'status': 'pending'
+            'status': 'pending',
+            'priority': priority_value
         }
     
     def get_task_status(self, task_id: str) -> Optional[Dict]:
         """Get the current status of a task with file information"""
         task = self.tasks.get(task_id)
+        if not task and self.durable_queue:
+            task = self.durable_queue.get(task_id)
         if task:
             return {
                 'id': task['id'],
                 'status': task['status'],
+                'priority': task['priority'],
                 'progress': task['progress'],
                 'current_step': task['current_step'],
                 'error': task['error'],
@@ -122,11 +210,142 @@ class TaskProcessor:
             }
         return None
     
+    def find_active_task(self, task_type: str, **params) -> Optional[Dict]:
+        """Find a pending or running task of the given type whose params match"""
+        candidates = list(self.tasks.values())
+        if self.durable_queue:
+            candidates.extend(self.durable_queue.list_active(task_type))
+        for task in candidates:
+            if task['type'] != task_type or task['status'] in FINISHED_STATES:
+                continue
+            if all(task['params'].get(key) == value for key, value in params.items()):
+                return task
+        return None
+
+    def find_active_generation(self, artist_name: str) -> Optional[Dict]:
+        """Find a pending or running show generation, single or batch, that includes the artist"""
+        active = self.find_active_task('generate_radio', artist_name=artist_name)
+        if active:
+            return active
+        candidates = list(self.tasks.values())
+        if self.durable_queue:
+            candidates.extend(self.durable_queue.list_active('generate_batch'))
+        for task in candidates:
+            if task['type'] != 'generate_batch' or task['status'] in FINISHED_STATES:
+                continue
+            if any(artist['artist_name'] == artist_name for artist in task['params']['artists']):
+                return task
+        return None
+
+    def get_batch_status(self, task_id: str) -> Optional[Dict]:
+        """Get a batch task's status with the progress of each artist"""
+        task = self.tasks.get(task_id)
+        if not task and self.durable_queue:
+            task = self.durable_queue.get(task_id)
+        if not task or task['type'] != 'generate_batch':
+            return None
+        artists = (task['result'] or {}).get('artists') or {
+            artist['artist_name']: {'status': 'pending', 'progress': 0, 'current_step': None, 'error': None}
+            for artist in task['params']['artists']
+        }
+        counts = {}
+        for entry in artists.values():
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return {
+            **self.get_task_status(task_id),
+            'batch_id': task_id,
+            'artists': [
+                {
+                    'artist_name': name,
+                    **entry,
+                    # Scripts stay in the task record; report the audio files
+                    'result': {key: value for key, value in (entry.get('result') or {}).items()
+                               if key not in ('script', 'enhanced_script')}
+                }
+                for name, entry in artists.items()
+            ],
+            'counts': counts
+        }
+
+    def cancel_task(self, task_id: str) -> Optional[Dict]:
+        """
+        Request cancellation of a task.
+        
+        Pending tasks are cancelled immediately and skipped when dequeued.
+        Running tasks are flagged and stop at their next cancellation check.
+        """
+        task = self.tasks.get(task_id)
+        if not task and self.durable_queue:
+            # The owning worker sees the flag at its next cancellation check
+            return self.get_task_status(task_id) if self.durable_queue.request_cancel(task_id) else None
+        if not task:
+            return None
+        
+        if task['status'] in FINISHED_STATES:
+            return self.get_task_status(task_id)
+        
+        self._cancel_events[task_id].set()
+        if task['status'] == 'pending':
+            self._mark_cancelled(task)
+            self.log_manager.release_task(task_id)  # Never runs, so close its event stream here
+        else:
+            self._set_status(task, 'cancelling')
+            self.logger.info(f"Cancellation requested for task {task_id}", extra={'task_id': task_id})
+        return self.get_task_status(task_id)
+
+    def is_cancel_requested(self, task_id: str) -> bool:
+        """Check whether cancellation has been requested for a task"""
+        event = self._cancel_events.get(task_id)
+        if event and event.is_set():
+            return True
+        return bool(self.durable_queue and self.durable_queue.is_cancel_requested(task_id))
+
+    def _check_cancelled(self, task_id: str):
+        """Raise GenerationCancelled if the task has been cancelled"""
+        if self.is_cancel_requested(task_id):
+            raise GenerationCancelled(f"Task {task_id} was cancelled")
+
+    def _mark_cancelled(self, task: Dict):
+        """Move a task into the cancelled state"""
+        task['completed_at'] = datetime.now().isoformat()
+        self._set_status(task, 'cancelled')
+        self.logger.info(f"Task {task['id']} cancelled")
+
+    def _set_status(self, task: Dict, status: str):
+        """Change a task's status and notify event stream readers"""
+        task['status'] = status
+        self._persist(task, 'status', 'started_at', 'completed_at', 'error', 'result', 'output_file')
+        self._publish_status(task)
+
+    def _persist(self, task: Dict, *fields: str):
+        """Write task fields back to the durable queue, if one is in use"""
+        if self.durable_queue:
+            self.durable_queue.update(task['id'], **{field: task[field] for field in fields})
+
+    def _publish_status(self, task: Dict):
+        """
+        Publish the task's status.
+
+        The event stream of a finished task is closed by the log router once
+        the task is released, so log lines still queued reach readers first.
+        """
+        self.events.publish(task['id'], 'status', self.get_task_status(task['id']))
+
+    def _publish_log_line(self, task_id: str, entry: Dict):
+        """Forward a task log entry to event stream readers (listener thread)"""
+        self.events.publish(task_id, 'log', entry)
+
     def update_task_progress(self, task_id: str, step: str, progress: int, message: str):
         """Update task progress"""
         if task_id in self.tasks:
             self.tasks[task_id]['current_step'] = step
             self.tasks[task_id]['progress'] = progress
+            self._persist(self.tasks[task_id], 'current_step', 'progress')
+            self.events.publish(task_id, 'progress', {
+                'step': step,
+                'progress': progress,
+                'message': message
+            })
             self.logger.info(f"Task {task_id} - {step}: {message}")
     
     def _start_processing(self):
@@ -142,43 +361,17 @@ class TaskProcessor:
         while self.is_processing:
             try:
                 # Get next task
-                task = self.task_queue.get(timeout=1)
-                self.current_task = task
-                task_id = task['id']
+                _, _, task_id = self.task_queue.get(timeout=1)
+                task = self.tasks[task_id]
                 
-                # Setup task-specific logging
-                file_handler = self._setup_task_logger(task_id)
+                # Skip tasks that were cancelled while waiting in the queue
+                if task['status'] == 'cancelled':
+                    self.task_queue.task_done()
+                    continue
                 
                 try:
-                    # Update task status
-                    task['status'] = 'processing'
-                    task['started_at'] = datetime.now().isoformat()
-                    
-                    self.logger.info(f"Starting task {task_id}")
-                    
-                    # Process the task within app context
-                    with self.app.app_context():
-                        # Process the task based on its type
-                        if task['type'] == 'generate_radio':
-                            self._process_radio_generation(task)
-                    
-                    # Mark task as completed
-                    task['status'] = 'completed'
-                    task['completed_at'] = datetime.now().isoformat()
-                    self.logger.info(f"Task {task_id} completed successfully")
-                
-                except Exception as e:
-                    # Handle task error
-                    task['status'] = 'failed'
-                    task['error'] = str(e)
-                    self.logger.error(f"Task {task_id} failed: {str(e)}")
-                
+                    self._run_task(task)
                 finally:
-                    # Remove task-specific log handler
-                    self.logger.removeHandler(file_handler)
-                    file_handler.close()
-                    
-                    self.current_task = None
                     self.task_queue.task_done()
             
             except queue.Empty:
@@ -187,70 +380,421 @@ class TaskProcessor:
                 self.logger.error(f"Error in task processor: {str(e)}")
                 continue
     
-    def _process_radio_generation(self, task: Dict):
-        """Process radio generation task"""
+    def _run_task(self, task: Dict):
+        """Run a single task to completion, failure or cancellation"""
         task_id = task['id']
-        params = task['params']
-        artist_name = params['artist_name']
-        enable_dj_transitions = params.get('enable_dj_transitions', False)
-        dj_options = params.get('dj_options', {})
+        self.current_task = task
+        started = time.perf_counter()
+        
+        # Setup task-specific logging
+        self._setup_task_logger(task_id)
         
         try:
-            # Log task parameters
-            self.logger.info(f"Processing radio generation for artist: {artist_name}")
-            self.logger.info(f"DJ transitions enabled: {enable_dj_transitions}")
-            
-            # Step 1: Get songs data with transcripts
-            self.update_task_progress(task_id, 'fetching_songs', 10, 'Fetching songs data with transcripts...')
-            songs_data = self.ai_radio_generator.get_songs_data(artist_name)
-            if not songs_data:
-                raise Exception(f"No songs found for artist: {artist_name}")
-            self.logger.info(f"Found {len(songs_data)} songs for {artist_name}")
+            # Update task status
+            task['started_at'] = datetime.now().isoformat()
+            self._set_status(task, 'processing')
             
-            # Step 2: Generate clean script
-            self.update_task_progress(task_id, 'script_generation', 20, 'Generating radio script...')
-            script_data = self.ai_radio_generator.generate_enhanced_script(artist_name, songs_data)
-            self.logger.info("Script generation completed successfully")
+            self.logger.info(f"Starting task {task_id}")
             
-            # Store script data in task result
-            task['result'] = {
-                'script': script_data
-            }
+            # Profile only when requested, so other tasks pay nothing
+            profile_mode = task['params'].get('profile')
+            profiler = TaskProfiler(profile_mode, self._get_profile_base_path(task_id)) if profile_mode else None
+            if profiler:
+                self.logger.info(f"Profiling task {task_id} ({profile_mode})")
+                profiler.start()
+            try:
+                # Process the task within app context
+                with self.app.app_context():
+                    # Process the task based on its type
+                    if task['type'] == 'generate_radio':
+                        self._process_radio_generation(task)
+                    elif task['type'] == 'generate_batch':
+                        self._process_batch_generation(task)
+                    elif task['type'] == 'ingest_song':
+                        self._process_song_ingestion(task)
+            finally:
+                if profiler:
+                    artifacts = profiler.stop()
+                    self.logger.info(f"Profile written: {', '.join(os.path.basename(path) for path in artifacts.values())}")
             
-            # Step 3: Enhance script with SSML
-            self.update_task_progress(task_id, 'script_enhancement', 40, 'Enhancing script with SSML...')
-            enhanced_script = self.ai_radio_generator.enhance_script_with_emphasis(script_data)
-            task['result']['enhanced_script'] = enhanced_script
-            self.logger.info("Script enhancement completed successfully")
+            # Mark task as completed
+            task['completed_at'] = datetime.now().isoformat()
+            self.logger.info(f"Task {task_id} completed successfully")
+            self._set_status(task, 'completed')
+        
+        except GenerationCancelled:
+            self._mark_cancelled(task)
+        
+        except Exception as e:
+            # Handle task error
+            task['error'] = str(e)
+            task['completed_at'] = datetime.now().isoformat()
+            self.logger.error(f"Task {task_id} failed: {str(e)}")
+            self._set_status(task, 'failed')
+        
+        finally:
+            # Stop routing to the task-specific log file
+            self._teardown_task_logger(task_id)
             
-            # Step 4: Generate audio from enhanced script
-            self.update_task_progress(task_id, 'audio_generation', 60, 'Generating audio...')
-            audio_result = self.ai_radio_generator.generate_audio(
+            self._cancel_events.pop(task_id, None)
+            self.current_task = None
+            TASK_SECONDS.observe(time.perf_counter() - started, type=task['type'], status=task['status'])
+    
+    def run_worker(self, worker_id: Optional[str] = None, poll_interval: float = 1.0):
+        """
+        Claim and run tasks from the durable queue until stop() is called.
+        
+        Used by worker processes (see worker.py); any number of them can share
+        one queue database.
+        """
+        if not self.durable_queue:
+            raise RuntimeError("run_worker requires a durable task queue")
+        if not self.app:
+            raise RuntimeError("TaskProcessor not properly initialized with Flask app")
+        
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.is_processing = True
+        self.logger.info(f"Worker {worker_id} started")
+        
+        heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat_thread.start()
+        
+        while self.is_processing:
+            try:
+                requeued = self.durable_queue.requeue_stale(WORKER_STALE_TIMEOUT)
+                if requeued:
+                    self.logger.info(f"Requeued {requeued} task(s) abandoned by dead workers")
+                
+                record = self.durable_queue.claim(worker_id)
+                if not record:
+                    time.sleep(poll_interval)
+                    continue
+                
+                task = {key: record[key] for key in (
+                    'id', 'type', 'params', 'priority', 'status', 'created_at', 'started_at',
+                    'completed_at', 'current_step', 'progress', 'result', 'error', 'log_file', 'output_file'
+                )}
+                self.tasks[task['id']] = task
+                self._cancel_events[task['id']] = threading.Event()
+                try:
+                    self._run_task(task)
+                finally:
+                    # The durable queue is the record of truth; don't accumulate tasks in memory
+                    self.tasks.pop(task['id'], None)
+            except Exception as e:
+                self.logger.error(f"Error in worker {worker_id}: {str(e)}")
+                time.sleep(poll_interval)
+        
+        self.logger.info(f"Worker {worker_id} stopped")
+    
+    def stop(self):
+        """Stop processing after the current task finishes"""
+        self.is_processing = False
+    
+    def _heartbeat_loop(self):
+        """Keep the running task's heartbeat fresh so it isn't requeued"""
+        while self.is_processing:
+            task = self.current_task
+            if task:
+                try:
+                    self.durable_queue.heartbeat(task['id'])
+                except Exception as e:
+                    self.logger.error(f"Heartbeat failed for task {task['id']}: {str(e)}")
+            time.sleep(WORKER_HEARTBEAT_INTERVAL)
+    
+    def ensure_event_feed(self, task_id: str):
+        """
+        Make sure events for a task reach self.events.
+        
+        Tasks run in this process publish directly. Tasks run by durable-queue
+        workers are mirrored by a single polling thread per task, shared by all
+        stream readers.
+        """
+        if not self.durable_queue or task_id in self.tasks or self.events.is_closed(task_id):
+            return
+        with self._event_feeds_lock:
+            if task_id in self._event_feeds:
+                return
+            feed = threading.Thread(target=self._mirror_durable_task, args=(task_id,), daemon=True)
+            self._event_feeds[task_id] = feed
+            feed.start()
+    
+    def _mirror_durable_task(self, task_id: str):
+        """Publish status, progress and log events for a task run by another process"""
+        last_status = None
+        last_progress = None
+        log_offset = 0
+        log_path = self._get_log_filepath(task_id)
+        try:
+            while True:
+                record = self.durable_queue.get(task_id)
+                if not record:
+                    break
+                
+                if os.path.exists(log_path):
+                    chunk = read_task_log(log_path, offset=log_offset)
+                    for line in chunk['log'].splitlines():
+                        try:
+                            self.events.publish(task_id, 'log', json.loads(line))
+                        except ValueError:
+                            continue
+                    log_offset = chunk['next_offset']
+                
+                progress = (record['current_step'], record['progress'])
+                if progress != last_progress and record['current_step']:
+                    self.events.publish(task_id, 'progress', {
+                        'step': record['current_step'],
+                        'progress': record['progress'],
+                        'message': None
+                    })
+                    last_progress = progress
+                
+                if record['status'] != last_status:
+                    last_status = record['status']
+                    self.events.publish(task_id, 'status', self.get_task_status(task_id))
+                
+                if record['status'] in FINISHED_STATES:
+                    self.events.close(task_id)
+                    break
+                time.sleep(DURABLE_EVENT_POLL_INTERVAL)
+        except Exception as e:
+            self.logger.error(f"Event feed for task {task_id} failed: {str(e)}")
+        finally:
+            with self._event_feeds_lock:
+                self._event_feeds.pop(task_id, None)
+    
+    def _process_song_ingestion(self, task: Dict):
+        """Prepare an uploaded song for generation by transcribing it"""
+        task_id = task['id']
+        artist_name = task['params']['artist_name']
+        song_name = task['params']['song_name']
+        
+        self.update_task_progress(task_id, 'locating_song', 10, f'Locating {song_name}...')
+        music_manager = self.ai_radio_generator.music_manager
+        music_manager.refresh(force=True)
+        song = music_manager.get_song(artist_name, song_name)
+        if not song:
+            raise Exception(f"Song '{song_name}' not found for artist: {artist_name}")
+        
+        self._check_cancelled(task_id)
+        self.update_task_progress(task_id, 'transcription', 30, f'Transcribing {song_name}...')
+        self.ai_radio_generator.get_song_data(
+            artist_name, song, should_cancel=lambda: self.is_cancel_requested(task_id)
+        )
+        self.update_task_progress(task_id, 'completed', 100, f'{song_name} is ready for generation')
+    
+    def _process_radio_generation(self, task: Dict):
+        """Process radio generation task"""
+        task_id = task['id']
+        artist_name = task['params']['artist_name']
+        
+        try:
+            task['result'] = {}
+            self._generate_show(
+                task_id,
                 artist_name,
-                enhanced_script,
-                dj_options={
-                    'enable_dj_transitions': enable_dj_transitions,
-                    'style': dj_options.get('style', 'smooth'),
-                    'length': dj_options.get('length', 'medium')
-                }
+                task['params'],
+                lambda step, progress, message: self.update_task_progress(task_id, step, progress, message),
+                task['result']
             )
             
-            if not audio_result:
-                raise Exception("Failed to generate audio")
-            
-            # Store audio paths in task result
-            task['result'].update(audio_result)
-            
             # Update final status
             task['status'] = 'completed'
             self.update_task_progress(
                 task_id,
                 'completed',
                 100,
-                f'Radio generation completed. Output file: {audio_result.get("full_show_audio", "N/A")}'
+                f'Radio generation completed. Output file: {task["result"].get("full_show_audio", "N/A")}'
             )
             self.logger.info(f"Task {task_id} completed successfully")
             
+        except GenerationCancelled:
+            self.logger.info(f"Radio generation task {task_id} stopped after cancellation")
+            raise
         except Exception as e:
             self.logger.error(f"Error in radio generation task {task_id}: {str(e)}")
-            raise e 
\ No newline at end of file
+            raise e
+    
+    def _generate_show(self, task_id: str, artist_name: str, options: Dict,
+                       report: Callable[[str, int, str], None], result: Dict):
+        """
+        Generate one artist's show: transcripts, script, SSML and audio.
+        
+        Args:
+            task_id (str): Task whose cancellation stops the generation
+            artist_name (str): Name of the artist
+            options (Dict): 'enable_dj_transitions', 'dj_options' and 'incremental'
+            report (Callable[[str, int, str], None]): Called with step, progress and message
+            result (Dict): Filled with the script, enhanced script and audio files as they are made
+        """
+        enable_dj_transitions = options.get('enable_dj_transitions', False)
+        dj_options = options.get('dj_options') or {}
+        
+        audio_dj_options = {
+            'enable_dj_transitions': enable_dj_transitions,
+            'style': dj_options.get('style', 'smooth'),
+            'length': dj_options.get('length', 'medium')
+        }
+        
+        # Log task parameters
+        self.logger.info(f"Processing radio generation for artist: {artist_name}")
+        self.logger.info(f"DJ transitions enabled: {enable_dj_transitions}")
+        should_cancel = lambda: self.is_cancel_requested(task_id)
+        
+        # Update the last show in place when asked, generating only what changed
+        if options.get('incremental'):
+            self._check_cancelled(task_id)
+            report('incremental_update', 20, 'Updating the show from its manifest...')
+            with STAGE_SECONDS.time(stage='audio_generation'):
+                updated = self.ai_radio_generator.update_show(
+                    artist_name, dj_options=audio_dj_options, should_cancel=should_cancel
+                )
+            if updated:
+                result.update(updated)
+                self.logger.info(
+                    f"Show updated: {updated['generated_transitions']} transitions generated, "
+                    f"{updated['reused_transitions']} reused"
+                )
+                return
+            self.logger.info("No reusable show manifest; generating the full show")
+        
+        # Step 1: Get songs data with transcripts
+        
+        self._check_cancelled(task_id)
+        report('fetching_songs', 10, 'Fetching songs data with transcripts...')
+        with STAGE_SECONDS.time(stage='fetching_songs'):
+            songs_data = self.ai_radio_generator.get_songs_data(artist_name, should_cancel=should_cancel)
+        if not songs_data:
+            raise Exception(f"No songs found for artist: {artist_name}")
+        self.logger.info(f"Found {len(songs_data)} songs for {artist_name}")
+        total_duration = self.ai_radio_generator.music_manager.get_total_duration(artist_name)
+        if total_duration is not None:
+            self.logger.info(f"Songs add up to {total_duration / 60:.1f} minutes of music")
+        
+        # Step 2: Generate clean script
+        self._check_cancelled(task_id)
+        report('script_generation', 20, 'Generating radio script...')
+        with STAGE_SECONDS.time(stage='script_generation'):
+            script_data = self.ai_radio_generator.generate_enhanced_script(artist_name, songs_data)
+        self.logger.info("Script generation completed successfully")
+        result['script'] = script_data
+        
+        # Step 3: Enhance script with SSML
+        self._check_cancelled(task_id)
+        report('script_enhancement', 40, 'Enhancing script with SSML...')
+        with STAGE_SECONDS.time(stage='script_enhancement'):
+            enhanced_script = self.ai_radio_generator.enhance_script_with_emphasis(script_data)
+        result['enhanced_script'] = enhanced_script
+        self.logger.info("Script enhancement completed successfully")
+        
+        # Step 4: Generate audio from enhanced script
+        self._check_cancelled(task_id)
+        report('audio_generation', 60, 'Generating audio...')
+        with STAGE_SECONDS.time(stage='audio_generation'):
+            audio_result = self.ai_radio_generator.generate_audio(
+                artist_name,
+                enhanced_script,
+                dj_options=audio_dj_options,
+                should_cancel=should_cancel
+            )
+        
+        if not audio_result:
+            raise Exception("Failed to generate audio")
+        
+        # Store audio paths in the result
+        result.update(audio_result)
+    
+    def _process_batch_generation(self, task: Dict):
+        """
+        Generate shows for several artists as one task.
+        
+        Artists run on a small thread pool sharing this process's generator,
+        so the catalog index, templates and Whisper model stay warm and
+        transcripts cached by earlier runs are reused. Whisper inference is
+        serialized; LLM and TTS calls of different artists overlap.
+        """
+        task_id = task['id']
+        params = task['params']
+        artists = params['artists']
+        concurrency = max(1, min(
+            params.get('max_concurrency') or self.config.get('BATCH_MAX_CONCURRENCY', 2),
+            self.config.get('BATCH_MAX_CONCURRENCY', 2),
+            len(artists)
+        ))
+        
+        entries = {
+            artist['artist_name']: {
+                'status': 'pending',
+                'progress': 0,
+                'current_step': None,
+                'error': None,
+                'started_at': None,
+                'completed_at': None,
+                'result': {}
+            }
+            for artist in artists
+        }
+        task['result'] = {'artists': entries}
+        lock = threading.Lock()
+        
+        def report(artist_name: str, step: str, progress: int, message: str, **fields):
+            """Record one artist's progress and roll it up into the batch progress"""
+            with lock:
+                entry = entries[artist_name]
+                entry.update(current_step=step, progress=progress, **fields)
+                finished = sum(1 for e in entries.values() if e['status'] in FINISHED_STATES)
+                overall = sum(e['progress'] for e in entries.values()) // len(entries)
+                self._persist(task, 'result')
+                self.events.publish(task_id, 'artist', {'artist_name': artist_name, **{
+                    key: value for key, value in entry.items() if key != 'result'
+                }})
+            self.update_task_progress(
+                task_id, 'generating', overall,
+                f"[{finished}/{len(entries)} artists done] {artist_name}: {message}"
+            )
+        
+        def run_artist(artist: Dict):
+            artist_name = artist['artist_name']
+            entry = entries[artist_name]
+            set_current_task(task_id)  # Log to the batch's file from this pool thread
+            try:
+                if self.is_cancel_requested(task_id):
+                    report(artist_name, 'cancelled', 0, 'Cancelled before starting', status='cancelled')
+                    return
+                report(artist_name, 'starting', 0, 'Starting', status='processing',
+                       started_at=datetime.now().isoformat())
+                with self.app.app_context():
+                    self._generate_show(
+                        task_id, artist_name, artist,
+                        lambda step, progress, message: report(artist_name, step, progress, message),
+                        entry['result']
+                    )
+                report(artist_name, 'completed', 100,
+                       f"Output file: {entry['result'].get('full_show_audio', 'N/A')}",
+                       status='completed', completed_at=datetime.now().isoformat())
+            except GenerationCancelled:
+                report(artist_name, 'cancelled', entry['progress'], 'Cancelled',
+                       status='cancelled', completed_at=datetime.now().isoformat())
+            except Exception as e:
+                self.logger.error(f"Batch {task_id}: generation for {artist_name} failed: {str(e)}")
+                report(artist_name, 'failed', entry['progress'], str(e), status='failed', error=str(e),
+                       completed_at=datetime.now().isoformat())
+            finally:
+                set_current_task(None)
+        
+        self.logger.info(f"Batch {task_id}: {len(artists)} artists, {concurrency} at a time")
+        # One catalog scan for the whole batch
+        self.ai_radio_generator.music_manager.refresh()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='BatchGeneration') as pool:
+            for future in [pool.submit(run_artist, artist) for artist in artists]:
+                future.result()
+        
+        self._check_cancelled(task_id)
+        failed = [name for name, entry in entries.items() if entry['status'] == 'failed']
+        if len(failed) == len(entries):
+            raise Exception(f"Generation failed for every artist: {', '.join(failed)}")
+        self.update_task_progress(
+            task_id, 'completed', 100,
+            f"Generated {len(entries) - len(failed)} of {len(entries)} shows"
+            + (f"; failed: {', '.join(failed)}" if failed else '')
+        )
@@ -0,0 +1,245 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, Optional
+
+# 'cprofile' traces every call and allocation; 'sampling' only samples stacks,
+# so it is cheap enough for long tasks and also shows time spent waiting
+PROFILE_MODES = ('cprofile', 'sampling')
+DEFAULT_PROFILE_MODE = 'cprofile'
+
+# Seconds between stack samples in sampling mode
+SAMPLE_INTERVAL = 0.01
+# Frames kept per allocation traceback and allocation sites reported
+ALLOCATION_FRAMES = 10
+TOP_ALLOCATIONS = 50
+# Seconds between checks of traced memory, and the growth over the last
+# snapshot that triggers a new one, so the kept snapshot is close to the peak
+ALLOCATION_POLL_INTERVAL = 0.5
+ALLOCATION_SNAPSHOT_GROWTH = 1.1
+# Functions listed in the text summary of a cProfile run
+TOP_FUNCTIONS = 60
+
+# File suffix of each artifact, appended to the task log's base name
+PROFILE_ARTIFACTS = {
+    'pstats': '.pstats',           # Load with pstats, snakeviz or gprof2dot
+    'summary': '.profile.txt',     # Top functions by cumulative time
+    'allocations': '.allocations.txt',
+    'collapsed': '.collapsed'      # Folded stacks for flamegraph.pl or speedscope
+}
+
+# tracemalloc is process-wide; only one task traces allocations at a time
+_tracemalloc_lock = threading.Lock()
+
+
+def resolve_profile_mode(profile) -> Optional[str]:
+    """
+    Convert the profile request value into a mode
+
+    Args:
+        profile: False/None for no profiling, True for the default mode, or a mode name
+
+    Returns:
+        Optional[str]: The profiling mode, or None
+    """
+    if profile is None or profile is False:
+        return None
+    if profile is True:
+        return DEFAULT_PROFILE_MODE
+    if isinstance(profile, str) and profile in PROFILE_MODES:
+        return profile
+    raise ValueError(f"Invalid profile '{profile}'. Use true or one of {', '.join(PROFILE_MODES)}")
+
+
+def profile_artifacts(base_path: str) -> Dict[str, str]:
+    """Existing profile artifacts for a task, by kind"""
+    artifacts = {}
+    for kind, suffix in PROFILE_ARTIFACTS.items():
+        path = base_path + suffix
+        if os.path.exists(path):
+            artifacts[kind] = path
+    return artifacts
+
+
+class _StackSampler:
+    """Sample one thread's stack at a fixed interval and count identical stacks"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='TaskProfiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(self._frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+                self.samples += 1
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class _AllocationWatcher:
+    """Keep a tracemalloc snapshot taken near the peak of traced memory"""
+
+    def __init__(self):
+        self.snapshot = None
+        self.snapshot_bytes = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='TaskAllocationWatcher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        current = tracemalloc.get_traced_memory()[0]
+        if self.snapshot is None or current > self.snapshot_bytes:
+            self._take(current)
+
+    def _take(self, current: int):
+        self.snapshot = tracemalloc.take_snapshot()
+        self.snapshot_bytes = current
+
+    def _run(self):
+        while not self._stop_event.wait(ALLOCATION_POLL_INTERVAL):
+            current = tracemalloc.get_traced_memory()[0]
+            if current > self.snapshot_bytes * ALLOCATION_SNAPSHOT_GROWTH:
+                self._take(current)
+
+
+class TaskProfiler:
+    """
+    Profile the current thread while a task runs and store the results next
+    to the task log.
+
+    'cprofile' mode writes a .pstats file, a text summary and the top
+    allocation sites from a tracemalloc snapshot taken near peak usage.
+    'sampling' mode writes collapsed stacks sampled every SAMPLE_INTERVAL
+    seconds, which include time spent blocked on network calls and
+    subprocesses.
+    """
+
+    def __init__(self, mode: str, base_path: str):
+        """
+        Args:
+            mode (str): One of PROFILE_MODES
+            base_path (str): Task log path without its extension; artifacts get
+                the suffixes in PROFILE_ARTIFACTS
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Invalid profile mode '{mode}'")
+        self.mode = mode
+        self.base_path = base_path
+        self._profile = None
+        self._sampler = None
+        self._watcher = None
+        self._started = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.mode == 'sampling':
+            self._sampler = _StackSampler(threading.get_ident())
+            self._sampler.start()
+            return
+        # Another task may already be tracing allocations; profile calls only then
+        if not tracemalloc.is_tracing() and _tracemalloc_lock.acquire(blocking=False):
+            tracemalloc.start(ALLOCATION_FRAMES)
+            self._watcher = _AllocationWatcher()
+            self._watcher.start()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            self._profile = profile
+        except ValueError as e:
+            # Python 3.12+ allows one active profiler per process
+            print(f"Call profiling unavailable for {self.base_path}: {str(e)}")
+
+    def stop(self) -> Dict[str, str]:
+        """
+        Stop profiling and write the artifacts
+
+        Returns:
+            Dict[str, str]: Paths of the written artifacts by kind
+        """
+        elapsed = time.perf_counter() - self._started
+        try:
+            if self._sampler:
+                self._sampler.stop()
+                self._sampler.write_collapsed(self.base_path + PROFILE_ARTIFACTS['collapsed'])
+            if self._profile:
+                self._profile.disable()
+                self._profile.dump_stats(self.base_path + PROFILE_ARTIFACTS['pstats'])
+                self._write_summary(elapsed)
+            if self._watcher:
+                self._watcher.stop()
+                self._write_allocations(tracemalloc.get_traced_memory()[1])
+        except Exception as e:
+            print(f"Error writing task profile {self.base_path}: {str(e)}")
+        finally:
+            if self._watcher:
+                tracemalloc.stop()
+                _tracemalloc_lock.release()
+                self._watcher = None
+        return profile_artifacts(self.base_path)
+
+    def _write_summary(self, elapsed: float):
+        output = io.StringIO()
+        output.write(f"Wall time: {elapsed:.2f} s\n\n")
+        stats = pstats.Stats(self._profile, stream=output)
+        stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        with open(self.base_path + PROFILE_ARTIFACTS['summary'], 'w', encoding='utf-8') as f:
+            f.write(output.getvalue())
+
+    def _write_allocations(self, peak_bytes: int):
+        watcher = self._watcher
+        snapshot = watcher.snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, __file__, all_frames=True)
+        ))
+        top = snapshot.statistics('traceback')[:TOP_ALLOCATIONS]
+        with open(self.base_path + PROFILE_ARTIFACTS['allocations'], 'w', encoding='utf-8') as f:
+            f.write(f"Peak traced memory: {peak_bytes / 2 ** 20:.1f} MiB\n")
+            f.write(f"Top {len(top)} allocation sites when {watcher.snapshot_bytes / 2 ** 20:.1f} MiB was traced:\n")
+            for index, stat in enumerate(top, 1):
+                f.write(f"\n#{index}: {stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+                for line in stat.traceback.format():
+                    f.write(f"{line}\n")
@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import fcntl
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from .ai_radio_generator import GenerationCancelled
+from .show_manifest import ShowManifest, transition_key
+from .metrics import TRANSITION_LIBRARY_LOOKUPS, TRANSITION_LIBRARY_GENERATED
+
+# Seconds between background fills
+DEFAULT_FILL_INTERVAL = 900
+# API calls one transition costs: the script, its SSML enhancement and the TTS request
+TRANSITION_API_CALLS = 3
+# The call budget covers this many seconds, rolling
+BUDGET_WINDOW_SECONDS = 86400
+# Held by the process that is filling, so workers sharing the library don't duplicate work
+LOCK_FILENAME = '.fill.lock'
+# Log of the API calls fills made, shared by every process and kept across restarts
+CALL_LOG_FILENAME = '.api_calls.json'
+
+
+def parse_styles(value: str) -> List[Tuple[str, str]]:
+    """Parse 'style:length,style:length' into pairs; the length defaults to medium"""
+    styles = []
+    for entry in value.split(','):
+        entry = entry.strip()
+        if entry:
+            style, _, length = entry.partition(':')
+            styles.append((style.strip(), length.strip() or 'medium'))
+    return styles
+
+
+class TransitionLibrary:
+    """
+    Transitions generated ahead of time for adjacent song pairs.
+
+    While no tasks are queued or running, a background thread walks every
+    artist's catalog and generates the transition between each pair of
+    consecutive songs (the pairs a show plays) for each configured style and
+    length, within a rolling budget of API calls and a disk limit. Clips are
+    keyed like show manifest transitions, by the content hashes of both songs
+    plus style and length, so show generation finds them with lookup() and
+    only generates the pairs that are missing. The call budget is logged in
+    the library directory and updated under the fill lock, so it holds across
+    restarts and for every process sharing the library.
+    """
+
+    def __init__(self, ai_radio_generator, library_dir: str, app=None,
+                 styles: Optional[List[Tuple[str, str]]] = None, max_calls_per_day: int = 300,
+                 max_bytes: Optional[int] = None, fill_interval: float = DEFAULT_FILL_INTERVAL,
+                 is_idle: Optional[Callable[[], bool]] = None, touch: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            ai_radio_generator (AIRadioGenerator): Generates the scripts and speech
+            library_dir (str): Directory for the clips and their metadata
+            app (Flask): Application whose context generation runs in
+            styles (Optional[List[Tuple[str, str]]]): (style, length) pairs to pre-generate
+            max_calls_per_day (int): API calls fills may make per rolling day
+            max_bytes (Optional[int]): Fills stop once the library is this large
+            fill_interval (float): Seconds between background fills
+            is_idle (Optional[Callable[[], bool]]): Fills only generate while this returns True
+            touch (Optional[Callable[[str], None]]): Called with clips handed out, to mark them used
+        """
+        self.ai_radio_generator = ai_radio_generator
+        self.library_dir = os.path.abspath(library_dir)
+        self.app = app
+        self.styles = styles or [('smooth', 'medium')]
+        self.max_calls_per_day = max_calls_per_day
+        self.max_bytes = max_bytes
+        self.fill_interval = fill_interval
+        self.is_idle = is_idle or (lambda: True)
+        self.touch = touch
+        self._songs = ShowManifest('', {})  # Song hash cache
+        self._lock = threading.Lock()
+        self._last_fill = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+        os.makedirs(self.library_dir, exist_ok=True)
+
+    def start(self):
+        """Start filling in the background"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._fill_loop, name='TransitionLibrary', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def trigger(self):
+        """Fill now instead of waiting for the next interval"""
+        if self._thread and self._thread.is_alive():
+            self._wake_event.set()
+        else:
+            threading.Thread(target=self.fill, name='TransitionLibraryFill', daemon=True).start()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.library_dir, key)
+        return base + '.mp3', base + '.json'
+
+    def key(self, current_song: Dict, next_song: Dict, style: str, length: str) -> str:
+        with self._lock:
+            return transition_key(
+                self._songs.song_item(current_song)['content_hash'],
+                self._songs.song_item(next_song)['content_hash'],
+                style, length
+            )
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """
+        Find a pre-generated transition
+
+        Returns:
+            Optional[Dict]: Show manifest item of the clip, or None if it is
+                missing or its clip was removed or changed
+        """
+        _, metadata_path = self._paths(key)
+        item = None
+        try:
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                item = json.load(f)['item']
+        except (OSError, ValueError, KeyError):
+            pass  # Not generated yet, or written by an interrupted fill
+        if item and not ShowManifest.is_intact(item):
+            item = None
+        TRANSITION_LIBRARY_LOOKUPS.inc(outcome='hit' if item else 'miss')
+        if item and self.touch:
+            self.touch(item['path'])
+            self.touch(metadata_path)
+        return item
+
+    def _read_call_log(self, now: float) -> List[List[float]]:
+        """[time, calls] of the transitions generated within the budget window"""
+        try:
+            with open(os.path.join(self.library_dir, CALL_LOG_FILENAME), 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return [entry for entry in entries if entry[0] >= now - BUDGET_WINDOW_SECONDS]
+
+    def _record_calls(self, calls: int):
+        """Append to the call log; only called while holding the fill lock"""
+        now = time.time()
+        entries = self._read_call_log(now) + [[now, calls]]
+        log_path = os.path.join(self.library_dir, CALL_LOG_FILENAME)
+        temp_path = f"{log_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(temp_path, log_path)
+
+    def _calls_in_window(self, now: float) -> int:
+        return int(sum(calls for _, calls in self._read_call_log(now)))
+
+    def _library_bytes(self) -> int:
+        total = 0
+        for entry in os.scandir(self.library_dir):
+            if entry.is_file():
+                total += entry.stat().st_size
+        return total
+
+    def fill(self) -> Dict:
+        """
+        Generate missing transitions until done or out of budget
+
+        Returns:
+            Dict: Transitions generated and why the fill stopped
+        """
+        started = time.monotonic()
+        result = {'started_at': datetime.now().isoformat(), 'generated': 0, 'present': 0, 'stopped': 'complete'}
+        lock_file = open(os.path.join(self.library_dir, LOCK_FILENAME), 'w')
+        try:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                result['stopped'] = 'another process is filling'
+                return result
+            result['stopped'] = self._fill_pairs(result)
+            return result
+        finally:
+            lock_file.close()
+            result['seconds'] = round(time.monotonic() - started, 2)
+            self._last_fill = result
+            if result['generated']:
+                print(f"Transition library: generated {result['generated']} transitions ({result['stopped']})")
+
+    def _fill_pairs(self, result: Dict) -> str:
+        """Walk the adjacent pairs of every artist; returns why the walk ended"""
+        music_manager = self.ai_radio_generator.music_manager
+        library_bytes = self._library_bytes()
+        for artist_name in music_manager.get_all_artists():
+            songs = music_manager.get_artist_songs(artist_name)
+            for style, length in self.styles:
+                for index, (current_song, next_song) in enumerate(zip(songs, songs[1:])):
+                    if self._stop_event.is_set():
+                        return 'stopped'
+                    key = self.key(current_song, next_song, style, length)
+                    clip_path, metadata_path = self._paths(key)
+                    if os.path.exists(metadata_path) and os.path.exists(clip_path):
+                        result['present'] += 1
+                        continue
+
+                    if not self.is_idle():
+                        return 'tasks are running'
+                    if self._calls_in_window(time.time()) + TRANSITION_API_CALLS > self.max_calls_per_day:
+                        return 'API call budget used up'
+                    if self.max_bytes is not None and library_bytes >= self.max_bytes:
+                        return 'disk budget used up'
+
+                    self._record_calls(TRANSITION_API_CALLS)
+                    try:
+                        library_bytes += self._generate(artist_name, index, current_song, next_song,
+                                                        style, length, key)
+                    except Exception as e:
+                        # Most likely an API outage; don't spend the budget on retries
+                        print(f"Transition library: generating {artist_name} {current_song['name']} -> "
+                              f"{next_song['name']} failed: {str(e)}")
+                        return f"error: {str(e)}"
+                    result['generated'] += 1
+        return 'complete'
+
+    def _generate(self, artist_name: str, index: int, current_song: Dict, next_song: Dict,
+                  style: str, length: str, key: str) -> int:
+        """Generate one transition into the library; returns the bytes written"""
+        clip_path, metadata_path = self._paths(key)
+        dj_options = {'enable_dj_transitions': True, 'style': style, 'length': length}
+        context = self.app.app_context() if self.app else None
+        if context:
+            context.push()
+        try:
+            path, script = self.ai_radio_generator._generate_transition(
+                artist_name, index, current_song, next_song, dj_options, self.library_dir,
+                should_cancel=self._stop_event.is_set
+            )
+        finally:
+            if context:
+                context.pop()
+        os.replace(path, clip_path)
+        item = ShowManifest.spoken_item('transition', clip_path, script, key=key)
+        temp_path = f"{metadata_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'item': item,
+                'artist': artist_name,
+                'from_song': current_song['name'],
+                'to_song': next_song['name'],
+                'style': style,
+                'length': length,
+                'created_at': datetime.now().isoformat()
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, metadata_path)
+        TRANSITION_LIBRARY_GENERATED.inc(style=style)
+        return os.path.getsize(clip_path) + os.path.getsize(metadata_path)
+
+    def get_stats(self) -> Dict:
+        """Get the library size, budget use and the result of the last fill"""
+        clips = sum(1 for name in os.listdir(self.library_dir) if name.endswith('.mp3'))
+        return {
+            'directory': self.library_dir,
+            'transitions': clips,
+            'bytes': self._library_bytes(),
+            'max_bytes': self.max_bytes,
+            'styles': [f"{style}:{length}" for style, length in self.styles],
+            'api_calls_last_day': self._calls_in_window(time.time()),
+            'max_calls_per_day': self.max_calls_per_day,
+            'background': bool(self._thread and self._thread.is_alive()),
+            'last_fill': self._last_fill
+        }
+
+    def _fill_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.fill()
+            except GenerationCancelled:
+                break
+            except Exception as e:
+                print(f"Transition library fill failed: {str(e)}")
+            self._wake_event.wait(self.fill_interval)
+            self._wake_event.clear()
@@ -0,0 +1,253 @@
+import os
+import re
+import json
+import uuid
+import fcntl
+import shutil
+import hashlib
+from typing import BinaryIO, Dict, Optional, Tuple
+from .music_manager import AUDIO_EXTENSIONS
+
+# Bytes read from the request stream per write
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+_CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+_UPLOAD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+class UploadError(Exception):
+    """An upload request that cannot be accepted"""
+
+    def __init__(self, message: str, status_code: int = 400, **details):
+        super().__init__(message)
+        self.status_code = status_code
+        self.details = details
+
+
+def validate_path_component(value: str, kind: str) -> str:
+    """Reject names that could escape their directory"""
+    if not value or value in ('.', '..') or value.startswith('.') or '/' in value or '\\' in value or '\0' in value:
+        raise UploadError(f"Invalid {kind}: '{value}'")
+    return value
+
+
+def parse_content_range(header: Optional[str]) -> Optional[Tuple[int, int, Optional[int]]]:
+    """
+    Parse a 'bytes start-end/total' Content-Range header
+
+    Returns:
+        Optional[Tuple[int, int, Optional[int]]]: (start, end inclusive, total or None)
+    """
+    if not header:
+        return None
+    match = _CONTENT_RANGE_PATTERN.match(header.strip())
+    if not match:
+        raise UploadError(f"Malformed Content-Range header: '{header}'")
+    start, end = int(match.group(1)), int(match.group(2))
+    total = None if match.group(3) == '*' else int(match.group(3))
+    if end < start or (total is not None and end >= total):
+        raise UploadError(f"Invalid Content-Range: '{header}'")
+    return start, end, total
+
+
+class UploadManager:
+    """
+    Stream song uploads to disk in fixed-size chunks, hashing as they are written.
+
+    A request either carries a whole file or one chunk of a resumable upload
+    (Upload-Id plus Content-Range). Partial uploads live in upload_dir as
+    <upload_id>.part with a small JSON sidecar, so a client can resume from the
+    last acknowledged offset after a dropped connection or a server restart.
+    Chunks of one upload may reach different worker processes, so writes are
+    serialized with a lock on the part file, and a process only reuses its
+    running hash when it has hashed every byte in the file.
+    """
+
+    def __init__(self, music_base_path: str, upload_dir: str, chunk_size: int = UPLOAD_CHUNK_SIZE):
+        self.music_base_path = music_base_path
+        self.upload_dir = upload_dir
+        self.chunk_size = chunk_size
+        # Running hash per in-progress upload, with the number of bytes it covers
+        self._hashers: Dict[str, Tuple['hashlib._Hash', int]] = {}
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.upload_dir, f"{upload_id}.part")
+
+    def _info_path(self, upload_id: str) -> str:
+        return os.path.join(self.upload_dir, f"{upload_id}.json")
+
+    def _open_part(self, upload_id: str) -> BinaryIO:
+        """Open the part file with an exclusive lock, held until it is closed"""
+        part_path = self._part_path(upload_id)
+        while True:
+            fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                # Another process may have completed the upload and moved the file meanwhile
+                if os.fstat(fd).st_ino == os.stat(part_path).st_ino:
+                    return os.fdopen(fd, 'r+b')
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def _read_info(self, upload_id: str) -> Optional[Dict]:
+        try:
+            with open(self._info_path(upload_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_upload(self, upload_id: str) -> Optional[Dict]:
+        """Get the state of an in-progress upload, including the offset to resume from"""
+        if not _UPLOAD_ID_PATTERN.match(upload_id or ''):
+            return None
+        info = self._read_info(upload_id)
+        if info is None:
+            return None
+        info['offset'] = os.path.getsize(self._part_path(upload_id)) if os.path.exists(self._part_path(upload_id)) else 0
+        info['status'] = 'incomplete'
+        return info
+
+    def receive(self, artist_name: str, filename: str, stream: BinaryIO,
+                upload_id: Optional[str] = None, content_range: Optional[str] = None,
+                overwrite: bool = False) -> Dict:
+        """
+        Write one request body to disk.
+
+        Args:
+            artist_name (str): Artist directory to add the song to
+            filename (str): Song file name, including an audio extension
+            stream (BinaryIO): Request body stream
+            upload_id (Optional[str]): Id of a resumable upload (generated if omitted)
+            content_range (Optional[str]): Content-Range header of this chunk
+            overwrite (bool): Replace an existing song with the same file name
+
+        Returns:
+            Dict: 'incomplete' with the next offset, or 'complete' with the
+            final path and sha256
+
+        Raises:
+            UploadError: For invalid names, out-of-order chunks or conflicts
+        """
+        validate_path_component(artist_name, 'artist name')
+        validate_path_component(filename, 'file name')
+        if os.path.splitext(filename)[1].lower() not in AUDIO_EXTENSIONS:
+            raise UploadError(f"Unsupported file type. Use one of: {', '.join(AUDIO_EXTENSIONS)}")
+
+        destination = os.path.join(self.music_base_path, artist_name, filename)
+        if os.path.exists(destination) and not overwrite:
+            raise UploadError(f"Song '{filename}' already exists for artist '{artist_name}'", 409)
+
+        byte_range = parse_content_range(content_range)
+        upload_id = upload_id or uuid.uuid4().hex
+        if not _UPLOAD_ID_PATTERN.match(upload_id):
+            raise UploadError(f"Invalid upload id: '{upload_id}'")
+
+        with self._open_part(upload_id) as part:
+            part.seek(0, os.SEEK_END)
+            offset = part.tell()
+            info = self._read_info(upload_id)
+
+            if byte_range is None:
+                # Whole file in one request: start from scratch
+                offset = 0
+                self._hashers.pop(upload_id, None)
+                start, total = 0, None
+            else:
+                start, end, total = byte_range
+                if start != offset:
+                    if not offset and info is None:
+                        os.remove(self._part_path(upload_id))  # Created by the lock; nothing to resume
+                    raise UploadError(
+                        f"Chunk starts at byte {start} but the upload has {offset} bytes",
+                        409, upload_id=upload_id, offset=offset
+                    )
+                if total is None and info:
+                    total = info.get('total')  # Declared by an earlier chunk
+
+            self._write_info(upload_id, artist_name, filename, total)
+            hasher = self._get_hasher(upload_id, part, offset)
+
+            part.seek(offset)
+            while True:
+                chunk = stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                part.write(chunk)
+                hasher.update(chunk)
+                offset += len(chunk)
+
+            if byte_range is not None and offset != end + 1:
+                # Drop the chunk so the client can resend it
+                part.truncate(start)
+                self._hashers.pop(upload_id, None)
+                raise UploadError(
+                    f"Content-Range declares {end + 1 - start} bytes but the body has {offset - start}",
+                    400, upload_id=upload_id, offset=start
+                )
+            part.truncate(offset)
+            part.flush()
+            self._hashers[upload_id] = (hasher, offset)
+
+            if byte_range is not None and (total is None or offset < total):
+                # Without a declared total the upload stays open until a chunk declares one
+                return {
+                    'status': 'incomplete',
+                    'upload_id': upload_id,
+                    'offset': offset,
+                    'total': total
+                }
+            if total is not None and offset > total:
+                raise UploadError(f"Received {offset} bytes, more than the declared {total}",
+                                  400, upload_id=upload_id, offset=offset)
+
+            sha256 = hasher.hexdigest()
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.move(self._part_path(upload_id), destination)
+            # A transcript cached for an earlier file of this name no longer matches
+            transcript_path = os.path.splitext(destination)[0] + '.json'
+            if os.path.exists(transcript_path):
+                os.remove(transcript_path)
+            self._discard(upload_id)
+
+        return {
+            'status': 'complete',
+            'upload_id': upload_id,
+            'artist': artist_name,
+            'song': os.path.splitext(filename)[0],
+            'path': destination,
+            'size': offset,
+            'sha256': sha256
+        }
+
+    def _write_info(self, upload_id: str, artist_name: str, filename: str, total: Optional[int]):
+        info = {'upload_id': upload_id, 'artist': artist_name, 'filename': filename, 'total': total}
+        with open(self._info_path(upload_id), 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+
+    def _get_hasher(self, upload_id: str, part: BinaryIO, offset: int):
+        """
+        Get the running hash of the first offset bytes.
+
+        It is rebuilt from the part file after a restart, or when other
+        processes have written chunks since this one last hashed the upload.
+        """
+        hasher, hashed = self._hashers.get(upload_id, (None, 0))
+        if hasher is None or hashed != offset:
+            hasher = hashlib.sha256()
+            part.seek(0)
+            remaining = offset
+            while remaining:
+                chunk = part.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        return hasher
+
+    def _discard(self, upload_id: str):
+        self._hashers.pop(upload_id, None)
+        for path in (self._part_path(upload_id), self._info_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
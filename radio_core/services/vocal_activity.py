@@ -0,0 +1,149 @@
+import bisect
+import numpy as np
+from typing import List, Tuple
+
+# Whisper decodes every file to 16 kHz mono
+SAMPLE_RATE = 16000
+# 32 ms analysis frames, processed in blocks to bound memory on long mixes
+FRAME_SIZE = 512
+FRAMES_PER_BLOCK = 4096
+# Band holding most of the energy of a singing voice
+VOCAL_BAND_HZ = (250, 3500)
+
+# Frames more than this far below the loud part of the track (95th percentile)
+# or below the absolute floor are silence, fades or quiet intros
+SILENCE_BELOW_LOUD_DB = 30.0
+SILENCE_FLOOR_DB = -55.0
+# A frame whose share of energy in the vocal band is below this fraction of
+# the share in the track's most vocal parts (90th percentile) is dominated by
+# bass and drums or by cymbals
+MIN_RELATIVE_BAND_RATIO = 0.5
+# Seconds the features are averaged over, so single beats don't decide
+SMOOTHING_SECONDS = 1.0
+
+# Seconds added around each region so word onsets and tails aren't cut,
+# gaps shorter than MERGE_GAP_SECONDS are kept, regions shorter than
+# MIN_REGION_SECONDS are dropped
+PAD_SECONDS = 0.5
+MERGE_GAP_SECONDS = 3.0
+MIN_REGION_SECONDS = 1.5
+# Seconds of silence put between joined regions so words don't run together
+SPLICE_GAP_SECONDS = 0.3
+# When more than this fraction of a track is vocal, transcribe all of it
+MAX_GATED_FRACTION = 0.9
+
+
+def _moving_average(values: np.ndarray, width: int) -> np.ndarray:
+    if width <= 1 or len(values) < width:
+        return values
+    return np.convolve(values, np.ones(width) / width, mode='same')
+
+
+def _frame_features(audio: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Level in dBFS and share of energy in the vocal band of each frame"""
+    frame_count = len(audio) // FRAME_SIZE
+    frames = audio[:frame_count * FRAME_SIZE].reshape(frame_count, FRAME_SIZE)
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / sample_rate)
+    band = (freqs >= VOCAL_BAND_HZ[0]) & (freqs <= VOCAL_BAND_HZ[1])
+
+    level_db = np.empty(frame_count)
+    band_ratio = np.empty(frame_count)
+    for start in range(0, frame_count, FRAMES_PER_BLOCK):
+        block = frames[start:start + FRAMES_PER_BLOCK]
+        power = np.abs(np.fft.rfft(block * window, axis=1)) ** 2
+        level_db[start:start + len(block)] = 10 * np.log10(np.mean(block.astype(np.float64) ** 2, axis=1) + 1e-12)
+        band_ratio[start:start + len(block)] = power[:, band].sum(axis=1) / (power.sum(axis=1) + 1e-12)
+    return level_db, band_ratio
+
+
+def _mask_to_regions(mask: np.ndarray, frame_seconds: float) -> List[Tuple[float, float]]:
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return [(float(start * frame_seconds), float(end * frame_seconds)) for start, end in zip(edges[0::2], edges[1::2])]
+
+
+def _tidy_regions(regions: List[Tuple[float, float]], duration: float) -> List[Tuple[float, float]]:
+    """Pad regions, merge the ones separated by short gaps and drop short ones"""
+    merged = []
+    for start, end in regions:
+        start, end = max(0.0, start - PAD_SECONDS), min(duration, end + PAD_SECONDS)
+        if merged and start - merged[-1][1] < MERGE_GAP_SECONDS:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return [(start, end) for start, end in merged if end - start >= MIN_REGION_SECONDS]
+
+
+def detect_vocal_regions(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> List[Tuple[float, float]]:
+    """
+    Find the parts of a track likely to contain vocals
+
+    A cheap energy heuristic, not a voice detector: it drops silence, fades,
+    quiet intros and outros, and sections dominated by bass and drums or by
+    cymbals. It errs towards keeping audio, since a missed verse costs more
+    than transcribing an instrumental bar.
+
+    Args:
+        audio (np.ndarray): Mono float samples, as returned by whisper.load_audio
+        sample_rate (int): Sample rate of the audio
+
+    Returns:
+        List[Tuple[float, float]]: Sorted (start, end) times in seconds
+    """
+    duration = len(audio) / sample_rate
+    if len(audio) < FRAME_SIZE:
+        return []
+    level_db, band_ratio = _frame_features(audio, sample_rate)
+    frame_seconds = FRAME_SIZE / sample_rate
+    width = max(1, int(round(SMOOTHING_SECONDS / frame_seconds)))
+    level_db = _moving_average(level_db, width)
+    band_ratio = _moving_average(band_ratio, width)
+
+    loud_db = np.percentile(level_db, 95)
+    audible = level_db > max(SILENCE_FLOOR_DB, loud_db - SILENCE_BELOW_LOUD_DB)
+    if not audible.any():
+        return []
+    vocal_ratio = np.percentile(band_ratio[audible], 90)
+    vocal = audible & (band_ratio >= vocal_ratio * MIN_RELATIVE_BAND_RATIO)
+    return _tidy_regions(_mask_to_regions(vocal, frame_seconds), duration)
+
+
+class VocalSplice:
+    """Vocal regions of a track joined into one clip, with a map back to track time"""
+
+    def __init__(self, audio: np.ndarray, regions: List[Tuple[float, float]], sample_rate: int = SAMPLE_RATE):
+        """
+        Args:
+            audio (np.ndarray): Mono samples of the whole track
+            regions (List[Tuple[float, float]]): Sorted, non-overlapping (start, end) times in seconds
+            sample_rate (int): Sample rate of the audio
+        """
+        self.regions = regions
+        self.sample_rate = sample_rate
+        gap = np.zeros(int(SPLICE_GAP_SECONDS * sample_rate), dtype=audio.dtype)
+        pieces = []
+        # Start of each region in the joined clip, in seconds
+        self._clip_starts = []
+        position = 0
+        for start, end in regions:
+            piece = audio[int(start * sample_rate):int(end * sample_rate)]
+            if pieces:
+                pieces.append(gap)
+                position += len(gap)
+            self._clip_starts.append(position / sample_rate)
+            pieces.append(piece)
+            position += len(piece)
+        self.audio = np.concatenate(pieces) if pieces else audio[:0]
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / self.sample_rate
+
+    def to_track_time(self, seconds: float) -> float:
+        """Convert a time in the joined clip to the same moment in the track"""
+        if not self.regions:
+            return seconds
+        index = max(0, bisect.bisect_right(self._clip_starts, seconds) - 1)
+        start, end = self.regions[index]
+        # Times inside a gap belong to the end of the region before it
+        return min(start + seconds - self._clip_starts[index], end)
@@ -1,42 +1,236 @@
-import whisper
-import torch
 import warnings
 import logging
 import os
+import time
+import threading
+from typing import Dict, Optional
+from .metrics import WHISPER_SECONDS, WHISPER_REALTIME_FACTOR, WHISPER_TRANSCRIBED_FRACTION
+from .vocal_activity import SAMPLE_RATE, MAX_GATED_FRACTION, VocalSplice, detect_vocal_regions
+
+# Loaded models by backend settings, shared by every transcriber in the process
+_models = {}
+_models_lock = threading.Lock()
+# One lock per loaded model: decoding keeps per-call state on the model, so
+# concurrent generations (batches) take turns and overlap only their other stages
+_inference_locks = {}
+
+def _cached_model(key: tuple, loader):
+    with _models_lock:
+        if key not in _models:
+            _models[key] = loader()
+            _inference_locks[key] = threading.Lock()
+        return _models[key]
+
+def _inference_lock(key: tuple) -> threading.Lock:
+    with _models_lock:
+        return _inference_locks[key]
+
+def default_device() -> str:
+    try:
+        import torch
+    except ImportError:
+        return "cpu"  # faster-whisper doesn't need torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def _openai_model_key(model_name: str, device: str) -> tuple:
+    return ('openai-whisper', model_name, device)
+
+def load_model(model_name: str = "base", device: str = None):
+    """
+    Load an openai-whisper model once per process
+    
+    A model loaded before the process forks (see serve.py) is inherited by
+    the children, which then share its weights copy-on-write.
+    """
+    import whisper
+    device = device or default_device()
+    return _cached_model(
+        _openai_model_key(model_name, device),
+        lambda: whisper.load_model(model_name, device=device)
+    )
+
+class OpenAIWhisperBackend:
+    """The reference openai-whisper implementation on torch (float32 on CPU)"""
+    name = 'openai-whisper'
+
+    def __init__(self, model_name: str, device: str, threads: int = 0, beam_size: Optional[int] = None,
+                 compute_type: Optional[str] = None):
+        import whisper
+        self._whisper = whisper
+        self.beam_size = beam_size
+        if threads:
+            # torch's thread pool is process-wide
+            import torch
+            torch.set_num_threads(threads)
+        self.model = load_model(model_name, device=device)
+        self.model_key = _openai_model_key(model_name, device)
+
+    def load_audio(self, audio_path: str):
+        return self._whisper.load_audio(audio_path)
+
+    def transcribe(self, audio) -> Dict:
+        options = {"beam_size": self.beam_size} if self.beam_size else {}
+        # Suppress the FP16 warning for CPU
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="FP16 is not supported on CPU")
+            result = self.model.transcribe(audio, **options)
+        return {"text": result["text"], "segments": result.get("segments") or []}
+
+class FasterWhisperBackend:
+    """
+    CTranslate2 Whisper via faster-whisper, with int8 weights on CPU by default.
+    
+    Needs `pip install faster-whisper`. Its thread pools don't survive fork,
+    so serve.py lets each process load its own copy.
+    """
+    name = 'faster-whisper'
+
+    def __init__(self, model_name: str, device: str, threads: int = 0, beam_size: Optional[int] = None,
+                 compute_type: Optional[str] = None):
+        try:
+            import faster_whisper
+        except ImportError:
+            raise RuntimeError("The faster-whisper backend needs the faster-whisper package (pip install faster-whisper)")
+        self._faster_whisper = faster_whisper
+        self.beam_size = beam_size or 5
+        compute_type = compute_type or ("int8" if device == "cpu" else "float16")
+        self.model_key = (self.name, model_name, device, compute_type, threads)
+        self.model = _cached_model(
+            self.model_key,
+            lambda: faster_whisper.WhisperModel(model_name, device=device, compute_type=compute_type,
+                                                cpu_threads=threads)
+        )
+
+    def load_audio(self, audio_path: str):
+        return self._faster_whisper.decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+
+    def transcribe(self, audio) -> Dict:
+        segments, _ = self.model.transcribe(audio, beam_size=self.beam_size)
+        # Segments are decoded lazily; keep the fields song data and callers use
+        segments = [
+            {"id": index, "start": segment.start, "end": segment.end, "text": segment.text}
+            for index, segment in enumerate(segments)
+        ]
+        return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+TRANSCRIPTION_BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend
+}
 
 class WhisperTranscriber:
-    def __init__(self, model_name="base"):
+    def __init__(self, model_name="base", vocal_gating: bool = True, backend: str = "openai-whisper",
+                 threads: int = 0, beam_size: Optional[int] = None, compute_type: Optional[str] = None):
+        """
+        Args:
+            model_name (str): Whisper model to use
+            vocal_gating (bool): Transcribe only the parts of each song likely to
+                contain vocals (see vocal_activity.detect_vocal_regions)
+            backend (str): One of TRANSCRIPTION_BACKENDS
+            threads (int): CPU threads for inference, 0 for the backend's default
+            beam_size (Optional[int]): Beam size, None for the backend's default
+                (greedy for openai-whisper, 5 for faster-whisper)
+            compute_type (Optional[str]): faster-whisper weight type, such as
+                int8, int8_float32 or float32 (default int8 on CPU)
+        """
+        if backend not in TRANSCRIPTION_BACKENDS:
+            raise ValueError(f"Invalid transcription backend '{backend}'. Use one of {', '.join(TRANSCRIPTION_BACKENDS)}")
+        self.vocal_gating = vocal_gating
+        self.model_name = model_name
+        self.backend_name = backend
+        self._backend_options = {"threads": threads, "beam_size": beam_size, "compute_type": compute_type}
+        # The model is loaded on the first transcription, so processes that
+        # only enqueue tasks (HTTP workers, the durable-mode API) never load it
+        self._backend = None
+        self._backend_lock = threading.Lock()
+        self.device = None
+        
         # Configure logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
-        
-        # Check if CUDA is available
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.logger.info(f"Using device: {self.device}")
-        
-        # Load model with appropriate settings
-        try:
-            self.model = whisper.load_model(model_name, device=self.device)
-            if self.device == "cpu":
-                self.logger.info("Running on CPU - transcription may be slower")
-        except Exception as e:
-            self.logger.error(f"Error loading Whisper model: {str(e)}")
-            raise
+
+    @property
+    def backend(self):
+        """The transcription backend, loading its model on first use"""
+        with self._backend_lock:
+            if self._backend is None:
+                # Check if CUDA is available
+                device = default_device()
+                self.logger.info(f"Using device: {device}")
+                try:
+                    self._backend = TRANSCRIPTION_BACKENDS[self.backend_name](
+                        self.model_name, device, **self._backend_options
+                    )
+                except Exception as e:
+                    self.logger.error(f"Error loading Whisper model: {str(e)}")
+                    raise
+                self.device = device
+                self.logger.info(f"Transcribing with {self.backend_name} ({self.model_name})")
+                if device == "cpu":
+                    self.logger.info("Running on CPU - transcription may be slower")
+            return self._backend
 
     def transcribe(self, audio_path: str) -> str:
         """
         Transcribe audio file using Whisper.
         Skips and returns empty string if file is missing, empty, or on error.
         """
+        return self.transcribe_segments(audio_path)["text"]
+
+    def transcribe_segments(self, audio_path: str) -> Dict:
+        """
+        Transcribe audio file using Whisper, keeping the timed segments.
+        
+        With vocal gating the vocal regions are joined into one clip before
+        transcription and the segment times are mapped back to the song.
+        
+        Args:
+            audio_path (str): Path of the audio file
+            
+        Returns:
+            Dict: "text" and "segments" (with "start"/"end" in seconds of the
+                song); both empty if the file is missing, empty, has no
+                vocals, or on error
+        """
+        empty = {"text": "", "segments": []}
         if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
             self.logger.warning(f"Skipping empty or missing audio file: {audio_path}")
-            return ""
+            return empty
+        backend = self.backend  # A model that fails to load fails the task instead of every song
         try:
-            # Suppress the FP16 warning for CPU
-            with warnings.catch_warnings():
-                warnings.filterwarnings("ignore", message="FP16 is not supported on CPU")
-                result = self.model.transcribe(audio_path)
-            return result["text"]
+            audio = backend.load_audio(audio_path)
+            duration = len(audio) / SAMPLE_RATE
+            splice = None
+            if self.vocal_gating and duration > 0:
+                regions = detect_vocal_regions(audio)
+                if not regions:
+                    self.logger.info(f"No vocals detected, skipping transcription: {audio_path}")
+                    WHISPER_TRANSCRIBED_FRACTION.observe(0.0, device=self.device)
+                    return empty
+                if sum(end - start for start, end in regions) < duration * MAX_GATED_FRACTION:
+                    splice = VocalSplice(audio, regions)
+            
+            with _inference_lock(backend.model_key):
+                start = time.perf_counter()
+                result = backend.transcribe(splice.audio if splice else audio)
+                elapsed = time.perf_counter() - start
+            
+            segments = result["segments"]
+            if splice:
+                for segment in segments:
+                    segment["start"] = splice.to_track_time(segment["start"])
+                    segment["end"] = splice.to_track_time(segment["end"])
+                self.logger.info(
+                    f"Transcribed {splice.duration:.0f} of {duration:.0f} seconds in "
+                    f"{len(splice.regions)} vocal regions: {audio_path}"
+                )
+            WHISPER_SECONDS.observe(elapsed, device=self.device, backend=backend.name)
+            if duration > 0:
+                WHISPER_REALTIME_FACTOR.observe(elapsed / duration, device=self.device, backend=backend.name)
+                WHISPER_TRANSCRIBED_FRACTION.observe(
+                    (splice.duration if splice else duration) / duration, device=self.device
+                )
+            return {"text": result["text"], "segments": segments}
         except Exception as e:
             self.logger.error(f"Error transcribing audio: {str(e)}. Skipping file: {audio_path}")
-            return "" 
\ No newline at end of file
+            return empty
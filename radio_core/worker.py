@@ -0,0 +1,51 @@
+"""
+Standalone generation worker.
+
+Claims tasks from the SQLite queue shared with the API server and runs them.
+Start as many as the machine (or machines sharing the filesystem) can handle:
+
+    TASK_QUEUE_DB=/shared/radio/tasks.db python worker.py
+    python worker.py --db /shared/radio/tasks.db --worker-id box1-a
+    python worker.py --metrics-port 9101    # expose this worker's /metrics
+"""
+import argparse
+import os
+import signal
+from app import create_app
+from services.metrics import start_metrics_server
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a radio generation worker")
+    parser.add_argument('--db', default=os.getenv('TASK_QUEUE_DB'),
+                        help="Path to the shared task queue database (default: $TASK_QUEUE_DB)")
+    parser.add_argument('--worker-id', default=None,
+                        help="Identifier recorded on claimed tasks (default: hostname:pid)")
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help="Seconds to wait between polls when the queue is empty")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve this worker's stage timings and API metrics on this port")
+    args = parser.parse_args()
+    
+    if not args.db:
+        parser.error("a queue database is required (--db or TASK_QUEUE_DB)")
+    
+    # create_app reads the queue location from the environment
+    os.environ['TASK_QUEUE_DB'] = args.db
+    # The API process sweeps the cache, serves the fan-out and fills the transition library
+    app = create_app(background_services=False)
+    task_processor = app.config['task_processor']
+    
+    # Tasks run here, so their timings are only visible from this process
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    
+    # Finish the current task, then exit
+    def handle_stop(signum, frame):
+        task_processor.stop()
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+    
+    task_processor.run_worker(worker_id=args.worker_id, poll_interval=args.poll_interval)
+
+if __name__ == '__main__':
+    main()